@@ -7,5 +7,8 @@ from django.core.asgi import get_asgi_application
 
 # Устанавливаем переменную окружения для настроек Django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.general_config.settings")
+# У ASGI воркера один event loop на процесс: запросы в сервис Profile идут
+# через общий httpx.AsyncClient (см. PROFILE_HTTP_ASYNC в настройках)
+os.environ.setdefault("PROFILE_HTTP_ASYNC", "True")
 
 application = get_asgi_application()
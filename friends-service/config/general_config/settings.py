@@ -64,8 +64,58 @@ MONGO_DB_SETTINGS = {
 # Настройки для http запросов в сервис Profile
 PROFILE_MICROSERVICE_URL = env("PROFILE_MICROSERVICE_URL")
 PROFILE_USERS_BY_LIST_IDS = env("PROFILE_USERS_BY_LIST_IDS")
+PROFILE_USERS_BATCH = env("PROFILE_USERS_BATCH", default="/api/friend-profiles/batch/")
 PROFILE_USER_CHECK = env("PROFILE_USER_CHECK")
 PROFILE_USERS_SEARCH = env("PROFILE_USERS_SEARCH")
+PROFILE_USER_IDS = env("PROFILE_USER_IDS", default="/api/user-ids/")
+
+# Пул HTTP соединений к сервису Profile (общий на процесс, keep-alive)
+PROFILE_HTTP_MAX_CONNECTIONS = env.int("PROFILE_HTTP_MAX_CONNECTIONS", default=100)
+PROFILE_HTTP_MAX_KEEPALIVE = env.int("PROFILE_HTTP_MAX_KEEPALIVE", default=20)
+PROFILE_HTTP_KEEPALIVE_EXPIRY = env.float("PROFILE_HTTP_KEEPALIVE_EXPIRY", default=30.0)
+PROFILE_HTTP_TIMEOUT = env.float("PROFILE_HTTP_TIMEOUT", default=5.0)
+PROFILE_HTTP_CONNECT_TIMEOUT = env.float("PROFILE_HTTP_CONNECT_TIMEOUT", default=2.0)
+PROFILE_HTTP2 = env.bool("PROFILE_HTTP2", default=False)  # Требует пакет h2
+# Асинхронный клиент на event loop воркера. Включается ASGI точкой входа
+# (config/general_config/asgi.py); под WSGI каждый запрос идет в новом loop,
+# и async представления ходят через синхронный пул
+PROFILE_HTTP_ASYNC = env.bool("PROFILE_HTTP_ASYNC", default=False)
+
+# Кэш карточек профилей: локальный LRU воркера + общий кэш PROFILE_CARDS_CACHE_ALIAS
+PROFILE_CARDS_CACHE_ALIAS = "profile_cards"
+PROFILE_CARD_CACHE_TTL = env.int("PROFILE_CARD_CACHE_TTL", default=300)
+PROFILE_CARD_LOCAL_TTL = env.int("PROFILE_CARD_LOCAL_TTL", default=30)
+PROFILE_CARD_LOCAL_MAXSIZE = env.int("PROFILE_CARD_LOCAL_MAXSIZE", default=10000)
+# Разрешить кэш в памяти процесса (LocMemCache) для общего кэша: только для
+# локального запуска и тестов, воркеры его друг с другом не делят
+PROFILE_CARDS_CACHE_ALLOW_LOCAL = env.bool("PROFILE_CARDS_CACHE_ALLOW_LOCAL", default=False)
+
+# Кэш проверок существования юзеров (секунды) и реплика известных ID
+USER_EXISTS_TTL = env.int("USER_EXISTS_TTL", default=86400)
+USER_NOT_EXISTS_TTL = env.int("USER_NOT_EXISTS_TTL", default=30)
+KNOWN_USERS_ERROR_RATE = env.float("KNOWN_USERS_ERROR_RATE", default=0.01)
+KNOWN_USERS_REFRESH = env.int("KNOWN_USERS_REFRESH", default=300)
+
+# Токен для служебных запросов от других микросервисов (заголовок X-Service-Token)
+SERVICE_TOKEN = env("SERVICE_TOKEN", default="")
+
+# Максимум юзеров в одном пакетном запросе (friends/bulk/...)
+FRIENDS_BULK_MAX = env.int("FRIENDS_BULK_MAX", default=500)
+# Максимум юзеров в одном запросе статусов (friends/status/)
+FRIENDS_STATUS_MAX = env.int("FRIENDS_STATUS_MAX", default=10000)
+
+# Срок жизни непринятого запроса в друзья, после него запрос удаляет
+# команда sweep_friend_requests
+FRIEND_REQUEST_TTL_DAYS = env.int("FRIEND_REQUEST_TTL_DAYS", default=30)
+
+# Граф друзей для рекомендаций (graph.py)
+FRIEND_GRAPH_REFRESH = env.int("FRIEND_GRAPH_REFRESH", default=5)
+FRIEND_GRAPH_MAX_PATCHED = env.int("FRIEND_GRAPH_MAX_PATCHED", default=10000)
+FRIEND_GRAPH_CHANGES_RETENTION = env.int("FRIEND_GRAPH_CHANGES_RETENTION", default=86400)
+# Сколько секунд журнала изменений перечитывается при каждой синхронизации:
+# id выдается при INSERT, и транзакция с меньшим id может закоммититься позже
+FRIEND_GRAPH_CHANGES_LAG = env.int("FRIEND_GRAPH_CHANGES_LAG", default=60)
+FRIEND_RECOMMENDATIONS_MAX = env.int("FRIEND_RECOMMENDATIONS_MAX", default=100)
 
 # Настройки приложений
 INSTALLED_APPS = [
@@ -240,6 +290,20 @@ CACHES = {
         "LOCATION": "django_keycloak_auth",
         "TIMEOUT": KEYCLOAK_CONFIG["KEYCLOAK_CACHE_TTL"],
         "KEY_PREFIX": "django_keycloak_auth_",
-    }
+    },
+    # Общий для воркеров и management команд кэш: карточки профилей,
+    # проверки юзеров, фильтр Блума и снимок графа друзей. Redis с
+    # maxmemory-policy allkeys-lru
+    PROFILE_CARDS_CACHE_ALIAS: {
+        "BACKEND": env(
+            "PROFILE_CARDS_CACHE_BACKEND",
+            default="django.core.cache.backends.redis.RedisCache",
+        ),
+        "LOCATION": env(
+            "PROFILE_CARDS_CACHE_LOCATION", default="redis://localhost:6379/1"
+        ),
+        "TIMEOUT": PROFILE_CARD_CACHE_TTL,
+        "OPTIONS": env.json("PROFILE_CARDS_CACHE_OPTIONS", default={}),
+    },
 }
 CACHE_MIDDLEWARE_KEY_PREFIX = "django_keycloak_auth_"
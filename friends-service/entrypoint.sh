@@ -7,6 +7,9 @@ set -e
 /opt/venv/bin/python manage.py combined_command
 # Установка временного каталога
 # Запуск Gunicorn с записью логов
+# Async представления обслуживаются ASGI воркерами uvicorn: один воркер
+# держит много запросов, ожидающих ответа сервиса Profile
 exec gunicorn --bind 0.0.0.0:8000 \
     --workers 3 \
-    config.general_config.wsgi:application
+    --worker-class uvicorn.workers.UvicornWorker \
+    config.general_config.asgi:application
@@ -50,6 +50,15 @@ app.kubernetes.io/name: {{ include "friends-service-backend.name" . }}
 app.kubernetes.io/instance: {{ .Release.Name }}
 {{- end }}
 
+{{/*
+Redis selector labels (a separate name, so the app Deployment and
+Service never select Redis pods)
+*/}}
+{{- define "friends-service-backend.redisSelectorLabels" -}}
+app.kubernetes.io/name: {{ include "friends-service-backend.name" . }}-redis
+app.kubernetes.io/instance: {{ .Release.Name }}
+{{- end }}
+
 {{/*
 Create the name of the service account to use
 */}}
@@ -0,0 +1,321 @@
+import hashlib
+import logging
+import math
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+from .services import ProfileMicroserviceClient
+
+logger = logging.getLogger(__name__)
+
+
+def shared_cache():
+    """
+    Общий для воркеров кэш PROFILE_CARDS_CACHE_ALIAS.
+
+    Кэш в памяти процесса не виден другим воркерам и командам, которые
+    публикуют в него фильтр Блума и снимок графа, поэтому без
+    PROFILE_CARDS_CACHE_ALLOW_LOCAL он считается ошибкой конфигурации.
+    """
+    cache = caches[settings.PROFILE_CARDS_CACHE_ALIAS]
+    if isinstance(cache, LocMemCache) and not settings.PROFILE_CARDS_CACHE_ALLOW_LOCAL:
+        raise ImproperlyConfigured(
+            f'Кэш {settings.PROFILE_CARDS_CACHE_ALIAS} должен быть общим для '
+            f'воркеров (Redis или Memcached), а не LocMemCache'
+        )
+    return cache
+
+
+def call_shared(operation, *args, default=None):
+    """
+    Вызывает операцию общего кэша. Если кэш недоступен, запрос не падает:
+    возвращается default, и данные берутся из сервиса Profile.
+    """
+    cache = shared_cache()
+    try:
+        return getattr(cache, operation)(*args)
+    except Exception as e:
+        # Общего класса ошибок у бэкендов нет (redis, pymemcache, ...)
+        logger.warning('Общий кэш недоступен (%s): %s', operation, e)
+        return default
+
+
+async def acall_shared(operation, *args, default=None):
+    """
+    Асинхронный вариант call_shared.
+    """
+    cache = shared_cache()
+    try:
+        return await getattr(cache, operation)(*args)
+    except Exception as e:
+        logger.warning('Общий кэш недоступен (%s): %s', operation, e)
+        return default
+
+
+class LocalLRUCache:
+    """
+    In-process LRU кэш с TTL для горячих ключей воркера.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                expires_at, value = item
+                if expires_at < now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, mapping):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ProfileCardCache:
+    """
+    Кэш карточек профилей (ответ FriendProfileSerializer) по UUID юзера.
+
+    Два уровня: локальный LRU воркера с коротким TTL и общий для всех
+    воркеров кэш PROFILE_CARDS_CACHE_ALIAS. Промахи по странице собираются
+    в один запрос к сервису Profile. Пока общий кэш недоступен, работает
+    только локальный уровень.
+    """
+    key_prefix = 'profile_card:'
+
+    def __init__(self):
+        self.local = LocalLRUCache(
+            settings.PROFILE_CARD_LOCAL_MAXSIZE,
+            settings.PROFILE_CARD_LOCAL_TTL,
+        )
+
+    def make_key(self, user_id):
+        return f'{self.key_prefix}{user_id}'
+
+    def get_cards(self, user_ids):
+        """
+        Возвращает карточки в порядке user_ids, промахи догружаются одним
+        запросом. Юзеры, которых нет в сервисе Profile, пропускаются.
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        found = self.local.get_many(user_ids)
+        missing = [user_id for user_id in user_ids if user_id not in found]
+        if missing:
+            shared = self._from_shared(call_shared(
+                'get_many', [self.make_key(user_id) for user_id in missing],
+                default={},
+            ))
+            self.local.set_many(shared)
+            found.update(shared)
+            missing = [user_id for user_id in missing if user_id not in found]
+        if missing:
+            fetched = ProfileMicroserviceClient().get_profiles(missing)
+            call_shared(
+                'set_many', self._to_shared(fetched), settings.PROFILE_CARD_CACHE_TTL
+            )
+            self.local.set_many(fetched)
+            found.update(fetched)
+        return [found[user_id] for user_id in user_ids if user_id in found]
+
+    async def aget_cards(self, user_ids):
+        """
+        Асинхронный вариант get_cards.
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        found = self.local.get_many(user_ids)
+        missing = [user_id for user_id in user_ids if user_id not in found]
+        if missing:
+            shared = self._from_shared(await acall_shared(
+                'aget_many', [self.make_key(user_id) for user_id in missing],
+                default={},
+            ))
+            self.local.set_many(shared)
+            found.update(shared)
+            missing = [user_id for user_id in missing if user_id not in found]
+        if missing:
+            fetched = await ProfileMicroserviceClient().aget_profiles(missing)
+            await acall_shared(
+                'aset_many', self._to_shared(fetched), settings.PROFILE_CARD_CACHE_TTL
+            )
+            self.local.set_many(fetched)
+            found.update(fetched)
+        return [found[user_id] for user_id in user_ids if user_id in found]
+
+    def invalidate(self, user_ids):
+        """
+        Удаляет карточки из кэша, например после изменения профиля.
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        self.local.delete_many(user_ids)
+        call_shared('delete_many', [self.make_key(user_id) for user_id in user_ids])
+
+    async def ainvalidate(self, user_ids):
+        user_ids = [str(user_id) for user_id in user_ids]
+        self.local.delete_many(user_ids)
+        await acall_shared(
+            'adelete_many', [self.make_key(user_id) for user_id in user_ids]
+        )
+
+    def _from_shared(self, values):
+        prefix_length = len(self.key_prefix)
+        return {key[prefix_length:]: value for key, value in values.items()}
+
+    def _to_shared(self, cards):
+        return {self.make_key(user_id): card for user_id, card in cards.items()}
+
+
+class BloomFilter:
+    """
+    Фильтр Блума по UUID юзеров. Отрицательный ответ точный, положительный
+    ошибается с вероятностью error_rate.
+    """
+    header = struct.Struct('>QI')
+
+    def __init__(self, size_bits, hash_count, bits=None):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((size_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        size_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hash_count = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits, hash_count)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(uuid.UUID(str(item)).bytes, digest_size=16).digest()
+        h1, h2 = struct.unpack('>QQ', digest)
+        return ((h1 + i * h2) % self.size_bits for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        try:
+            positions = self._positions(item)
+            return all(
+                self.bits[position >> 3] & (1 << (position & 7))
+                for position in positions
+            )
+        except ValueError:
+            return False
+
+    def to_bytes(self):
+        return self.header.pack(self.size_bits, self.hash_count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        size_bits, hash_count = cls.header.unpack_from(data)
+        return cls(size_bits, hash_count, bytearray(data[cls.header.size:]))
+
+
+class UserExistenceCache:
+    """
+    Проверка существования юзера без запроса в сервис Profile на каждую
+    запись.
+
+    Ответы сервиса Profile кэшируются: положительные USER_EXISTS_TTL,
+    отрицательные - коротко USER_NOT_EXISTS_TTL, чтобы новые юзеры быстро
+    становились доступны. Локальная реплика известных ID (фильтр Блума,
+    пересобирается командой rebuild_known_users) ошибается в положительную
+    сторону, поэтому ее ответ используется, только когда сервис Profile
+    недоступен.
+    """
+    key_prefix = 'user_exists:'
+    known_users_key = 'known_users_bloom'
+
+    def __init__(self):
+        self._known_users = None
+        self._known_users_loaded_at = None
+
+    @property
+    def shared(self):
+        return shared_cache()
+
+    def make_key(self, user_id):
+        return f'{self.key_prefix}{user_id}'
+
+    async def aexists(self, user_id):
+        user_id = str(user_id)
+        key = self.make_key(user_id)
+        exists = await acall_shared('aget', key)
+        if exists is None:
+            response = await ProfileMicroserviceClient().aget_data_from_microservice(
+                endpoint=f'{settings.PROFILE_USER_CHECK}{user_id}/',
+            )
+            if "error" in response:
+                return await self._ain_known_users(user_id)
+            exists = bool(response.get('exists'))
+            await acall_shared(
+                'aset',
+                key,
+                exists,
+                settings.USER_EXISTS_TTL if exists else settings.USER_NOT_EXISTS_TTL,
+            )
+        return exists
+
+    def set_known_users(self, user_ids, capacity=None):
+        """
+        Собирает фильтр Блума из ID юзеров и публикует его в общий кэш.
+        """
+        user_ids = list(user_ids)
+        known_users = BloomFilter.for_capacity(
+            capacity or len(user_ids), settings.KNOWN_USERS_ERROR_RATE
+        )
+        for user_id in user_ids:
+            known_users.add(user_id)
+        self.shared.set(self.known_users_key, known_users.to_bytes(), None)
+        self._known_users = known_users
+        self._known_users_loaded_at = time.monotonic()
+        return known_users
+
+    async def _ain_known_users(self, user_id):
+        now = time.monotonic()
+        if (
+            self._known_users_loaded_at is None
+            or now - self._known_users_loaded_at > settings.KNOWN_USERS_REFRESH
+        ):
+            data = await acall_shared('aget', self.known_users_key)
+            self._known_users = BloomFilter.from_bytes(data) if data else None
+            self._known_users_loaded_at = now
+        return self._known_users is not None and user_id in self._known_users
+
+
+profile_cards = ProfileCardCache()
+user_existence = UserExistenceCache()
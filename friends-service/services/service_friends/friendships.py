@@ -0,0 +1,197 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import (
+    FavoriteUser,
+    Friend,
+    FriendEdgeChange,
+    FriendRequest,
+    FriendStats,
+)
+
+# Приводит ID юзера (UUID, строку или число) к UUID, как это делает UUIDField
+to_user_id = Friend._meta.get_field("user").to_python
+
+
+def approve_friend_request(from_user, to_user):
+    """
+    Одобряет запрос на добавление в друзья: отмечает запрос принятым,
+    создает обе связи и обновляет счетчики в одной транзакции.
+
+    :return: False, если непринятый и не просроченный запрос не найден
+    """
+    from_user, to_user = to_user_id(from_user), to_user_id(to_user)
+    with transaction.atomic():
+        accepted = FriendRequest.pending().filter(
+            from_user=from_user, to_user=to_user
+        ).update(is_accepted=True)
+        if not accepted:
+            return False
+        existing = set(Friend.objects.filter(
+            Q(user=from_user, friend=to_user) | Q(user=to_user, friend=from_user)
+        ).values_list("user", flat=True))
+        edges = [
+            Friend(user=user, friend=friend)
+            for user, friend in ((from_user, to_user), (to_user, from_user))
+            if user not in existing
+        ]
+        Friend.objects.bulk_create(edges)
+        FriendStats.apply_deltas({edge.user: 1 for edge in edges})
+        FriendEdgeChange.record([(edge.user, edge.friend) for edge in edges], True)
+    return True
+
+
+def delete_friend(user, friend):
+    """
+    Удаляет друга и уменьшает счетчик юзера.
+
+    :return: False, если такой связи нет
+    """
+    user = to_user_id(user)
+    with transaction.atomic():
+        deleted, _ = Friend.objects.filter(user=user, friend=friend).delete()
+        if deleted:
+            FriendStats.apply_deltas({user: -deleted})
+            FriendEdgeChange.record([(user, to_user_id(friend))], False)
+    return bool(deleted)
+
+
+def bulk_approve_friend_requests(from_user, user_ids):
+    """
+    Пакетный вариант approve_friend_request: все запросы, связи и счетчики
+    обновляются в одной транзакции фиксированным числом запросов.
+
+    :return: Словарь {user_id: "approved" | "not_found"}
+    """
+    from_user = to_user_id(from_user)
+    user_ids = [to_user_id(user_id) for user_id in user_ids]
+    with transaction.atomic():
+        pending = set(FriendRequest.pending().select_for_update().filter(
+            from_user=from_user, to_user__in=user_ids
+        ).values_list("to_user", flat=True))
+        FriendRequest.objects.filter(
+            from_user=from_user, to_user__in=pending
+        ).update(is_accepted=True)
+        existing = set(Friend.objects.filter(
+            Q(user=from_user, friend__in=pending) |
+            Q(user__in=pending, friend=from_user)
+        ).values_list("user", "friend"))
+        edges = [
+            Friend(user=user, friend=friend)
+            for to_user in pending
+            for user, friend in ((from_user, to_user), (to_user, from_user))
+            if (user, friend) not in existing
+        ]
+        Friend.objects.bulk_create(edges, ignore_conflicts=True)
+        deltas = defaultdict(int)
+        for edge in edges:
+            deltas[edge.user] += 1
+        FriendStats.apply_deltas(deltas)
+        FriendEdgeChange.record([(edge.user, edge.friend) for edge in edges], True)
+    return {
+        user_id: "approved" if user_id in pending else "not_found"
+        for user_id in user_ids
+    }
+
+
+def bulk_decline_friend_requests(from_user, user_ids):
+    """
+    Отклоняет непринятые запросы (удаляет их) одним запросом.
+
+    :return: Словарь {user_id: "declined" | "not_found"}
+    """
+    from_user = to_user_id(from_user)
+    user_ids = [to_user_id(user_id) for user_id in user_ids]
+    with transaction.atomic():
+        requests = FriendRequest.objects.filter(
+            from_user=from_user, to_user__in=user_ids, is_accepted=False
+        )
+        declined = set(requests.select_for_update().values_list("to_user", flat=True))
+        requests.delete()
+    return {
+        user_id: "declined" if user_id in declined else "not_found"
+        for user_id in user_ids
+    }
+
+
+def bulk_delete_friends(user, friend_ids):
+    """
+    Пакетный вариант delete_friend.
+
+    :return: Словарь {friend_id: "deleted" | "not_found"}
+    """
+    user = to_user_id(user)
+    friend_ids = [to_user_id(friend_id) for friend_id in friend_ids]
+    with transaction.atomic():
+        friends = Friend.objects.filter(user=user, friend__in=friend_ids)
+        deleted = set(friends.select_for_update().values_list("friend", flat=True))
+        friends.delete()
+        FriendStats.apply_deltas({user: -len(deleted)})
+        FriendEdgeChange.record([(user, friend) for friend in deleted], False)
+    return {
+        friend_id: "deleted" if friend_id in deleted else "not_found"
+        for friend_id in friend_ids
+    }
+
+
+def bulk_add_favorites(user, favorite_ids):
+    """
+    Добавляет юзеров в избранное одним INSERT, уже добавленные пропускаются.
+
+    :return: Словарь {favorite_id: "added" | "already_added"}
+    """
+    user = to_user_id(user)
+    favorite_ids = [to_user_id(favorite_id) for favorite_id in favorite_ids]
+    with transaction.atomic():
+        existing = set(FavoriteUser.objects.filter(
+            user=user, favorite__in=favorite_ids
+        ).values_list("favorite", flat=True))
+        FavoriteUser.objects.bulk_create(
+            [
+                FavoriteUser(user=user, favorite=favorite_id)
+                for favorite_id in favorite_ids
+                if favorite_id not in existing
+            ],
+            ignore_conflicts=True,
+        )
+    return {
+        favorite_id: "already_added" if favorite_id in existing else "added"
+        for favorite_id in favorite_ids
+    }
+
+
+async def afriendship_flags(user, user_ids):
+    """
+    Отношения юзера с каждым из user_ids тремя запросами.
+
+    :return: Множества UUID: friends, requests_sent, requests_received,
+        favorites
+    """
+    user = to_user_id(user)
+    friends = {
+        friend async for friend in Friend.objects.filter(
+            user=user, friend__in=user_ids
+        ).values_list("friend", flat=True)
+    }
+    requests_sent, requests_received = set(), set()
+    async for from_user, to_user in FriendRequest.pending().filter(
+        Q(from_user=user, to_user__in=user_ids) |
+        Q(to_user=user, from_user__in=user_ids)
+    ).values_list("from_user", "to_user"):
+        if from_user == user:
+            requests_sent.add(to_user)
+        else:
+            requests_received.add(from_user)
+    favorites = {
+        favorite async for favorite in FavoriteUser.objects.filter(
+            user=user, favorite__in=user_ids
+        ).values_list("favorite", flat=True)
+    }
+    return {
+        "friends": friends,
+        "requests_sent": requests_sent,
+        "requests_received": requests_received,
+        "favorites": favorites,
+    }
@@ -0,0 +1,286 @@
+import io
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max, Q
+
+from .cache import shared_cache
+from .friendships import to_user_id
+from .models import Friend, FriendEdgeChange
+
+
+def build_csr(sources, targets, size):
+    """
+    Собирает CSR по парам индексов source -> target.
+
+    :return: offsets длины size + 1 и отсортированные внутри строки соседи
+    """
+    order = np.lexsort((targets, sources))
+    neighbours = targets[order].astype(np.int32)
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=size), out=offsets[1:])
+    return offsets, neighbours
+
+
+class FriendGraph:
+    """
+    Граф друзей воркера в виде CSR массивов по интернированным индексам
+    юзеров.
+
+    Снимок собирается командой build_friend_graph и публикуется в общий
+    кэш, воркеры догружают к нему изменения из FriendEdgeChange. Измененные
+    строки хранятся отдельно в patched и вливаются в CSR при накоплении
+    FRIEND_GRAPH_MAX_PATCHED строк. Пока снимка нет, рекомендации строятся
+    запросом к БД (recommend_from_db), воркер граф сам не собирает.
+
+    Изменения за последние FRIEND_GRAPH_CHANGES_LAG секунд перечитываются
+    при каждой синхронизации, чтобы не пропустить изменение с меньшим id,
+    закоммиченное позже уже примененных. Повторное применение в порядке id
+    дает то же конечное состояние связей.
+    """
+    snapshot_key = 'friend_graph_snapshot'
+    version_key = 'friend_graph_version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.users = []
+        self.index = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.neighbours = np.zeros(0, dtype=np.int32)
+        self.patched = {}
+        self._patched_rows = np.zeros(0, dtype=np.int64)
+        self.change_id = 0
+        self.change_at = None
+        self.loaded = False
+        self.synced_at = None
+
+    @property
+    def shared(self):
+        return shared_cache()
+
+    def intern(self, user):
+        idx = self.index.get(user)
+        if idx is None:
+            idx = self.index[user] = len(self.users)
+            self.users.append(user)
+        return idx
+
+    def neighbours_of(self, idx):
+        row = self.patched.get(idx)
+        if row is not None:
+            return row
+        if idx + 1 < len(self.offsets):
+            return self.neighbours[self.offsets[idx]:self.offsets[idx + 1]]
+        return self.neighbours[:0]
+
+    def build(self):
+        """
+        Полная сборка по таблице Friend и публикация снимка в общий кэш.
+        """
+        with self._lock:
+            self.reset()
+            last = FriendEdgeChange.objects.aggregate(
+                last_id=Max('id'), last_at=Max('created_at')
+            )
+            self.change_id = last['last_id'] or 0
+            self.change_at = last['last_at']
+            sources, targets = [], []
+            edges = Friend.objects.values_list('user', 'friend').iterator(
+                chunk_size=50000
+            )
+            for user, friend in edges:
+                sources.append(self.intern(user))
+                targets.append(self.intern(friend))
+            self.offsets, self.neighbours = build_csr(
+                np.array(sources, dtype=np.int64),
+                np.array(targets, dtype=np.int32),
+                len(self.users),
+            )
+            # Изменения, попавшие в выборку Friend, применятся повторно без эффекта
+            self.apply_changes(self._changes_since(self.change_id, self.change_at))
+            self.loaded = True
+            self.synced_at = time.monotonic()
+            self.publish()
+
+    def publish(self):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            users=np.frombuffer(
+                b''.join(user.bytes for user in self.users), dtype=np.uint8
+            ).reshape(-1, 16),
+            offsets=self.offsets,
+            neighbours=self.neighbours,
+            change_id=np.int64(self.change_id),
+            change_at=np.float64(
+                self.change_at.timestamp() if self.change_at else np.nan
+            ),
+        )
+        self.shared.set_many({
+            self.snapshot_key: buffer.getvalue(),
+            self.version_key: self.change_id,
+        }, None)
+
+    def load_snapshot(self):
+        data = self.shared.get(self.snapshot_key)
+        if not data:
+            return False
+        snapshot = np.load(io.BytesIO(data))
+        self.reset()
+        self.users = [uuid.UUID(bytes=row.tobytes()) for row in snapshot['users']]
+        self.index = {user: idx for idx, user in enumerate(self.users)}
+        self.offsets = snapshot['offsets']
+        self.neighbours = snapshot['neighbours']
+        self.change_id = int(snapshot['change_id'])
+        change_at = float(snapshot['change_at'])
+        if not np.isnan(change_at):
+            self.change_at = datetime.fromtimestamp(change_at, timezone.utc)
+        self.loaded = True
+        return True
+
+    def sync(self):
+        """
+        Подтягивает новый снимок и изменения связей не чаще, чем раз
+        в FRIEND_GRAPH_REFRESH секунд.
+
+        :return: False, если снимок еще не опубликован
+        """
+        now = time.monotonic()
+        if (
+            self.synced_at is not None
+            and now - self.synced_at < settings.FRIEND_GRAPH_REFRESH
+        ):
+            return self.loaded
+        with self._lock:
+            if not self.loaded and not self.load_snapshot():
+                self.synced_at = now
+                return False
+            version = self.shared.get(self.version_key)
+            if version is not None and version > self.change_id:
+                self.load_snapshot()
+            self.apply_changes(self._changes_since(self.change_id, self.change_at))
+            self.synced_at = now
+        return True
+
+    @staticmethod
+    def _changes_since(change_id, change_at):
+        """
+        Изменения после change_id и все изменения за FRIEND_GRAPH_CHANGES_LAG
+        секунд до change_at (времени последнего примененного изменения).
+        """
+        condition = Q(id__gt=change_id)
+        if change_at is not None:
+            condition |= Q(created_at__gt=change_at - timedelta(
+                seconds=settings.FRIEND_GRAPH_CHANGES_LAG
+            ))
+        return FriendEdgeChange.objects.filter(condition).order_by(
+            'id'
+        ).values_list('id', 'user', 'friend', 'added', 'created_at')
+
+    def apply_changes(self, changes):
+        rows = {}
+        for change_id, user, friend, added, created_at in changes:
+            idx = self.intern(user)
+            row = rows.get(idx)
+            if row is None:
+                row = rows[idx] = set(self.neighbours_of(idx).tolist())
+            if added:
+                row.add(self.intern(friend))
+            else:
+                row.discard(self.index.get(friend))
+            self.change_id = max(self.change_id, change_id)
+            if self.change_at is None or created_at > self.change_at:
+                self.change_at = created_at
+        for idx, row in rows.items():
+            self.patched[idx] = np.array(sorted(row), dtype=np.int32)
+        if len(self.patched) > settings.FRIEND_GRAPH_MAX_PATCHED:
+            self.compact()
+        elif rows:
+            self._patched_rows = np.array(sorted(self.patched), dtype=np.int64)
+
+    def compact(self):
+        """
+        Вливает измененные строки в CSR.
+        """
+        rows = [self.neighbours_of(idx) for idx in range(len(self.users))]
+        lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+        self.offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.neighbours = (
+            np.concatenate(rows).astype(np.int32) if rows
+            else np.zeros(0, dtype=np.int32)
+        )
+        self.patched = {}
+        self._patched_rows = np.zeros(0, dtype=np.int64)
+
+    def gather(self, rows):
+        """
+        Соседи всех строк rows одним массивом (с повторами).
+        """
+        in_csr = rows < len(self.offsets) - 1
+        if self._patched_rows.size:
+            in_csr &= ~np.isin(rows, self._patched_rows)
+        base = rows[in_csr]
+        starts = self.offsets[base]
+        lengths = self.offsets[base + 1] - starts
+        positions = (
+            np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            + np.arange(lengths.sum())
+        )
+        parts = [self.neighbours[positions]]
+        parts.extend(
+            self.patched[idx] for idx in rows[~in_csr].tolist()
+            if idx in self.patched
+        )
+        return np.concatenate(parts)
+
+    def recommend(self, user, limit):
+        """
+        Друзья друзей юзера по убыванию количества общих друзей.
+
+        :return: Список пар (UUID юзера, количество общих друзей)
+        """
+        if not self.sync():
+            return recommend_from_db(user, limit)
+        idx = self.index.get(to_user_id(user))
+        if idx is None:
+            return []
+        friends = self.neighbours_of(idx).astype(np.int64)
+        if not friends.size:
+            return []
+        candidates, mutual = np.unique(self.gather(friends), return_counts=True)
+        keep = ~np.isin(candidates, friends) & (candidates != idx)
+        candidates, mutual = candidates[keep], mutual[keep]
+        top = np.argsort(-mutual, kind='stable')[:limit]
+        return [
+            (self.users[candidate], int(count))
+            for candidate, count in zip(candidates[top].tolist(), mutual[top].tolist())
+        ]
+
+
+def recommend_from_db(user, limit):
+    """
+    Вариант FriendGraph.recommend одним запросом по индексу Friend
+    (user, ...) INCLUDE friend: читаются только строки друзей юзера.
+    """
+    user = to_user_id(user)
+    friends = Friend.objects.filter(user=user).values('friend')
+    return list(
+        Friend.objects.filter(user__in=friends)
+        .exclude(friend__in=friends)
+        .exclude(friend=user)
+        .values('friend')
+        .annotate(mutual=Count('id'))
+        .order_by('-mutual', 'friend')
+        .values_list('friend', 'mutual')[:limit]
+    )
+
+
+friend_graph = FriendGraph()
@@ -0,0 +1,243 @@
+"""
+Бинарная выгрузка графа друзей для офлайн аналитики.
+
+Каталог выгрузки:
+    manifest.json - количество юзеров и связей, watermark и список дельт
+    users.uuid    - UUID юзеров по 16 байт, индекс юзера = номер записи
+    graph.csr     - заголовок CSR_HEADER, offsets int64[users + 1],
+                    neighbours int32[edges]
+    delta-NNNN.bin - заголовок DELTA_HEADER, добавленные и удаленные
+                    пары индексов int32[n, 2]
+
+Все файлы little-endian и открываются через np.memmap без чтения в память.
+"""
+
+import json
+import os
+import struct
+import uuid
+from array import array
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .graph import build_csr
+from .models import Friend, FriendEdgeChange
+
+
+CSR_MAGIC = b'FGCSR001'
+DELTA_MAGIC = b'FGDLT001'
+CSR_HEADER = struct.Struct('<8sQQ')
+DELTA_HEADER = struct.Struct('<8sQQ')
+
+MANIFEST = 'manifest.json'
+USERS = 'users.uuid'
+GRAPH = 'graph.csr'
+
+
+class DeltaWindowError(Exception):
+    """
+    Журнал удалений за окно дельты уже почищен, нужна полная выгрузка.
+    """
+
+
+def _replace(path, write):
+    """
+    Пишет файл во временный и атомарно подменяет, чтобы читатели не
+    увидели недописанный файл.
+    """
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        write(file)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as file:
+        return json.load(file)
+
+
+def write_manifest(directory, manifest):
+    _replace(
+        os.path.join(directory, MANIFEST),
+        lambda file: file.write(json.dumps(manifest, indent=2).encode()),
+    )
+
+
+def read_users(directory):
+    path = os.path.join(directory, USERS)
+    if not os.path.getsize(path):
+        # Пустой файл отобразить через mmap нельзя
+        return np.zeros((0, 16), dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r').reshape(-1, 16)
+
+
+def load_graph(directory):
+    """
+    Открывает выгрузку через mmap.
+
+    :return: users (n, 16) uint8, offsets int64[n + 1], neighbours int32[m]
+    """
+    path = os.path.join(directory, GRAPH)
+    with open(path, 'rb') as file:
+        magic, size, edges = CSR_HEADER.unpack(file.read(CSR_HEADER.size))
+    if magic != CSR_MAGIC:
+        raise ValueError(f'{path}: неизвестный формат')
+    offsets = np.memmap(
+        path, dtype='<i8', mode='r', offset=CSR_HEADER.size, shape=(size + 1,)
+    )
+    neighbours = np.memmap(
+        path, dtype='<i4', mode='r',
+        offset=CSR_HEADER.size + offsets.nbytes, shape=(edges,)
+    )
+    return read_users(directory)[:size], offsets, neighbours
+
+
+def load_delta(path):
+    """
+    :return: added (n, 2) и removed (k, 2) пары индексов через mmap
+    """
+    with open(path, 'rb') as file:
+        magic, added, removed = DELTA_HEADER.unpack(file.read(DELTA_HEADER.size))
+    if magic != DELTA_MAGIC:
+        raise ValueError(f'{path}: неизвестный формат')
+    pairs = np.memmap(
+        path, dtype='<i4', mode='r', offset=DELTA_HEADER.size,
+        shape=(added + removed, 2),
+    )
+    return pairs[:added], pairs[added:]
+
+
+class UserIndex:
+    """
+    Интернирование UUID юзеров в последовательные индексы.
+    """
+
+    def __init__(self, users=()):
+        self.index = {
+            uuid.UUID(bytes=bytes(user)): idx for idx, user in enumerate(users)
+        }
+        self.new_users = []
+
+    def __len__(self):
+        return len(self.index)
+
+    def __call__(self, user):
+        idx = self.index.get(user)
+        if idx is None:
+            idx = self.index[user] = len(self.index)
+            self.new_users.append(user)
+        return idx
+
+
+def export_full(directory, until):
+    """
+    Полная выгрузка связей Friend, созданных не позже until.
+    """
+    intern = UserIndex()
+    sources, targets = array('q'), array('i')
+    edges = Friend.objects.filter(created_at__lte=until).values_list(
+        'user', 'friend'
+    ).iterator(chunk_size=50000)
+    for user, friend in edges:
+        sources.append(intern(user))
+        targets.append(intern(friend))
+    offsets, neighbours = build_csr(
+        np.frombuffer(sources, dtype=np.int64),
+        np.frombuffer(targets, dtype=np.int32),
+        len(intern),
+    )
+
+    def write_graph(file):
+        file.write(CSR_HEADER.pack(CSR_MAGIC, len(intern), len(neighbours)))
+        file.write(offsets.astype('<i8').tobytes())
+        file.write(neighbours.astype('<i4').tobytes())
+
+    _replace(
+        os.path.join(directory, USERS),
+        lambda file: file.write(b''.join(user.bytes for user in intern.new_users)),
+    )
+    _replace(os.path.join(directory, GRAPH), write_graph)
+    manifest = {
+        'users': len(intern),
+        'edges': len(neighbours),
+        'watermark': until.isoformat(),
+        'deltas': [],
+    }
+    write_manifest(directory, manifest)
+    return manifest
+
+
+def removed_edges(since, until, added):
+    """
+    Связи, которые были до since и удалены к until, по журналу
+    FriendEdgeChange. Связь, удаленная и добавленная заново, остается только
+    в added, а добавленная и удаленная внутри окна не попадает никуда.
+    """
+    first, last = {}, {}
+    for user, friend, is_added in FriendEdgeChange.objects.filter(
+        created_at__gt=since, created_at__lte=until
+    ).order_by('id').values_list('user', 'friend', 'added').iterator(chunk_size=50000):
+        first.setdefault((user, friend), is_added)
+        last[(user, friend)] = is_added
+    return [
+        pair for pair, is_added in last.items()
+        if not is_added and not first[pair] and pair not in added
+    ]
+
+
+def export_delta(directory, since, until):
+    """
+    Дельта к выгрузке: связи Friend с created_at в (since, until] и удаления
+    из журнала FriendEdgeChange за тот же период, каждая связь в конечном
+    состоянии. Новые юзеры дописываются в конец users.uuid после записей,
+    учтенных в манифесте: хвост прерванной до записи манифеста выгрузки
+    отбрасывается.
+
+    :raises DeltaWindowError: окно начинается раньше, чем хранится журнал
+        (FRIEND_GRAPH_CHANGES_RETENTION)
+    """
+    retained_since = timezone.now() - timedelta(
+        seconds=settings.FRIEND_GRAPH_CHANGES_RETENTION
+    )
+    if since < retained_since:
+        raise DeltaWindowError(
+            f'Журнал изменений хранится с {retained_since.isoformat()}, '
+            f'а дельта начинается с {since.isoformat()}'
+        )
+    manifest = read_manifest(directory)
+    intern = UserIndex(read_users(directory)[:manifest['users']])
+    added_pairs = dict.fromkeys(Friend.objects.filter(
+        created_at__gt=since, created_at__lte=until
+    ).values_list('user', 'friend').iterator(chunk_size=50000))
+    added = array('i')
+    for user, friend in added_pairs:
+        added.extend((intern(user), intern(friend)))
+    removed = array('i')
+    for user, friend in removed_edges(since, until, added_pairs):
+        removed.extend((intern(user), intern(friend)))
+
+    name = f'delta-{len(manifest["deltas"]) + 1:04d}.bin'
+
+    def write_delta(file):
+        file.write(DELTA_HEADER.pack(DELTA_MAGIC, len(added) // 2, len(removed) // 2))
+        file.write(np.frombuffer(added, dtype=np.int32).astype('<i4').tobytes())
+        file.write(np.frombuffer(removed, dtype=np.int32).astype('<i4').tobytes())
+
+    _replace(os.path.join(directory, name), write_delta)
+    with open(os.path.join(directory, USERS), 'r+b') as file:
+        file.truncate(manifest['users'] * 16)
+        file.seek(0, os.SEEK_END)
+        file.write(b''.join(user.bytes for user in intern.new_users))
+    manifest['users'] = len(intern)
+    manifest['watermark'] = until.isoformat()
+    manifest['deltas'].append({
+        'file': name,
+        'watermark': until.isoformat(),
+        'added': len(added) // 2,
+        'removed': len(removed) // 2,
+    })
+    write_manifest(directory, manifest)
+    return manifest
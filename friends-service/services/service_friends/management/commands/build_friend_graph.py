@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from services.service_friends.graph import friend_graph
+from services.service_friends.models import FriendEdgeChange
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает снимок графа друзей для рекомендаций, публикует его в общий '
+        'кэш и чистит примененный журнал изменений'
+    )
+
+    def handle(self, *args, **options):
+        friend_graph.build()
+        # Воркеры со старым снимком перезагрузят новый, старые изменения не нужны
+        deleted, _ = FriendEdgeChange.objects.filter(
+            id__lte=friend_graph.change_id,
+            created_at__lt=timezone.now() - timedelta(
+                seconds=settings.FRIEND_GRAPH_CHANGES_RETENTION
+            ),
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Граф собран: {len(friend_graph.users)} юзеров, '
+            f'{len(friend_graph.neighbours)} связей, '
+            f'удалено изменений: {deleted}'
+        ))
@@ -0,0 +1,60 @@
+import os
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from services.service_friends.graph_export import (
+    MANIFEST,
+    DeltaWindowError,
+    export_delta,
+    export_full,
+    read_manifest,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает граф друзей в бинарный CSR для mmap (см. graph_export.py): '
+        'полную выгрузку или дельту с последнего watermark'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог выгрузки')
+        parser.add_argument(
+            '--delta',
+            action='store_true',
+            help='Дописать дельту к существующей выгрузке вместо полной',
+        )
+        parser.add_argument(
+            '--lag',
+            type=int,
+            default=60,
+            help='Не выгружать связи моложе N секунд: их транзакции могут быть '
+                 'еще не закоммичены',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        os.makedirs(directory, exist_ok=True)
+        until = timezone.now() - timedelta(seconds=options['lag'])
+
+        if options['delta']:
+            if not os.path.exists(os.path.join(directory, MANIFEST)):
+                raise CommandError('Нет полной выгрузки, запустите команду без --delta')
+            since = datetime.fromisoformat(read_manifest(directory)['watermark'])
+            try:
+                manifest = export_delta(directory, since, until)
+            except DeltaWindowError as e:
+                raise CommandError(f'{e}. Запустите полную выгрузку без --delta')
+            delta = manifest['deltas'][-1]
+            self.stdout.write(self.style.SUCCESS(
+                f'Дельта {delta["file"]}: добавлено {delta["added"]}, '
+                f'удалено {delta["removed"]}, юзеров {manifest["users"]}'
+            ))
+            return
+
+        manifest = export_full(directory, until)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено юзеров: {manifest["users"]}, связей: {manifest["edges"]}'
+        ))
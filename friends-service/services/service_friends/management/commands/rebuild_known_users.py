@@ -0,0 +1,38 @@
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services.service_friends.cache import user_existence
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает локальную реплику известных ID юзеров (фильтр Блума) '
+        'из выгрузки сервиса Profile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--capacity',
+            type=int,
+            default=None,
+            help='Ожидаемое количество юзеров, по умолчанию размер выгрузки',
+        )
+
+    def handle(self, *args, **options):
+        url = f'{settings.PROFILE_MICROSERVICE_URL}{settings.PROFILE_USER_IDS}'
+        self.stdout.write(self.style.NOTICE(f'Загрузка ID юзеров из {url}...'))
+        try:
+            with httpx.stream('GET', url, timeout=None) as response:
+                response.raise_for_status()
+                user_ids = [line for line in response.iter_lines() if line]
+        except httpx.HTTPError as e:
+            raise CommandError(f'Не удалось получить ID юзеров: {e}')
+
+        known_users = user_existence.set_known_users(
+            user_ids, capacity=options['capacity']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Фильтр собран: {len(user_ids)} юзеров, '
+            f'{len(known_users.bits)} байт, {known_users.hash_count} хэшей'
+        ))
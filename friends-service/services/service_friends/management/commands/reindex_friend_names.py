@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from services.service_friends.models import Friend
+from services.service_friends.search import index_friend_names
+from services.service_friends.services import ProfileServiceError
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет локальный индекс имен друзей по карточкам из сервиса '
+        'Profile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Переиндексировать все связи, а не только незаполненные',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Количество юзеров в одном запросе к сервису Profile',
+        )
+
+    def handle(self, *args, **options):
+        friends = Friend.objects.all()
+        if not options['all']:
+            friends = friends.filter(friend_search='')
+        friend_ids = list(
+            friends.order_by('friend').values_list('friend', flat=True).distinct()
+        )
+        batch_size = options['batch_size']
+        for start in range(0, len(friend_ids), batch_size):
+            try:
+                index_friend_names(friend_ids[start:start + batch_size])
+            except ProfileServiceError as e:
+                raise CommandError(f'Не удалось получить карточки: {e.detail}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Переиндексировано юзеров: {len(friend_ids)}'
+        ))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.service_friends.models import FriendRequest
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет принятые и просроченные запросы в друзья пачками, чтобы '
+        'не держать долгих блокировок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество запросов, удаляемых одним DELETE',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Ограничение количества пачек за запуск',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='Пауза между пачками в секундах',
+        )
+
+    def handle(self, *args, **options):
+        accepted = self.sweep(FriendRequest.objects.filter(is_accepted=True), options)
+        expired = self.sweep(
+            FriendRequest.objects.filter(
+                is_accepted=False, created_at__lt=FriendRequest.expired_before()
+            ),
+            options,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено принятых: {accepted}, просроченных: {expired}'
+        ))
+
+    @staticmethod
+    def sweep(queryset, options):
+        deleted = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            ids = list(queryset.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            count, _ = FriendRequest.objects.filter(id__in=ids).delete()
+            deleted += count
+            batches += 1
+            time.sleep(options['sleep'])
+        return deleted
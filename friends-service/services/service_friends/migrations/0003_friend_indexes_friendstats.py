@@ -0,0 +1,40 @@
+# Generated by Django 5.1 on 2026-10-18 02:57
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_friend_stats(apps, schema_editor):
+    Friend = apps.get_model('service_friends', 'Friend')
+    FriendStats = apps.get_model('service_friends', 'FriendStats')
+    counts = Friend.objects.values('user').annotate(friends_count=Count('id')).order_by()
+    FriendStats.objects.bulk_create(
+        (FriendStats(user=row['user'], friends_count=row['friends_count']) for row in counts.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_friends', '0002_alter_favoriteuser_favorite_alter_favoriteuser_user_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FriendStats',
+            fields=[
+                ('user', models.UUIDField(primary_key=True, serialize=False)),
+                ('friends_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='friend',
+            index=models.Index(fields=['user', '-created_at', '-id'], include=('friend',), name='friend_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friend',
+            index=models.Index(fields=['friend'], include=('user',), name='friend_friend_idx'),
+        ),
+        migrations.RunPython(fill_friend_stats, migrations.RunPython.noop),
+    ]
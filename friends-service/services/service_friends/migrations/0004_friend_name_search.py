@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-18 02:58
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_friends', '0003_friend_indexes_friendstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='friend',
+            name='friend_search',
+            field=models.TextField(blank=True, default=''),
+        ),
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='friend',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['friend_search'], name='friend_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
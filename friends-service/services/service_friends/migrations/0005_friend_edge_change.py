@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_friends', '0004_friend_name_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FriendEdgeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user', models.UUIDField()),
+                ('friend', models.UUIDField()),
+                ('added', models.BooleanField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
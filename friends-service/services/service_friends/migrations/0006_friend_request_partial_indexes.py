@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-18 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_friends', '0005_friend_edge_change'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='friendrequest',
+            index=models.Index(condition=models.Q(('is_accepted', False)), fields=['to_user', '-created_at', '-id'], name='friendreq_incoming_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendrequest',
+            index=models.Index(condition=models.Q(('is_accepted', False)), fields=['from_user', '-created_at', '-id'], name='friendreq_outgoing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendrequest',
+            index=models.Index(condition=models.Q(('is_accepted', False)), fields=['created_at'], name='friendreq_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendrequest',
+            index=models.Index(condition=models.Q(('is_accepted', True)), fields=['id'], name='friendreq_accepted_idx'),
+        ),
+    ]
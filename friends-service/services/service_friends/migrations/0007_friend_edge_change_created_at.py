@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_friends', '0006_friend_request_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='friendedgechange',
+            index=models.Index(fields=['created_at'], name='friend_edge_change_at_idx'),
+        ),
+    ]
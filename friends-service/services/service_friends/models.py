@@ -1,5 +1,12 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
 import uuid
 
 
@@ -11,9 +18,97 @@ class Friend(models.Model):
     user = models.UUIDField(default=uuid.uuid4)
     friend = models.UUIDField(default=uuid.uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Нормализованные имя, фамилия и юзернейм друга для локального поиска
+    friend_search = models.TextField(blank=True, default="")
 
     class Meta:
         unique_together = ("user", "friend")
+        indexes = [
+            # Список друзей: filter(user=...).order_by("-created_at", "-id")
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                include=["friend"],
+                name="friend_user_created_idx",
+            ),
+            # Обратный поиск: у кого юзер в друзьях
+            models.Index(
+                fields=["friend"],
+                include=["user"],
+                name="friend_friend_idx",
+            ),
+            # Поиск по подстроке имени (LIKE '%...%') через триграммы
+            GinIndex(
+                fields=["friend_search"],
+                opclasses=["gin_trgm_ops"],
+                name="friend_search_trgm_idx",
+            ),
+        ]
+
+
+class FriendStats(models.Model):
+    """
+    Денормализованные счетчики друзей юзера.
+    """
+
+    user = models.UUIDField(primary_key=True)
+    friends_count = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Атомарно изменяет счетчики: {user: изменение количества друзей}.
+        Вызывается в той же транзакции, что и изменение таблицы Friend.
+        """
+        users_by_delta = defaultdict(list)
+        for user, delta in deltas.items():
+            if delta:
+                users_by_delta[delta].append(user)
+        for delta, users in users_by_delta.items():
+            cls.objects.bulk_create(
+                [cls(user=user) for user in users], ignore_conflicts=True
+            )
+            cls.objects.filter(user__in=users).update(
+                friends_count=Greatest(F("friends_count") + delta, 0)
+            )
+
+    @classmethod
+    def get_count(cls, user):
+        return cls.objects.filter(user=user).values_list(
+            "friends_count", flat=True
+        ).first() or 0
+
+    @classmethod
+    async def aget_count(cls, user):
+        return await cls.objects.filter(user=user).values_list(
+            "friends_count", flat=True
+        ).afirst() or 0
+
+
+class FriendEdgeChange(models.Model):
+    """
+    Журнал изменений связей Friend для инкрементального обновления графа
+    друзей (graph.py). Пишется в той же транзакции, что и изменение связи.
+    """
+
+    user = models.UUIDField()
+    friend = models.UUIDField()
+    added = models.BooleanField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Окно FRIEND_GRAPH_CHANGES_LAG в FriendGraph._changes_since
+        indexes = [
+            models.Index(fields=["created_at"], name="friend_edge_change_at_idx"),
+        ]
+
+    @classmethod
+    def record(cls, edges, added):
+        """
+        Записывает изменения пар (user, friend) одним INSERT.
+        """
+        cls.objects.bulk_create(
+            [cls(user=user, friend=friend, added=added) for user, friend in edges]
+        )
 
 
 class FriendRequest(models.Model):
@@ -31,6 +126,43 @@ class FriendRequest(models.Model):
             "from_user",
             "to_user",
         )
+        # Частичные индексы только по непринятым запросам: списки входящих и
+        # исходящих и поиск просроченных для sweep_friend_requests
+        indexes = [
+            models.Index(
+                fields=["to_user", "-created_at", "-id"],
+                condition=Q(is_accepted=False),
+                name="friendreq_incoming_idx",
+            ),
+            models.Index(
+                fields=["from_user", "-created_at", "-id"],
+                condition=Q(is_accepted=False),
+                name="friendreq_outgoing_idx",
+            ),
+            models.Index(
+                fields=["created_at"],
+                condition=Q(is_accepted=False),
+                name="friendreq_pending_created_idx",
+            ),
+            models.Index(
+                fields=["id"],
+                condition=Q(is_accepted=True),
+                name="friendreq_accepted_idx",
+            ),
+        ]
+
+    @classmethod
+    def pending(cls):
+        """
+        Непринятые и не просроченные запросы.
+        """
+        return cls.objects.filter(
+            is_accepted=False, created_at__gte=cls.expired_before()
+        )
+
+    @staticmethod
+    def expired_before():
+        return timezone.now() - timedelta(days=settings.FRIEND_REQUEST_TTL_DAYS)
 
 
 class FavoriteUser(models.Model):
@@ -1,3 +1,11 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
@@ -12,3 +20,133 @@ class CustomPagination(PageNumberPagination):
             'count': self.page.paginator.count,
             'results': data
         })
+
+
+class KeysetPagination:
+    """
+    Keyset (cursor) паджинация по паре (created_at, id) в порядке убывания.
+
+    В БД уходит только запрос текущей страницы: WHERE по курсору + LIMIT,
+    без OFFSET и без выборки всех строк. Ответ сохраняет формат
+    CustomPagination (page/page_size/count/results) и дополнительно отдает
+    курсор следующей страницы в ключе next.
+
+    Параметр page без курсора оставлен для совместимости и выбирает
+    страницу через OFFSET не глубже max_offset строк, дальше листать
+    можно только по курсору.
+    """
+    page_size_query_param = 'page_size'
+    page_query_param = 'page'
+    cursor_query_param = 'cursor'
+    max_page_size = 100
+    max_offset = 1000
+
+    def __init__(self):
+        self.page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+        self.page_number = 1
+        self.count = 0
+        self.next_cursor = None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Возвращает ленивый queryset с одной страницей (+1 строка, чтобы понять,
+        есть ли следующая). Если передан курсор, страница выбирается по ключу,
+        иначе по номеру страницы из параметра page.
+        """
+        self.request = request
+        self.current_page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            self.page_number, created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) |
+                Q(created_at=created_at, id__lt=pk)
+            )
+            offset = 0
+        else:
+            try:
+                self.page_number = max(
+                    int(request.query_params.get(self.page_query_param, 1)), 1
+                )
+            except ValueError:
+                raise NotFound("Invalid page.")
+            offset = (self.page_number - 1) * self.current_page_size
+            if offset > self.max_offset:
+                raise NotFound("Invalid page. Use cursor for deep pages.")
+
+        return queryset[offset:offset + self.current_page_size + 1]
+
+    def set_page(self, rows, count):
+        """
+        Принимает вычисленные строки страницы и общее количество записей,
+        формирует курсор следующей страницы и возвращает строки страницы.
+        """
+        rows = list(rows)
+        self.count = count
+        self.next_cursor = None
+        if len(rows) > self.current_page_size:
+            rows = rows[:self.current_page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(
+                self.page_number + 1, last.created_at, last.id
+            )
+        return rows
+
+    def paginate_queryset(self, queryset, request, count):
+        """
+        Синхронный вариант: выбирает страницу из queryset.
+
+        :param count: Количество записей или callable, который его вернет.
+        """
+        rows = self.get_page_queryset(queryset, request)
+        return self.set_page(rows, count() if callable(count) else count)
+
+    async def apaginate_queryset(self, queryset, request, count):
+        """
+        Асинхронный вариант paginate_queryset для async представлений.
+
+        :param count: Количество записей или корутина-функция, которая его вернет.
+        """
+        rows = [row async for row in self.get_page_queryset(queryset, request)]
+        return self.set_page(rows, await count() if callable(count) else count)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'page': self.page_number,
+            'page_size': self.current_page_size,
+            'count': self.count,
+            'next': self.next_cursor,
+            'results': data
+        })
+
+    @staticmethod
+    def encode_cursor(page_number, created_at, pk):
+        payload = json.dumps(
+            [page_number, created_at.isoformat(), pk], separators=(',', ':')
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            page_number, created_at, pk = json.loads(
+                base64.urlsafe_b64decode(cursor.encode())
+            )
+            created_at = parse_datetime(created_at)
+            page_number, pk = int(page_number), int(pk)
+        except (binascii.Error, ValueError, TypeError):
+            raise NotFound("Invalid cursor.")
+        if created_at is None:
+            raise NotFound("Invalid cursor.")
+        return page_number, created_at, pk
@@ -0,0 +1,17 @@
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class HasServiceToken(BasePermission):
+    """
+    Доступ для других микросервисов по общему токену в заголовке
+    X-Service-Token. Если SERVICE_TOKEN не задан, доступ закрыт.
+    """
+
+    def has_permission(self, request, view):
+        token = request.headers.get("X-Service-Token", "")
+        return bool(settings.SERVICE_TOKEN) and hmac.compare_digest(
+            token, settings.SERVICE_TOKEN
+        )
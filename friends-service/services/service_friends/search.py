@@ -0,0 +1,50 @@
+import re
+
+from asgiref.sync import sync_to_async
+
+from .cache import profile_cards
+from .models import Friend
+
+_spaces = re.compile(r'\s+')
+
+
+def normalize_name(value):
+    """
+    Приводит имя к виду для поиска: нижний регистр, ё -> е, одиночные пробелы.
+    """
+    value = (value or '').casefold().replace('ё', 'е')
+    return _spaces.sub(' ', value).strip()
+
+
+def friend_name_fields(card):
+    """
+    Денормализованная строка поиска по имени друга для связей Friend.
+    """
+    names = (
+        normalize_name(card.get(field))
+        for field in ('first_name', 'last_name', 'username')
+    )
+    return {'friend_search': ' '.join(filter(None, names))}
+
+
+def update_friend_names(cards):
+    """
+    Обновляет индекс имен во всех связях, где юзер из карточки - друг.
+    """
+    for card in cards:
+        Friend.objects.filter(friend=card['id']).update(**friend_name_fields(card))
+
+
+def index_friend_names(user_ids):
+    """
+    Загружает карточки юзеров и обновляет индекс имен их связей.
+    """
+    update_friend_names(profile_cards.get_cards(user_ids))
+
+
+async def aindex_friend_names(user_ids):
+    """
+    Асинхронный вариант index_friend_names.
+    """
+    cards = await profile_cards.aget_cards(user_ids)
+    await sync_to_async(update_friend_names)(cards)
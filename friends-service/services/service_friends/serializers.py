@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Friend, FriendRequest, FavoriteUser
 from django.contrib.auth.models import User
@@ -64,7 +65,10 @@ class FriendProfileSerializer(serializers.Serializer):
     Сериализация ответа сервиса Profile для получения списка друзей по айди
     """
 
-    id = serializers.IntegerField()  # 'id' is an integer field
+    id = serializers.UUIDField()
+    username = serializers.CharField(
+        max_length=150, allow_blank=True, required=False
+    )
     first_name = serializers.CharField(max_length=255)
     last_name = serializers.CharField(max_length=255, allow_blank=True)
     avatar = serializers.URLField(allow_null=True, required=False)
@@ -72,3 +76,42 @@ class FriendProfileSerializer(serializers.Serializer):
         child=serializers.CharField(),
         allow_empty=True
     )
+
+
+class ProfileIdsSerializer(serializers.Serializer):
+    """
+    Список UUID профилей.
+    """
+
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False
+    )
+
+
+class FriendBulkSerializer(serializers.Serializer):
+    """
+    Список UUID юзеров для пакетных операций, не более FRIENDS_BULK_MAX.
+    """
+
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=settings.FRIENDS_BULK_MAX
+    )
+
+
+class FriendStatusSerializer(serializers.Serializer):
+    """
+    Запрос статусов отношений для списка юзеров.
+    """
+
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=settings.FRIENDS_STATUS_MAX
+    )
+    encoding = serializers.ChoiceField(
+        choices=["json", "bitset"],
+        default="json"
+    )
@@ -1,6 +1,144 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
 import httpx
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from config.messages_config.error_messages import get_message
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileServiceError(Exception):
+    """
+    Сервис Profile не ответил или вернул некорректные данные.
+    """
+
+    def __init__(self, detail, errors=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.errors = errors
+
+
+class HttpClientPool:
+    """
+    Общий на процесс пул HTTP соединений с keep-alive.
+
+    Клиент создается лениво при первом запросе и пересоздается в дочернем
+    процессе после fork (gunicorn preload), чтобы воркеры не делили между
+    собой сокеты родителя.
+    """
+
+    def __init__(self):
+        self.reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        """
+        Сбрасывает клиент без закрытия: вызывается в дочернем процессе,
+        где сокеты родителя использовать нельзя.
+        """
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "clients_created": 0,
+        }
+
+    def get_client(self):
+        if self._client is not None and self._pid == os.getpid():
+            return self._client
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._client = self._create_client()
+                self._pid = os.getpid()
+                self._stats["clients_created"] += 1
+        return self._client
+
+    def get_async_client(self):
+        """
+        Асинхронный клиент для текущего event loop.
+
+        Используется только при PROFILE_HTTP_ASYNC (ASGI): у воркера один
+        loop на весь процесс, поэтому клиент и его пул соединений общие для
+        всех запросов воркера и закрываются вместе с процессом.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(**self._client_options())
+            self._async_clients[loop] = client
+            self._stats["clients_created"] += 1
+        return client
+
+    def _create_client(self):
+        return httpx.Client(**self._client_options())
+
+    def _client_options(self):
+        http2 = settings.PROFILE_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("Пакет h2 не установлен, HTTP/2 отключен")
+                http2 = False
+        return dict(
+            http2=http2,
+            # Клиенты общие для всех пользователей: cookie ответов (например,
+            # привязка чтения к primary в сервисе Profile) не сохраняются
+            cookies=CookieJar(DefaultCookiePolicy(allowed_domains=[])),
+            timeout=httpx.Timeout(
+                settings.PROFILE_HTTP_TIMEOUT,
+                connect=settings.PROFILE_HTTP_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.PROFILE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PROFILE_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.PROFILE_HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    def record(self, key):
+        self._stats[key] += 1
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    def stats(self):
+        """
+        Статистика пула для подбора лимитов под нагрузкой.
+        """
+        result = dict(self._stats, pid=os.getpid())
+        result["max_connections"] = settings.PROFILE_HTTP_MAX_CONNECTIONS
+        result["max_keepalive_connections"] = settings.PROFILE_HTTP_MAX_KEEPALIVE
+        connections = []
+        if self._client is not None and self._pid == os.getpid():
+            # У httpx нет публичного API для состояния пула, берем его у httpcore
+            pool = getattr(self._client._transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+        result["connections"] = len(connections)
+        result["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+        result["active_connections"] = result["connections"] - result["idle_connections"]
+        result["async_clients"] = len(self._async_clients)
+        return result
+
+
+http_pool = HttpClientPool()
+
 
 class MicroserviceClient:
     """
@@ -15,29 +153,138 @@ class MicroserviceClient:
             endpoint,
             headers=None,
             params=None,
+            timeout=None,
             *args,
             **kwargs
     ):
+        """
+        GET запрос в микросервис через общий пул соединений.
 
-        url = settings.PROFILE_MICROSERVICE_URL
+        :param timeout: Бюджет времени на запрос в секундах, по умолчанию
+            PROFILE_HTTP_TIMEOUT.
+        """
+        client = http_pool.get_client()
+        http_pool.record("requests")
+        try:
+            response = client.get(
+                f'{self.base_url}{endpoint}',
+                headers=headers,
+                params=params,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+            response.raise_for_status()
+
+            return response.json()
+
+        except httpx.HTTPError as err:
+            return self._error_response(err)
 
+    async def aget_data_from_microservice(
+            self,
+            endpoint,
+            headers=None,
+            params=None,
+            timeout=None,
+            *args,
+            **kwargs
+    ):
+        """
+        Асинхронный вариант get_data_from_microservice на httpx.AsyncClient.
+
+        Под WSGI adrf выполняет каждый запрос в новом event loop, и клиент
+        на loop не переиспользовал бы соединения. Поэтому без
+        PROFILE_HTTP_ASYNC запрос уходит через синхронный пул в потоке.
+        """
+        if not settings.PROFILE_HTTP_ASYNC:
+            return await sync_to_async(
+                self.get_data_from_microservice, thread_sensitive=False
+            )(endpoint, headers=headers, params=params, timeout=timeout)
+        client = http_pool.get_async_client()
+        http_pool.record("requests")
+        try:
+            response = await client.get(
+                f'{self.base_url}{endpoint}',
+                headers=headers,
+                params=params,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+            response.raise_for_status()
+
+            return response.json()
+
+        except httpx.HTTPError as err:
+            return self._error_response(err)
+
+    def post_data_to_microservice(
+            self,
+            endpoint,
+            json=None,
+            headers=None,
+            timeout=None,
+            *args,
+            **kwargs
+    ):
+        """
+        POST запрос с JSON телом в микросервис через общий пул соединений.
+        """
+        client = http_pool.get_client()
+        http_pool.record("requests")
+        try:
+            response = client.post(
+                f'{self.base_url}{endpoint}',
+                json=json,
+                headers=headers,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+            response.raise_for_status()
+
+            return response.json()
+
+        except httpx.HTTPError as err:
+            return self._error_response(err)
+
+    async def apost_data_to_microservice(
+            self,
+            endpoint,
+            json=None,
+            headers=None,
+            timeout=None,
+            *args,
+            **kwargs
+    ):
+        """
+        Асинхронный вариант post_data_to_microservice.
+        """
+        if not settings.PROFILE_HTTP_ASYNC:
+            return await sync_to_async(
+                self.post_data_to_microservice, thread_sensitive=False
+            )(endpoint, json=json, headers=headers, timeout=timeout)
+        client = http_pool.get_async_client()
+        http_pool.record("requests")
         try:
-            with httpx.Client() as client:
-                response = client.get(
-                    f'{url}{endpoint}',
-                    headers=headers,
-                    params=params,
-                    timeout=5.0)
+            response = await client.post(
+                f'{self.base_url}{endpoint}',
+                json=json,
+                headers=headers,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
             response.raise_for_status()
 
             return response.json()
 
-        except httpx.HTTPStatusError as http_err:
-            return {"error": "HTTP error occurred", "details": str(http_err)}
-        except httpx.TimeoutException as timeout_err:
-            return {"error": "Timeout occurred", "details": str(timeout_err)}
-        except httpx.RequestError as req_err:
-            return {"error": "Request error", "details": str(req_err)}
+        except httpx.HTTPError as err:
+            return self._error_response(err)
+
+    @staticmethod
+    def _error_response(err):
+        if isinstance(err, httpx.HTTPStatusError):
+            http_pool.record("errors")
+            return {"error": "HTTP error occurred", "details": str(err)}
+        if isinstance(err, httpx.TimeoutException):
+            http_pool.record("timeouts")
+            return {"error": "Timeout occurred", "details": str(err)}
+        http_pool.record("errors")
+        return {"error": "Request error", "details": str(err)}
 
 
 class ProfileMicroserviceClient(MicroserviceClient):
@@ -48,3 +295,40 @@ class ProfileMicroserviceClient(MicroserviceClient):
     def __init__(self):
         default_base_url = settings.PROFILE_MICROSERVICE_URL
         super().__init__(default_base_url)
+
+    def get_profiles(self, user_ids):
+        """
+        Карточки профилей по списку ID одним POST запросом: ID передаются
+        в теле, поэтому их количество не ограничено длиной URL.
+
+        :return: Словарь {str(id): карточка}
+        """
+        response = self.post_data_to_microservice(
+            endpoint=settings.PROFILE_USERS_BATCH,
+            json=[str(user_id) for user_id in user_ids],
+        )
+        return self._parse_profiles(response)
+
+    async def aget_profiles(self, user_ids):
+        """
+        Асинхронный вариант get_profiles.
+        """
+        response = await self.apost_data_to_microservice(
+            endpoint=settings.PROFILE_USERS_BATCH,
+            json=[str(user_id) for user_id in user_ids],
+        )
+        return self._parse_profiles(response)
+
+    @staticmethod
+    def _parse_profiles(response):
+        from .serializers import FriendProfileSerializer
+
+        if not isinstance(response, list):
+            raise ProfileServiceError(get_message("not_found"))
+        serializer = FriendProfileSerializer(data=response, many=True)
+        if not serializer.is_valid():
+            raise ProfileServiceError(
+                "Invalid data received from the profile service",
+                serializer.errors,
+            )
+        return {str(item['id']): item for item in serializer.data}
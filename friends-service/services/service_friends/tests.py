@@ -0,0 +1,477 @@
+import base64
+import json
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Max
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .cache import ProfileCardCache, UserExistenceCache, shared_cache
+from .graph import FriendGraph, recommend_from_db
+from .graph_export import (
+    DeltaWindowError,
+    export_delta,
+    export_full,
+    load_delta,
+    read_users,
+)
+from .friendships import (
+    approve_friend_request,
+    bulk_approve_friend_requests,
+    bulk_delete_friends,
+    delete_friend,
+)
+from .models import (
+    FavoriteUser,
+    Friend,
+    FriendEdgeChange,
+    FriendRequest,
+    FriendStats,
+)
+from .pagination import KeysetPagination
+from .search import normalize_name, update_friend_names
+from .services import ProfileMicroserviceClient, http_pool
+from .views import FriendStatusView
+
+
+def make_request(**params):
+    return Request(APIRequestFactory().get('/', params))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = uuid.uuid4()
+        Friend.objects.bulk_create(
+            [Friend(user=self.user, friend=uuid.uuid4()) for _ in range(25)]
+        )
+        self.queryset = Friend.objects.filter(user=self.user)
+
+    def paginate(self, **params):
+        paginator = KeysetPagination()
+        rows = paginator.paginate_queryset(
+            self.queryset, make_request(**params), count=self.queryset.count
+        )
+        return paginator, rows
+
+    def test_cursor_walks_all_rows_in_order(self):
+        expected = list(
+            self.queryset.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        seen, params = [], {'page_size': 10}
+        while True:
+            paginator, rows = self.paginate(**params)
+            seen.extend(row.id for row in rows)
+            if paginator.next_cursor is None:
+                break
+            params = {'page_size': 10, 'cursor': paginator.next_cursor}
+        self.assertEqual(seen, expected)
+        self.assertEqual(paginator.page_number, 3)
+        self.assertEqual(paginator.count, 25)
+
+    def test_page_matches_cursor_page(self):
+        first, _ = self.paginate(page_size=10)
+        _, by_cursor = self.paginate(page_size=10, cursor=first.next_cursor)
+        _, by_page = self.paginate(page_size=10, page=2)
+        self.assertEqual([row.id for row in by_cursor], [row.id for row in by_page])
+
+    def test_deep_page_without_cursor_is_rejected(self):
+        limit = KeysetPagination.max_offset // 10 + 1
+        self.paginate(page_size=10, page=limit)
+        with self.assertRaises(NotFound):
+            self.paginate(page_size=10, page=limit + 1)
+
+    def test_invalid_cursor(self):
+        cursors = [
+            'not base64!',
+            base64.urlsafe_b64encode(b'not json').decode(),
+            base64.urlsafe_b64encode(b'[1, 2]').decode(),
+            base64.urlsafe_b64encode(b'[1, "not a date", 1]').decode(),
+            # Корректный JSON с неверными типами
+            base64.urlsafe_b64encode(
+                json.dumps([[1], '2020-01-01T00:00:00', 1]).encode()
+            ).decode(),
+            base64.urlsafe_b64encode(
+                json.dumps([1, '2020-01-01T00:00:00', {}]).encode()
+            ).decode(),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.paginate(cursor=cursor)
+
+
+@override_settings(PROFILE_HTTP_ASYNC=False)
+class HttpClientPoolTests(SimpleTestCase):
+    def setUp(self):
+        http_pool.reset()
+        http_pool._client = httpx.Client(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={'path': request.url.path})
+        ))
+        http_pool._pid = os.getpid()
+        self.addCleanup(http_pool.close)
+
+    def test_async_calls_without_asgi_reuse_sync_client(self):
+        client = ProfileMicroserviceClient()
+        # Как под WSGI: каждый вызов в своем event loop
+        for _ in range(3):
+            self.assertEqual(
+                async_to_sync(client.aget_data_from_microservice)('/x/'),
+                {'path': '/x/'},
+            )
+        stats = http_pool.stats()
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['async_clients'], 0)
+
+    def test_response_cookies_are_not_kept(self):
+        client = httpx.Client(
+            transport=httpx.MockTransport(lambda request: httpx.Response(
+                200, headers={'Set-Cookie': 'read_primary=1; Path=/'},
+                json={'cookie': request.headers.get('Cookie')},
+            )),
+            **http_pool._client_options(),
+        )
+        self.addCleanup(client.close)
+        client.get('http://profile/api/friend-profiles/batch/')
+        response = client.get('http://profile/api/friend-profiles/batch/')
+        self.assertIsNone(response.json()['cookie'])
+
+
+class SharedCacheTests(SimpleTestCase):
+    @override_settings(PROFILE_CARDS_CACHE_ALLOW_LOCAL=False)
+    def test_local_memory_shared_cache_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            shared_cache()
+
+    def test_unreachable_shared_cache_falls_back_to_profile_service(self):
+        user_id = str(uuid.uuid4())
+        card = {'id': user_id, 'username': 'ivan'}
+        with mock.patch.object(
+            shared_cache(), 'get_many', side_effect=ConnectionError('redis down')
+        ), mock.patch.object(
+            shared_cache(), 'set_many', side_effect=ConnectionError('redis down')
+        ), mock.patch(
+            'services.service_friends.cache.ProfileMicroserviceClient.get_profiles',
+            return_value={user_id: card},
+        ) as get_profiles:
+            cards = ProfileCardCache()
+            self.assertEqual(cards.get_cards([user_id]), [card])
+            # Второй раз карточка берется из локального LRU
+            self.assertEqual(cards.get_cards([user_id]), [card])
+        self.assertEqual(get_profiles.call_count, 1)
+
+
+class UserExistenceTests(SimpleTestCase):
+    def setUp(self):
+        shared_cache().clear()
+        self.user_id = str(uuid.uuid4())
+        self.existence = UserExistenceCache()
+        self.existence.set_known_users([self.user_id])
+
+    def check(self, response):
+        with mock.patch(
+            'services.service_friends.cache.ProfileMicroserviceClient.aget_data_from_microservice',
+            return_value=response,
+        ) as request:
+            exists = async_to_sync(self.existence.aexists)(self.user_id)
+        return exists, request.call_count
+
+    def test_bloom_hit_is_confirmed_by_profile_service(self):
+        # Ложноположительный ответ фильтра не пропускает несуществующего юзера
+        self.assertEqual(self.check({'exists': False}), (False, 1))
+
+    def test_confirmed_answer_is_cached(self):
+        self.assertEqual(self.check({'exists': True}), (True, 1))
+        self.assertEqual(self.check({'exists': True}), (True, 0))
+
+    def test_bloom_is_used_when_profile_service_is_down(self):
+        self.assertEqual(self.check({'error': 'Request error'}), (True, 1))
+        # Юзер, на котором фильтр не ошибается
+        self.user_id = str(uuid.uuid4())
+        while self.user_id in self.existence._known_users:
+            self.user_id = str(uuid.uuid4())
+        self.assertEqual(self.check({'error': 'Request error'}), (False, 1))
+
+
+class FriendNameSearchTests(TestCase):
+    def test_search_string_is_built_from_card(self):
+        user, friend = uuid.uuid4(), uuid.uuid4()
+        Friend.objects.create(user=user, friend=friend)
+        update_friend_names([{
+            'id': str(friend), 'first_name': '  Пётр ', 'last_name': 'Иванов',
+            'username': 'Petr_I',
+        }])
+        self.assertEqual(
+            Friend.objects.get(user=user).friend_search, 'петр иванов petr_i'
+        )
+        self.assertTrue(Friend.objects.filter(
+            user=user, friend_search__contains=normalize_name('ПЁТР ИВ')
+        ).exists())
+
+
+class BulkOperationsTests(TestCase):
+    def setUp(self):
+        self.user = uuid.uuid4()
+        self.others = [uuid.uuid4() for _ in range(3)]
+
+    def count(self, user):
+        return FriendStats.get_count(user)
+
+    def test_bulk_approve(self):
+        pending, unknown = self.others[:2], self.others[2]
+        FriendRequest.objects.bulk_create(
+            [FriendRequest(from_user=self.user, to_user=other) for other in pending]
+        )
+        results = bulk_approve_friend_requests(self.user, [*pending, unknown])
+        self.assertEqual(
+            results,
+            {pending[0]: 'approved', pending[1]: 'approved', unknown: 'not_found'},
+        )
+        self.assertEqual(Friend.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Friend.objects.filter(friend=self.user).count(), 2)
+        self.assertEqual(self.count(self.user), 2)
+        self.assertEqual(self.count(pending[0]), 1)
+        self.assertEqual(FriendEdgeChange.objects.filter(added=True).count(), 4)
+
+        # Повторное одобрение ничего не меняет
+        results = bulk_approve_friend_requests(self.user, pending)
+        self.assertEqual(set(results.values()), {'not_found'})
+        self.assertEqual(self.count(self.user), 2)
+
+    def test_bulk_delete(self):
+        Friend.objects.bulk_create(
+            [Friend(user=self.user, friend=other) for other in self.others[:2]]
+        )
+        FriendStats.apply_deltas({self.user: 2})
+        results = bulk_delete_friends(self.user, self.others)
+        self.assertEqual(results, {
+            self.others[0]: 'deleted',
+            self.others[1]: 'deleted',
+            self.others[2]: 'not_found',
+        })
+        self.assertFalse(Friend.objects.filter(user=self.user).exists())
+        self.assertEqual(self.count(self.user), 0)
+        self.assertEqual(FriendEdgeChange.objects.filter(added=False).count(), 2)
+        # Счетчик не уходит в минус при повторном удалении
+        bulk_delete_friends(self.user, self.others)
+        self.assertEqual(self.count(self.user), 0)
+
+    def test_approve(self):
+        other = self.others[0]
+        FriendRequest.objects.create(from_user=self.user, to_user=other)
+        self.assertTrue(approve_friend_request(self.user, other))
+        self.assertEqual(self.count(self.user), 1)
+        self.assertEqual(self.count(other), 1)
+        self.assertEqual(
+            set(FriendEdgeChange.objects.filter(added=True).values_list('user', 'friend')),
+            {(self.user, other), (other, self.user)},
+        )
+        # Повторное одобрение не меняет счетчики и журнал
+        self.assertFalse(approve_friend_request(self.user, other))
+        self.assertEqual(self.count(self.user), 1)
+        self.assertEqual(FriendEdgeChange.objects.count(), 2)
+
+    def test_delete(self):
+        other = self.others[0]
+        Friend.objects.create(user=self.user, friend=other)
+        FriendStats.apply_deltas({self.user: 1})
+        self.assertTrue(delete_friend(self.user, other))
+        self.assertEqual(self.count(self.user), 0)
+        self.assertEqual(
+            list(FriendEdgeChange.objects.values_list('user', 'friend', 'added')),
+            [(self.user, other, False)],
+        )
+        self.assertFalse(delete_friend(self.user, other))
+        self.assertEqual(self.count(self.user), 0)
+        self.assertEqual(FriendEdgeChange.objects.count(), 1)
+
+
+@override_settings(FRIEND_GRAPH_REFRESH=0)
+class FriendGraphTests(TestCase):
+    def setUp(self):
+        shared_cache().clear()
+        self.me, self.a, self.b, self.c, self.d = (uuid.uuid4() for _ in range(5))
+        # me - a, me - b; a и b дружат с c, b с d
+        for user, friend in (
+            (self.me, self.a), (self.me, self.b),
+            (self.a, self.c), (self.b, self.c), (self.b, self.d),
+        ):
+            FriendRequest.objects.create(from_user=user, to_user=friend)
+            approve_friend_request(user, friend)
+
+    def test_without_snapshot_falls_back_to_db(self):
+        graph = FriendGraph()
+        self.assertEqual(graph.recommend(self.me, 10), [(self.c, 2), (self.d, 1)])
+        # Воркер не собирает граф полным чтением таблицы
+        self.assertFalse(graph.loaded)
+
+    def test_snapshot_with_changes(self):
+        FriendGraph().build()
+        graph = FriendGraph()
+        self.assertEqual(graph.recommend(self.me, 10), [(self.c, 2), (self.d, 1)])
+        self.assertTrue(graph.loaded)
+        bulk_delete_friends(self.b, [self.d])
+        self.assertEqual(graph.recommend(self.me, 10), [(self.c, 2)])
+        self.assertEqual(recommend_from_db(self.me, 10), [(self.c, 2)])
+
+    def test_change_committed_late_with_lower_id(self):
+        FriendGraph().build()
+        graph = FriendGraph()
+        graph.recommend(self.me, 10)
+        last_id = FriendEdgeChange.objects.aggregate(last_id=Max('id'))['last_id']
+        # Транзакция с id last_id + 2 коммитится раньше транзакции с last_id + 1
+        Friend.objects.create(user=self.a, friend=self.d)
+        FriendEdgeChange.objects.create(
+            id=last_id + 2, user=self.a, friend=self.d, added=True
+        )
+        self.assertEqual(graph.recommend(self.me, 10), [(self.c, 2), (self.d, 2)])
+        Friend.objects.filter(user=self.b, friend=self.d).delete()
+        FriendEdgeChange.objects.create(
+            id=last_id + 1, user=self.b, friend=self.d, added=False
+        )
+        self.assertEqual(graph.recommend(self.me, 10), [(self.c, 2), (self.d, 1)])
+        self.assertEqual(recommend_from_db(self.me, 10), [(self.c, 2), (self.d, 1)])
+        self.assertEqual(graph.change_id, last_id + 2)
+
+
+class ExpiredFriendRequestTests(TestCase):
+    def setUp(self):
+        self.user, self.other = uuid.uuid4(), uuid.uuid4()
+        request = FriendRequest.objects.create(from_user=self.user, to_user=self.other)
+        # Просрочен, но еще не удален sweep_friend_requests
+        FriendRequest.objects.filter(pk=request.pk).update(
+            created_at=timezone.now() - timedelta(days=settings.FRIEND_REQUEST_TTL_DAYS + 1)
+        )
+
+    def test_expired_request_is_not_approved(self):
+        self.assertFalse(approve_friend_request(self.user, self.other))
+        self.assertEqual(
+            bulk_approve_friend_requests(self.user, [self.other]),
+            {self.other: 'not_found'},
+        )
+        self.assertFalse(Friend.objects.exists())
+        self.assertFalse(FriendRequest.objects.filter(is_accepted=True).exists())
+
+
+class GraphExportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.user, self.kept, self.readded, self.removed, self.flash = (
+            uuid.uuid4() for _ in range(5)
+        )
+        for friend in (self.kept, self.readded, self.removed):
+            FriendRequest.objects.create(from_user=self.user, to_user=friend)
+            approve_friend_request(self.user, friend)
+        self.since = timezone.now()
+        export_full(self.directory, self.since)
+
+    def delta_pairs(self):
+        manifest = export_delta(self.directory, self.since, timezone.now())
+        users = [uuid.UUID(bytes=bytes(row)) for row in read_users(self.directory)]
+        added, removed = load_delta(
+            os.path.join(self.directory, manifest['deltas'][-1]['file'])
+        )
+        return (
+            {(users[a], users[b]) for a, b in added.tolist()},
+            {(users[a], users[b]) for a, b in removed.tolist()},
+        )
+
+    def befriend(self, friend):
+        FriendRequest.objects.filter(from_user=self.user, to_user=friend).delete()
+        FriendRequest.objects.create(from_user=self.user, to_user=friend)
+        approve_friend_request(self.user, friend)
+
+    def test_each_edge_is_exported_in_final_state(self):
+        bulk_delete_friends(self.user, [self.readded, self.removed])
+        self.befriend(self.readded)
+        # Добавлена и удалена внутри окна
+        self.befriend(self.flash)
+        bulk_delete_friends(self.user, [self.flash])
+
+        added, removed = self.delta_pairs()
+        self.assertIn((self.user, self.readded), added)
+        self.assertNotIn((self.user, self.readded), removed)
+        self.assertEqual(removed, {(self.user, self.removed)})
+        self.assertNotIn((self.user, self.flash), added | removed)
+
+    def test_rerun_after_crash_does_not_duplicate_users(self):
+        self.befriend(self.flash)
+        until = timezone.now()
+        with mock.patch(
+            'services.service_friends.graph_export.write_manifest',
+            side_effect=OSError('disk full'),
+        ):
+            with self.assertRaises(OSError):
+                export_delta(self.directory, self.since, until)
+        manifest = export_delta(self.directory, self.since, until)
+        self.assertEqual(manifest['users'], 5)
+        self.assertEqual(
+            os.path.getsize(os.path.join(self.directory, 'users.uuid')), 5 * 16
+        )
+        self.assertEqual(
+            [delta['file'] for delta in manifest['deltas']], ['delta-0001.bin']
+        )
+
+    def test_window_older_than_change_log_is_rejected(self):
+        with override_settings(FRIEND_GRAPH_CHANGES_RETENTION=0):
+            with self.assertRaises(DeltaWindowError):
+                export_delta(self.directory, self.since, timezone.now())
+
+
+class FriendStatusTests(TestCase):
+    def setUp(self):
+        self.user = uuid.uuid4()
+        self.ids = [uuid.uuid4() for _ in range(10)]
+        Friend.objects.create(user=self.user, friend=self.ids[0])
+        FriendRequest.objects.create(from_user=self.user, to_user=self.ids[1])
+        FriendRequest.objects.create(from_user=self.ids[9], to_user=self.user)
+        FavoriteUser.objects.create(user=self.user, favorite=self.ids[0])
+        FavoriteUser.objects.create(user=self.user, favorite=self.ids[8])
+
+    def post(self, **data):
+        request = APIRequestFactory().post(
+            '/status/', dict(data, ids=[str(user_id) for user_id in self.ids]),
+            format='json',
+        )
+        force_authenticate(
+            request, user=SimpleNamespace(id=self.user, is_authenticated=True)
+        )
+        return async_to_sync(FriendStatusView.as_view())(request)
+
+    def test_json(self):
+        results = self.post().data['results']
+        self.assertEqual(results[0], {
+            'id': self.ids[0], 'is_friend': True, 'request_sent': False,
+            'request_received': False, 'is_favorite': True,
+        })
+        self.assertTrue(results[1]['request_sent'])
+        self.assertTrue(results[9]['request_received'])
+        self.assertFalse(any(results[5][flag] for flag in FriendStatusView.flags))
+
+    def test_bitset(self):
+        data = self.post(encoding='bitset').data
+        self.assertEqual(data['count'], 10)
+        flags = {
+            flag: base64.b64decode(value) for flag, value in data['flags'].items()
+        }
+        # Бит i (младший первым) относится к ids[i], 10 бит - 2 байта
+        self.assertEqual(flags['is_friend'], bytes([0b00000001, 0]))
+        self.assertEqual(flags['request_sent'], bytes([0b00000010, 0]))
+        self.assertEqual(flags['request_received'], bytes([0, 0b00000010]))
+        self.assertEqual(flags['is_favorite'], bytes([0b00000001, 0b00000001]))
+
+    def test_expired_request_is_not_reported(self):
+        FriendRequest.objects.filter(to_user=self.ids[1]).update(
+            created_at=timezone.now() - timedelta(days=settings.FRIEND_REQUEST_TTL_DAYS + 1)
+        )
+        self.assertFalse(self.post().data['results'][1]['request_sent'])
@@ -1,9 +1,14 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from .views import (
     FavoriteUserView,
+    FriendBulkView,
+    FriendRequestListView,
+    FriendStatusView,
     FriendsListView,
     FriendRequestViewSet,
     FriendDeleteView,
+    HttpPoolStatsView,
+    ProfileCardInvalidateView,
 )
 from rest_framework.routers import DefaultRouter
 
@@ -11,6 +16,31 @@ router = DefaultRouter()
 router.register('', FriendsListView, basename='friends')
 
 urlpatterns = [
+    path(
+        "http-pool/stats/",
+        HttpPoolStatsView.as_view(),
+        name="http-pool-stats"
+    ),
+    path(
+        "profile-cache/invalidate/",
+        ProfileCardInvalidateView.as_view(),
+        name="profile-cache-invalidate"
+    ),
+    path(
+        "status/",
+        FriendStatusView.as_view(),
+        name="friend-status"
+    ),
+    re_path(
+        r"^requests/(?P<direction>incoming|outgoing)/$",
+        FriendRequestListView.as_view(),
+        name="friend-requests"
+    ),
+    re_path(
+        r"^bulk/(?P<operation>approve|decline|delete|favorite)/$",
+        FriendBulkView.as_view(),
+        name="friend-bulk"
+    ),
     path("", include(router.urls)),
     path(
         "request/<int:user_id>/",
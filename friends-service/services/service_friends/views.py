@@ -1,16 +1,53 @@
+import asyncio
+import base64
+import logging
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from adrf import views as async_views
+from adrf import viewsets as async_viewsets
 from rest_framework.decorators import action
-from rest_framework import views, viewsets, status
+from rest_framework import views, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from .models import Friend, FriendRequest, FavoriteUser
-from .serializers import FriendProfileSerializer
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from .models import Friend, FriendRequest, FavoriteUser, FriendStats
+from .friendships import (
+    afriendship_flags,
+    approve_friend_request,
+    bulk_add_favorites,
+    bulk_approve_friend_requests,
+    bulk_decline_friend_requests,
+    bulk_delete_friends,
+    delete_friend,
+)
+from .serializers import (
+    FriendBulkSerializer,
+    FriendStatusSerializer,
+    ProfileIdsSerializer,
+)
 from config.messages_config.error_messages import get_message
-from .services import ProfileMicroserviceClient
+from .services import ProfileServiceError, http_pool
+from .cache import profile_cards, user_existence
+from .graph import friend_graph
+from .permissions import HasServiceToken
+from .search import aindex_friend_names, normalize_name
 from django.conf import settings
-from .pagination import CustomPagination
+from .pagination import KeysetPagination
+
+logger = logging.getLogger(__name__)
+
+
+def profile_service_error_response(error):
+    """
+    Ответ на ошибку обращения к сервису Profile.
+    """
+    data = {"detail": error.detail}
+    if error.errors:
+        data["errors"] = error.errors
+    return Response(data, status=status.HTTP_400_BAD_REQUEST)
 
 
-class FriendsListView(viewsets.ReadOnlyModelViewSet):
+class FriendsListView(async_viewsets.ViewSet):
     """
     Получение списка друзей.
     Если передан user_id, то получаем список друзей для этого юзера, если
@@ -18,77 +55,95 @@ class FriendsListView(viewsets.ReadOnlyModelViewSet):
     """
     permission_classes = [IsAuthenticated]
 
-    def list(self, request):
+    async def list(self, request):
         user_id = self.request.GET.get(
             'user_id', self.request.user.id
         )
-        friends_ids = Friend.objects.filter(
-            user=user_id
-        ).order_by("-created_at").values_list('friend', flat=True)
-        params = {"ids": ",".join(map(str, friends_ids))}
-        client = ProfileMicroserviceClient()
-        friends = client.get_data_from_microservice(
-            endpoint=settings.PROFILE_USERS_BY_LIST_IDS,
-            params=params,
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(
+            Friend.objects.filter(user=user_id).only(
+                'id', 'friend', 'created_at'
+            ),
+            request,
+            count=lambda: FriendStats.aget_count(user_id),
         )
-        if not friends:
-            return Response(
-                {"detail": get_message("not_found")},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        serializer = FriendProfileSerializer(
-            data=friends['results'],
-            many=True
-        )
-        if not serializer.is_valid():
-            return Response(
-                {
-                    "detail": "Invalid data received from the profile service",
-                    "errors": serializer.errors
-                },
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        friends_ids = [row.friend for row in page]
+        if not friends_ids:
+            return paginator.get_paginated_response([])
 
-        paginator = CustomPagination()
-        paginated_data = paginator.paginate_queryset(serializer.data, request)
-
-        return paginator.get_paginated_response(paginated_data)
+        try:
+            results = await profile_cards.aget_cards(friends_ids)
+        except ProfileServiceError as e:
+            return profile_service_error_response(e)
+        return paginator.get_paginated_response(results)
 
     @action(detail=False, methods=['get'], url_path='search')
-    def search(self, request):
+    async def search(self, request):
         """
         Поиск друзей юезар из запроса по частичному совпадению с именем,
         юзернеймом, фамилией. Запрос "ха" -> "Михаил" "Харитонов" "Хакер".
+
+        Ищет по локальному индексу имен (см. search.py), карточки из сервиса
+        Profile запрашиваются только для найденной страницы.
         """
-        query = request.query_params.get("q", "")
-        if query:
-            friends_ids = Friend.objects.filter(
-                user=self.request.user.id
-            ).values_list('friend', flat=True)
-            params = {"ids": ",".join(map(str, friends_ids)), 'name': query}
-            client = ProfileMicroserviceClient()
-            friends = client.get_data_from_microservice(
-                endpoint=settings.PROFILE_USERS_SEARCH,
-                params=params,
-            )
-        if not friends['results']:
+        query = normalize_name(request.query_params.get("q", ""))
+        if not query:
             return Response(
                 {"detail": get_message("friend_not_found")},
                 status=200
             )
-        serializer = FriendProfileSerializer(
-            data=friends['results'],
-            many=True
+        friends = Friend.objects.filter(
+            user=self.request.user.id, friend_search__contains=query
         )
-        if not serializer.is_valid():
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(
+            friends.only('id', 'friend', 'created_at'),
+            request,
+            count=friends.acount,
+        )
+        if not page:
             return Response(
-                {
-                    "detail": "Invalid data received from the profile service",
-                    "errors": serializer.errors
-                },
-                status=status.HTTP_400_BAD_REQUEST
+                {"detail": get_message("friend_not_found")},
+                status=200
+            )
+
+        try:
+            results = await profile_cards.aget_cards(
+                [row.friend for row in page]
+            )
+        except ProfileServiceError as e:
+            return profile_service_error_response(e)
+        return paginator.get_paginated_response(results)
+
+
+    @action(detail=False, methods=['get'], url_path='recommendations')
+    async def recommendations(self, request):
+        """
+        "Возможно, вы знакомы": друзья друзей по количеству общих друзей.
+        """
+        try:
+            limit = min(
+                int(request.query_params.get('limit', 20)),
+                settings.FRIEND_RECOMMENDATIONS_MAX
             )
-        return Response(serializer.data)
+        except ValueError:
+            limit = 20
+        recommended = await sync_to_async(friend_graph.recommend)(
+            request.user.id, max(limit, 1)
+        )
+        if not recommended:
+            return Response({"results": []})
+
+        mutual = {str(user_id): count for user_id, count in recommended}
+        try:
+            cards = await profile_cards.aget_cards(list(mutual))
+        except ProfileServiceError as e:
+            return profile_service_error_response(e)
+        return Response({
+            "results": [
+                dict(card, mutual_friends=mutual[str(card['id'])]) for card in cards
+            ]
+        })
 
 
 class FriendDeleteView(views.APIView):
@@ -99,14 +154,12 @@ class FriendDeleteView(views.APIView):
 
     def delete(self, request, user_id=None):
         try:
-            friend = Friend.objects.get(user=request.user.id, friend=user_id)
-            friend.delete()
+            if not delete_friend(request.user.id, user_id):
+                return Response(
+                    {"detail": get_message("friend_not_found")},
+                    status=status.HTTP_404_NOT_FOUND
+                )
             return Response(status=status.HTTP_204_NO_CONTENT)
-        except Friend.DoesNotExist:
-            return Response(
-                {"detail": get_message("friend_not_found")},
-                status=status.HTTP_404_NOT_FOUND
-            )
 
         except Exception as e:
             return Response(
@@ -115,18 +168,26 @@ class FriendDeleteView(views.APIView):
             )
 
 
-class FriendRequestViewSet(viewsets.ViewSet):
+class FriendRequestViewSet(async_viewsets.ViewSet):
     """
     Создание запроса на добавление в друзья
     """
     permission_classes = [IsAuthenticated]
 
-    def create(self, request, user_id=None):
-        client = ProfileMicroserviceClient()
-        check_user = client.get_data_from_microservice(
-            endpoint=f'{settings.PROFILE_USER_CHECK}{user_id}/',
+    async def create(self, request, user_id=None):
+        # Проверка юзера в сервисе Profile и проверки в локальной БД
+        # независимы, поэтому выполняются одновременно
+        user_exists, already_friends, request_sent = await asyncio.gather(
+            user_existence.aexists(user_id),
+            Friend.objects.filter(
+                user=request.user.id, friend=user_id
+            ).aexists(),
+            FriendRequest.objects.filter(
+                from_user=request.user.id,
+                to_user=user_id
+            ).aexists(),
         )
-        if not check_user.get('exists'):
+        if not user_exists:
             return Response(
                 {"detail": get_message("invalid_user_id")},
                 status=status.HTTP_400_BAD_REQUEST
@@ -138,24 +199,19 @@ class FriendRequestViewSet(viewsets.ViewSet):
                 status=status.HTTP_409_CONFLICT
             )
 
-        if Friend.objects.filter(
-            user=request.user.id, friend=user_id
-        ).exists():
+        if already_friends:
             return Response(
                 {"detail": get_message("already_friends")},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if FriendRequest.objects.filter(
-            from_user=request.user.id,
-            to_user=user_id
-        ).exists():
+        if request_sent:
             return Response(
                 {"detail": get_message("friend_request_already_sent")},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        FriendRequest.objects.create(
+        await FriendRequest.objects.acreate(
             from_user=request.user.id,
             to_user=user_id
         )
@@ -164,30 +220,25 @@ class FriendRequestViewSet(viewsets.ViewSet):
             status=status.HTTP_201_CREATED
         )
 
-    def approve(self, request, user_id=None):
+    async def approve(self, request, user_id=None):
         """
         Одобрение запроса на добавление в друзья.
         """
-        try:
-            friend_request = FriendRequest.objects.get(
-                from_user=request.user.id, to_user=user_id, is_accepted=False
-            )
-        except FriendRequest.DoesNotExist:
+        approved = await sync_to_async(approve_friend_request)(
+            request.user.id, user_id
+        )
+        if not approved:
             return Response(
                 {"detail":  get_message("friend_request_not_found")},
                 status=status.HTTP_404_NOT_FOUND
             )
-        friend_request.is_accepted = True
-        friend_request.save()
 
-        Friend.objects.create(
-            user=request.user.id,
-            friend=user_id
-        )
-        Friend.objects.create(
-            user=user_id,
-            friend=request.user.id
-        )
+        try:
+            await aindex_friend_names([request.user.id, user_id])
+        except ProfileServiceError:
+            # Индекс имен дозаполнит команда reindex_friend_names
+            logger.warning("Не удалось проиндексировать имена друзей %s, %s",
+                           request.user.id, user_id)
 
         return Response(
             {"detail": "Friend request approved"},
@@ -195,34 +246,34 @@ class FriendRequestViewSet(viewsets.ViewSet):
         )
 
 
-class FavoriteUserView(views.APIView):
+class FavoriteUserView(async_views.APIView):
     """
     Управление избранными пользователями.
     """
 
     permission_classes = [IsAuthenticated]  # Проверка аутентификации
 
-    def post(self, request, user_id):
+    async def post(self, request, user_id):
         """
         Обработка POST-запроса для добавления пользователя в избранное.
         """
-        client = ProfileMicroserviceClient()
-        check_user = client.get_data_from_microservice(
-            endpoint=f'{settings.PROFILE_USER_CHECK}{user_id}/',
+        user_exists, already_added = await asyncio.gather(
+            user_existence.aexists(user_id),
+            FavoriteUser.objects.filter(
+                user=request.user.id, favorite=user_id
+            ).aexists(),
         )
-        if not check_user.get('exists'):
+        if not user_exists:
             return Response(
                 {"detail": get_message("invalid_user_id")}, status=400
             )
 
-        if FavoriteUser.objects.filter(
-            user=request.user.id, favorite=user_id
-        ).exists():
+        if already_added:
             return Response(
                 {"detail": get_message("favorite_already_added")}, status=400
             )
 
-        FavoriteUser.objects.create(
+        await FavoriteUser.objects.acreate(
             user=request.user.id,
             favorite=user_id
         )
@@ -230,16 +281,16 @@ class FavoriteUserView(views.APIView):
             {"detail": get_message("favorite_added")}, status=201
         )
 
-    def delete(self, request, user_id):
+    async def delete(self, request, user_id):
         """
         Обработка DELETE-запроса для удаления из избранного.
         """
         try:
-            favorite = FavoriteUser.objects.get(
-                user=request.user,
+            favorite = await FavoriteUser.objects.aget(
+                user=request.user.id,
                 favorite=user_id
             )
-            favorite.delete()
+            await favorite.adelete()
             return Response(status=status.HTTP_204_NO_CONTENT)
         except FavoriteUser.DoesNotExist:
             return Response(
@@ -249,3 +300,173 @@ class FavoriteUserView(views.APIView):
             return Response(
                 {"detail": get_message("forbidden_action")}, status=403
             )
+
+
+class FriendRequestListView(async_views.APIView):
+    """
+    Непринятые запросы в друзья: входящие (to_user - юзер запроса) или
+    исходящие (from_user - юзер запроса), новые сверху.
+    """
+    permission_classes = [IsAuthenticated]
+    user_fields = {
+        "incoming": ("to_user", "from_user"),
+        "outgoing": ("from_user", "to_user"),
+    }
+
+    async def get(self, request, direction):
+        user_field, other_field = self.user_fields[direction]
+        requests = FriendRequest.pending().filter(**{user_field: request.user.id})
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(
+            requests.only('id', 'created_at', other_field),
+            request,
+            count=requests.acount,
+        )
+        if not page:
+            return paginator.get_paginated_response([])
+
+        try:
+            cards = await profile_cards.aget_cards(
+                [getattr(row, other_field) for row in page]
+            )
+        except ProfileServiceError as e:
+            return profile_service_error_response(e)
+        created_at = {str(getattr(row, other_field)): row.created_at for row in page}
+        return paginator.get_paginated_response([
+            dict(card, request_created_at=created_at[str(card['id'])])
+            for card in cards
+        ])
+
+
+class FriendBulkView(async_views.APIView):
+    """
+    Пакетные операции над списком юзеров: approve, decline, delete, favorite.
+    Все изменения выполняются в одной транзакции, в ответе статус по каждому
+    ID в порядке запроса.
+    """
+    permission_classes = [IsAuthenticated]
+    operations = {
+        "approve": bulk_approve_friend_requests,
+        "decline": bulk_decline_friend_requests,
+        "delete": bulk_delete_friends,
+        "favorite": bulk_add_favorites,
+    }
+
+    async def post(self, request, operation):
+        serializer = FriendBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        user_ids = list(dict.fromkeys(serializer.validated_data['ids']))
+
+        results = {}
+        if operation == "favorite":
+            exists = await asyncio.gather(
+                *(user_existence.aexists(user_id) for user_id in user_ids)
+            )
+            results = {
+                user_id: "invalid_user_id"
+                for user_id, user_exists in zip(user_ids, exists)
+                if not user_exists
+            }
+        valid_ids = [user_id for user_id in user_ids if user_id not in results]
+        if valid_ids:
+            results.update(await sync_to_async(self.operations[operation])(
+                request.user.id, valid_ids
+            ))
+
+        if operation == "approve":
+            approved = [
+                user_id for user_id in user_ids if results[user_id] == "approved"
+            ]
+            if approved:
+                try:
+                    await aindex_friend_names([request.user.id, *approved])
+                except ProfileServiceError:
+                    logger.warning("Не удалось проиндексировать имена друзей %s",
+                                   request.user.id)
+
+        return Response({
+            "results": [
+                {"id": user_id, "status": results[user_id]} for user_id in user_ids
+            ]
+        })
+
+
+class FriendStatusView(async_views.APIView):
+    """
+    Флаги отношений юзера запроса с каждым из переданных юзеров: друг,
+    отправлен запрос, получен запрос, в избранном.
+
+    При encoding=bitset каждый флаг отдается битовой строкой в base64:
+    бит i (младший бит первым) относится к ids[i].
+    """
+    permission_classes = [IsAuthenticated]
+    flags = {
+        "is_friend": "friends",
+        "request_sent": "requests_sent",
+        "request_received": "requests_received",
+        "is_favorite": "favorites",
+    }
+
+    async def post(self, request):
+        serializer = FriendStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        user_ids = serializer.validated_data['ids']
+        relations = await afriendship_flags(request.user.id, user_ids)
+
+        if serializer.validated_data['encoding'] == "bitset":
+            return Response({
+                "count": len(user_ids),
+                "encoding": "bitset",
+                "flags": {
+                    flag: base64.b64encode(np.packbits(
+                        [user_id in relations[key] for user_id in user_ids],
+                        bitorder="little"
+                    ).tobytes()).decode()
+                    for flag, key in self.flags.items()
+                },
+            })
+        return Response({
+            "results": [
+                dict(
+                    {"id": user_id},
+                    **{
+                        flag: user_id in relations[key]
+                        for flag, key in self.flags.items()
+                    }
+                )
+                for user_id in user_ids
+            ]
+        })
+
+
+class HttpPoolStatsView(views.APIView):
+    """
+    Статистика пула HTTP соединений текущего воркера.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(http_pool.stats())
+
+
+class ProfileCardInvalidateView(async_views.APIView):
+    """
+    Сброс кэша карточек профилей по списку UUID и обновление индекса имен
+    друзей. Вызывается сервисом Profile при изменении профиля.
+    """
+    authentication_classes = []
+    permission_classes = [HasServiceToken]
+
+    async def post(self, request):
+        serializer = ProfileIdsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        user_ids = serializer.validated_data['ids']
+        await profile_cards.ainvalidate(user_ids)
+        try:
+            await aindex_friend_names(user_ids)
+        except ProfileServiceError as e:
+            return profile_service_error_response(e)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -50,6 +50,15 @@ app.kubernetes.io/name: {{ include "profile-service-backend.name" . }}
 app.kubernetes.io/instance: {{ .Release.Name }}
 {{- end }}
 
+{{/*
+Events dispatcher selector labels (a separate name, so the app Service
+never routes requests to dispatcher pods)
+*/}}
+{{- define "profile-service-backend.dispatcherSelectorLabels" -}}
+app.kubernetes.io/name: {{ include "profile-service-backend.name" . }}-events
+app.kubernetes.io/instance: {{ .Release.Name }}
+{{- end }}
+
 {{/*
 Create the name of the service account to use
 */}}
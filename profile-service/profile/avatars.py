@@ -0,0 +1,138 @@
+"""
+Уменьшенные копии аватаров.
+
+Из загруженного оригинала в фоновом пуле потоков строятся квадратные
+копии AVATAR_SIZES в WebP и JPEG. Имена копий строятся по sha256
+оригинала, поэтому одинаковые загрузки разных юзеров делят одни файлы,
+а в UserAvatar и ProfileCard хранится только хэш.
+"""
+
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .cards import refresh_cards
+from .models import DEFAULT_AVATAR, Profile, UserAvatar
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.AVATAR_WORKERS, thread_name_prefix='avatar'
+)
+
+
+def storage():
+    return UserAvatar._meta.get_field('avatar').storage
+
+
+def derivative_name(content_hash, size, image_format):
+    return f'avatars/derived/{content_hash[:2]}/{content_hash}_{size}.{image_format}'
+
+
+def avatar_url(name, content_hash, size, image_format='webp'):
+    """
+    URL копии ближайшего размера не меньше size, пока копий нет - оригинала.
+    """
+    if content_hash:
+        sizes = sorted(settings.AVATAR_SIZES)
+        size = next((item for item in sizes if item >= size), sizes[-1])
+        return storage().url(derivative_name(content_hash, size, image_format))
+    if name:
+        return storage().url(name)
+    return None
+
+
+def avatar_urls(content_hash):
+    """
+    Все копии: {размер: {формат: URL}}.
+    """
+    if not content_hash:
+        return {}
+    return {
+        size: {
+            image_format: storage().url(derivative_name(content_hash, size, image_format))
+            for image_format in FORMATS
+        }
+        for size in settings.AVATAR_SIZES
+    }
+
+
+def render_derivatives(data):
+    """
+    :return: {(размер, формат): байты}
+    """
+    image = Image.open(io.BytesIO(data))
+    # Для JPEG декодер сразу уменьшает картинку кратно 1/2..1/8
+    largest = max(settings.AVATAR_SIZES)
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    result = {}
+    # Каждый размер уменьшается из предыдущего, а не из оригинала
+    for size in sorted(settings.AVATAR_SIZES, reverse=True):
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for image_format, options in FORMATS.items():
+            frame = image
+            if options['format'] == 'JPEG' and image.mode != 'RGB':
+                frame = Image.new('RGB', image.size, 'white')
+                frame.paste(image, mask=image.getchannel('A'))
+            buffer = io.BytesIO()
+            frame.save(buffer, **options)
+            result[size, image_format] = buffer.getvalue()
+    return result
+
+
+def process_avatar(avatar_id):
+    """
+    Строит копии аватара и проставляет content_hash, если аватар не
+    сменился за время обработки.
+    """
+    try:
+        avatar = UserAvatar.objects.get(pk=avatar_id)
+        name = avatar.avatar.name
+        if not name or name in (DEFAULT_AVATAR, settings.DEFAULT_AVATAR_URL):
+            return
+        with avatar.avatar.open('rb') as file:
+            data = file.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        files = storage()
+        # Наименьшая JPEG копия пишется последней: если она есть, есть и все
+        if not files.exists(derivative_name(content_hash, min(settings.AVATAR_SIZES), 'jpeg')):
+            for (size, image_format), content in render_derivatives(data).items():
+                target = derivative_name(content_hash, size, image_format)
+                if not files.exists(target):
+                    files.save(target, ContentFile(content))
+
+        with transaction.atomic():
+            updated = UserAvatar.objects.filter(pk=avatar_id, avatar=name).update(
+                content_hash=content_hash
+            )
+            if updated:
+                Profile.bump_version(avatar.user_id)
+                refresh_cards([avatar.user_id])
+    except Exception:
+        logger.exception('Не удалось обработать аватар %s', avatar_id)
+    finally:
+        # Поток пула живет дольше запроса, соединение закрываем сами
+        connection.close()
+
+
+def schedule_avatar_processing(avatar_id):
+    """
+    Ставит обработку аватара в пул после коммита текущей транзакции.
+    """
+    transaction.on_commit(lambda: _executor.submit(process_avatar, avatar_id))
@@ -0,0 +1,236 @@
+"""
+Массовое создание профилей без сигналов post_save.
+
+Юзеры, профили, аватары по умолчанию и карточки создаются пачками через
+bulk_create (INSERT ... ON CONFLICT DO NOTHING), повторный импорт тех же
+записей ничего не меняет.
+"""
+
+import csv
+import json
+import re
+import uuid
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .cards import refresh_cards
+from .models import DEFAULT_AVATAR, Profile, ProfileCard, ProfileEvent, UserAvatar
+from .search import search_columns
+
+User = get_user_model()
+
+FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'token')
+
+
+def read_ndjson(stream):
+    # Строки разбираются в normalize_record, чтобы битая строка не
+    # прерывала импорт
+    for line in stream:
+        yield line.strip() or None
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def _clean(value):
+    return re.sub(r'\s+', ' ', str(value or '').strip())
+
+
+def normalize_record(raw):
+    """
+    Приводит запись к полям Profile так же, как Profile.save, и проверяет
+    ее валидаторами полей User и Profile: bulk_create их не вызывает.
+
+    :raises ValueError: запись не подходит для импорта
+    """
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    if not isinstance(raw, dict):
+        raise ValueError('ожидается объект')
+    record = {field: _clean(raw.get(field)) for field in FIELDS}
+    record['id'] = uuid.UUID(record['id'])
+    if not record['username']:
+        raise ValueError('пустой username')
+    names = {field: record[field] for field in FIELDS[:-1]}
+    try:
+        User(**names).clean_fields(exclude=['password'])
+        Profile(**names, token=record['token']).clean_fields(exclude=['user'])
+    except ValidationError as e:
+        raise ValueError('; '.join(
+            f'{field}: {" ".join(messages)}' for field, messages in e.message_dict.items()
+        )) from e
+    return record
+
+
+def import_batch(records):
+    """
+    Создает юзеров, профили, аватары и карточки для пачки записей.
+
+    :return: ID созданных профилей
+    """
+    ids = [record['id'] for record in records]
+    with transaction.atomic():
+        before = set(User.objects.filter(id__in=ids).values_list('id', flat=True))
+        User.objects.bulk_create(
+            [
+                User(
+                    id=record['id'],
+                    username=record['username'],
+                    email=record['email'],
+                    first_name=record['first_name'],
+                    last_name=record['last_name'],
+                )
+                for record in records
+            ],
+            ignore_conflicts=True,
+        )
+        # Записи, у которых username занят другим id, юзера не получили
+        users = set(User.objects.filter(id__in=ids).values_list('id', flat=True))
+        existing = set(Profile.objects.filter(id__in=users).values_list('id', flat=True))
+        Profile.objects.bulk_create(
+            [
+                Profile(
+                    id=record['id'],
+                    user_id=record['id'],
+                    username=record['username'],
+                    email=record['email'],
+                    first_name=record['first_name'],
+                    last_name=record['last_name'],
+                    token=record['token'],
+                )
+                for record in records
+                if record['id'] in users and record['id'] not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        created = set(
+            Profile.objects.filter(id__in=users - existing).values_list('id', flat=True)
+        )
+        # Профиль не создан (username занят другим профилем): юзер из этой
+        # пачки удаляется, чтобы не оставлять юзера без профиля
+        orphans = users - before - existing - created
+        if orphans:
+            User.objects.filter(id__in=orphans).delete()
+        UserAvatar.objects.bulk_create(
+            [
+                UserAvatar(user_id=profile_id, avatar=DEFAULT_AVATAR)
+                for profile_id in created
+            ],
+            ignore_conflicts=True,
+        )
+        # Карточки собираются из самих записей: у новых профилей нет
+        # специализаций, а аватар по умолчанию
+        ProfileCard.objects.bulk_create(
+            [
+                ProfileCard(
+                    profile_id=record['id'],
+                    username=record['username'],
+                    first_name=record['first_name'],
+                    last_name=record['last_name'],
+                    avatar=DEFAULT_AVATAR,
+                    **search_columns(
+                        record['first_name'], record['last_name'], record['username']
+                    ),
+                )
+                for record in records
+                if record['id'] in created
+            ],
+            ignore_conflicts=True,
+        )
+        ProfileEvent.record(created)
+    return created
+
+
+def import_profiles(rows, batch_size, on_error=None):
+    """
+    Импорт записей из итератора rows пачками по batch_size.
+
+    :param on_error: вызывается с номером записи и ошибкой для пропущенных
+    :return: (количество прочитанных записей, созданных профилей)
+    """
+    total = created = 0
+    rows = enumerate(rows, 1)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return total, created
+        records = {}
+        for number, raw in chunk:
+            if raw is None:
+                continue
+            total += 1
+            try:
+                record = normalize_record(raw)
+            except (ValueError, TypeError, AttributeError) as e:
+                if on_error is not None:
+                    on_error(number, e)
+                continue
+            # Последняя запись с тем же id в пачке побеждает
+            records[record['id']] = record
+        if records:
+            created += len(import_batch(list(records.values())))
+
+
+def register_batch(records):
+    """
+    Upsert пачки регистраций: новые юзеры создаются как в import_batch, у
+    существующих профилей обновляются username, email и first_name, как
+    в CreateProfileView.
+
+    :return: {id: 'created' | 'updated' | 'username_taken'}
+    """
+    results = {}
+    owners = {}
+    for record in records:
+        owner = owners.setdefault(record['username'], record['id'])
+        if owner != record['id']:
+            results[record['id']] = 'username_taken'
+    with transaction.atomic():
+        # Профиль принадлежит юзеру по user_id, его id может не совпадать
+        for model, owner_field in ((User, 'id'), (Profile, 'user_id')):
+            for username, owner in model.objects.filter(
+                username__in=owners
+            ).values_list('username', owner_field):
+                if owners[username] != owner:
+                    results[owners[username]] = 'username_taken'
+        valid = [record for record in records if record['id'] not in results]
+        existing = dict(Profile.objects.filter(
+            user_id__in=[record['id'] for record in valid]
+        ).values_list('user_id', 'id'))
+
+        created = import_batch(
+            [record for record in valid if record['id'] not in existing]
+        )
+        Profile.objects.bulk_create(
+            [
+                Profile(
+                    id=existing[record['id']],
+                    user_id=record['id'],
+                    username=record['username'],
+                    email=record['email'],
+                    first_name=record['first_name'],
+                )
+                for record in valid
+                if record['id'] in existing
+            ],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['username', 'email', 'first_name'],
+        )
+        if existing:
+            Profile.bump_version(*existing.values())
+            refresh_cards(existing.values())
+
+    for record in valid:
+        if record['id'] in existing:
+            results[record['id']] = 'updated'
+        else:
+            # Не создан, если username заняли параллельно
+            results[record['id']] = (
+                'created' if record['id'] in created else 'username_taken'
+            )
+    return results
@@ -0,0 +1,52 @@
+from django.db.models import Prefetch
+
+from .models import ITEM_LIMIT, Profile, ProfileCard, UserSpecialization
+from .search import search_columns
+
+
+def build_card(profile):
+    """
+    Карточка профиля из профиля с загруженными avatar и specializations.
+    """
+    avatar = getattr(profile, 'avatar', None)
+    return ProfileCard(
+        profile_id=profile.id,
+        username=profile.username,
+        first_name=profile.first_name,
+        last_name=profile.last_name,
+        avatar=avatar.avatar.name if avatar is not None and avatar.avatar else '',
+        avatar_hash=avatar.content_hash if avatar is not None else '',
+        specializations=[
+            item.specialization for item in profile.specializations.all()[:ITEM_LIMIT]
+        ],
+        **search_columns(profile.first_name, profile.last_name, profile.username),
+    )
+
+
+def refresh_cards(profile_ids):
+    """
+    Пересобирает карточки профилей одним запросом на чтение и одним upsert.
+    Карточки удаленных профилей удаляются.
+    """
+    profile_ids = set(profile_ids)
+    profiles = Profile.objects.filter(id__in=profile_ids).select_related(
+        'avatar'
+    ).prefetch_related(Prefetch(
+        'specializations',
+        queryset=UserSpecialization.objects.order_by('id'),
+    ))
+    cards = [build_card(profile) for profile in profiles]
+    ProfileCard.objects.bulk_create(
+        cards,
+        update_conflicts=True,
+        unique_fields=['profile'],
+        update_fields=[
+            'username', 'first_name', 'last_name', 'avatar', 'avatar_hash',
+            'specializations',
+            'search_text', 'search_translit',
+        ],
+    )
+    missing = profile_ids - {card.profile_id for card in cards}
+    if missing:
+        ProfileCard.objects.filter(profile_id__in=missing).delete()
+    return cards
@@ -0,0 +1,121 @@
+"""
+Маршрутизация чтения на реплики.
+
+Запросы GET/HEAD к представлениям с атрибутом read_replica = True читают
+с одной из DATABASE_REPLICAS, остальные запросы и все записи идут в
+default. Если запрос действительно изменил данные в default (выполнил
+INSERT/UPDATE/DELETE) и завершился успешно, клиент получает cookie, и на
+READ_REPLICA_STICKY_SECONDS его чтения остаются на primary, чтобы он
+видел свои изменения несмотря на отставание реплик. Заголовок
+X-Read-From: primary|replica переопределяет выбор для одного запроса.
+"""
+
+import random
+import re
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+READ_FROM_HEADER = 'X-Read-From'
+WRITE_SQL = re.compile(r'\s*(INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+# Алиас базы для чтения в текущем запросе, None - default
+read_db = ContextVar('read_db', default=None)
+
+
+class ReplicaRouter:
+    """
+    Роутер: чтение в базу из read_db, запись и миграции только в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_db.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def use_replica(request, view):
+    if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS:
+        return False
+    read_from = request.headers.get(READ_FROM_HEADER, '').lower()
+    if read_from in ('primary', 'replica'):
+        return read_from == 'replica'
+    if settings.READ_REPLICA_STICKY_COOKIE in request.COOKIES:
+        return False
+    return getattr(view, 'read_replica', False)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Выбирает базу для чтения на время запроса и выставляет cookie
+    привязки к primary после записи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._wrote_primary = False
+        try:
+            with connections['default'].execute_wrapper(self.track_writes(request)):
+                response = self.get_response(request)
+        except Exception:
+            self.reset_read_db(request)
+            raise
+        if response.streaming and not response.is_async:
+            # Тело читается из базы уже после выхода из middleware
+            response.streaming_content = self.keep_read_db(
+                request, response.streaming_content
+            )
+        else:
+            self.reset_read_db(request)
+        if (
+            settings.DATABASE_REPLICAS
+            and request._wrote_primary
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                settings.READ_REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.READ_REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def track_writes(request):
+        def wrapper(execute, sql, params, many, context):
+            if WRITE_SQL.match(sql):
+                request._wrote_primary = True
+            return execute(sql, params, many, context)
+        return wrapper
+
+    @staticmethod
+    def reset_read_db(request):
+        token = getattr(request, '_read_db_token', None)
+        if token is not None:
+            read_db.reset(token)
+            request._read_db_token = None
+
+    def keep_read_db(self, request, content):
+        try:
+            yield from content
+        finally:
+            self.reset_read_db(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        if use_replica(request, view):
+            # Одна реплика на весь запрос, чтобы не смешивать разное отставание
+            request._read_db_token = read_db.set(
+                random.choice(settings.DATABASE_REPLICAS)
+            )
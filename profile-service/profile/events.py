@@ -0,0 +1,174 @@
+"""
+Доставка событий изменения профилей подписчикам (transactional outbox).
+
+ProfileEvent пишется в той же транзакции, что и изменение профиля:
+сигналами сохранения и удаления профиля, аватара и специализаций и
+Profile.bump_version для изменений через UPDATE без сигналов. Диспетчер
+(команда dispatch_profile_events) короткой транзакцией с SKIP LOCKED
+захватывает пачку событий, ставя им аренду lease_until, и фиксирует ее.
+Отправка всем транспортам идет вне транзакции, повторы одного профиля
+схлопываются. События удаляются только после успешной отправки, поэтому
+доставка не реже одного раза: при ошибке или истекшей аренде пачка уйдет
+повторно, в том числе тем подписчикам, которые ее уже получили.
+"""
+
+import logging
+import queue
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ProfileEvent
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryError(Exception):
+    pass
+
+
+class WebhookTransport:
+    """
+    POST {"ids": [...], "deleted": [...]} с заголовком X-Service-Token,
+    формат ProfileCardInvalidateView сервиса друзей.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+
+    def send(self, payload):
+        try:
+            response = self.session.post(
+                self.url,
+                json=payload,
+                headers={'X-Service-Token': settings.SERVICE_TOKEN},
+                timeout=settings.PROFILE_EVENTS_TIMEOUT,
+            )
+        except requests.RequestException as e:
+            raise DeliveryError(f'{self.url}: {e}') from e
+        if response.status_code >= 300:
+            raise DeliveryError(f'{self.url}: HTTP {response.status_code}')
+
+
+class LocalQueueTransport:
+    """
+    Складывает пачки в очередь процесса. Замена брокера для локального
+    запуска и тестов.
+    """
+    queue = queue.Queue()
+
+    def send(self, payload):
+        self.queue.put(payload)
+
+
+TRANSPORTS = {
+    'webhook': lambda: [WebhookTransport(url) for url in settings.PROFILE_EVENTS_WEBHOOK_URLS],
+    'local': lambda: [LocalQueueTransport()],
+}
+
+
+def get_transports():
+    """
+    :raises ImproperlyConfigured: транспорт неизвестен или без подписчиков,
+        иначе события удалялись бы из outbox недоставленными
+    """
+    try:
+        transports = TRANSPORTS[settings.PROFILE_EVENTS_TRANSPORT]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'Неизвестный PROFILE_EVENTS_TRANSPORT: {settings.PROFILE_EVENTS_TRANSPORT}'
+        )
+    if not transports:
+        raise ImproperlyConfigured(
+            'Для PROFILE_EVENTS_TRANSPORT=webhook нужен PROFILE_EVENTS_WEBHOOK_URLS'
+        )
+    return transports
+
+
+def coalesce(events):
+    """
+    Оставляет по профилю одно, последнее событие.
+
+    :return: {"ids": все профили, "deleted": удаленные профили}
+    """
+    kinds = {}
+    for event in events:
+        kinds[str(event.profile_id)] = event.kind
+    return {
+        'ids': list(kinds),
+        'deleted': [
+            profile_id for profile_id, kind in kinds.items()
+            if kind == ProfileEvent.DELETED
+        ],
+    }
+
+
+def claim_batch(batch_size):
+    """
+    Захватывает пачку событий, не захваченных другими диспетчерами или с
+    истекшей арендой. Транзакция фиксируется сразу, блокировки строк на
+    время отправки не держатся.
+
+    :return: (события, срок аренды)
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=settings.PROFILE_EVENTS_LEASE_SECONDS)
+    with transaction.atomic():
+        events = list(
+            ProfileEvent.objects.select_for_update(skip_locked=True)
+            .filter(Q(lease_until__isnull=True) | Q(lease_until__lt=now))
+            .order_by('id')[:batch_size]
+        )
+        ProfileEvent.objects.filter(
+            id__in=[event.id for event in events]
+        ).update(lease_until=lease_until)
+    return events, lease_until
+
+
+def dispatch_batch(transports, batch_size):
+    """
+    Отправляет одну пачку событий.
+
+    :return: число отправленных событий
+    :raises DeliveryError: пачка осталась в outbox
+    """
+    if not transports:
+        raise ImproperlyConfigured('Нет транспортов для событий профилей')
+    events, lease_until = claim_batch(batch_size)
+    if not events:
+        return 0
+    # Если аренда истекла и пачку захватил другой диспетчер, ее события
+    # удалит или вернет уже он
+    claimed = ProfileEvent.objects.filter(
+        id__in=[event.id for event in events], lease_until=lease_until
+    )
+    payload = coalesce(events)
+    try:
+        for transport in transports:
+            transport.send(payload)
+    except DeliveryError:
+        # Пачка сразу доступна для повтора, не дожидаясь конца аренды
+        claimed.update(lease_until=None)
+        raise
+    claimed.delete()
+    return len(events)
+
+
+def dispatch_pending(transports, batch_size):
+    """
+    Отправляет пачки, пока outbox не опустеет.
+
+    :return: число отправленных событий
+    """
+    total = 0
+    while True:
+        sent = dispatch_batch(transports, batch_size)
+        total += sent
+        if sent < batch_size:
+            return total
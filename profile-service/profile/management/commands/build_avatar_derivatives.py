@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from profile.avatars import process_avatar
+from profile.models import DEFAULT_AVATAR, UserAvatar
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии загруженных аватаров, у которых их еще нет'
+
+    def handle(self, *args, **options):
+        avatar_ids = list(
+            UserAvatar.objects.filter(content_hash='').exclude(
+                avatar__in=['', DEFAULT_AVATAR, settings.DEFAULT_AVATAR_URL]
+            ).values_list('id', flat=True)
+        )
+        for avatar_id in avatar_ids:
+            process_avatar(avatar_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано аватаров: {len(avatar_ids)}'
+        ))
@@ -0,0 +1,41 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from profile.events import DeliveryError, dispatch_pending, get_transports
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Доставляет события изменения профилей из outbox подписчикам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Отправить накопленные события и выйти'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.PROFILE_EVENTS_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        transports = get_transports()
+        delay = settings.PROFILE_EVENTS_POLL_SECONDS
+        while True:
+            try:
+                sent = dispatch_pending(transports, options['batch_size'])
+                delay = settings.PROFILE_EVENTS_POLL_SECONDS
+            except DeliveryError as e:
+                if options['once']:
+                    raise CommandError(str(e))
+                logger.warning('Не удалось доставить события профилей: %s', e)
+                sent = 0
+                # Пока подписчик недоступен, пауза растет до минуты
+                delay = min(max(delay, 1) * 2, 60)
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Отправлено событий: {sent}'))
+                return
+            time.sleep(delay)
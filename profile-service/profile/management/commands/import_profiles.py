@@ -0,0 +1,54 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profile.bulk import import_profiles, read_csv, read_ndjson
+
+
+class Command(BaseCommand):
+    help = (
+        'Массовый импорт юзеров с профилями из NDJSON или CSV '
+        '(поля id, username, email, first_name, last_name, token)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл с записями, "-" для чтения из stdin',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['ndjson', 'csv'],
+            help='Формат записей, по умолчанию по расширению файла',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество записей в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson'
+        )
+        reader = read_csv if file_format == 'csv' else read_ndjson
+        try:
+            stream = (
+                sys.stdin if path == '-'
+                else open(path, encoding='utf-8', newline='')
+            )
+        except OSError as e:
+            raise CommandError(f'Не удалось открыть {path}: {e}')
+
+        def on_error(number, error):
+            self.stderr.write(f'Запись {number} пропущена: {error}')
+
+        with stream:
+            total, created = import_profiles(
+                reader(stream), options['batch_size'], on_error
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано записей: {total}, создано профилей: {created}'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from profile.uploads import abort_upload, expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Удаляет незавершенные загрузки аватаров старше AVATAR_UPLOAD_TTL_HOURS'
+
+    def handle(self, *args, **options):
+        count = 0
+        for upload in expired_uploads().iterator():
+            abort_upload(upload)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Удалено загрузок: {count}'))
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.8 on 2026-10-18 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_profile_cards(apps, schema_editor):
+    Profile = apps.get_model('profile', 'Profile')
+    ProfileCard = apps.get_model('profile', 'ProfileCard')
+    UserSpecialization = apps.get_model('profile', 'UserSpecialization')
+    profiles = Profile.objects.select_related('avatar').prefetch_related(
+        models.Prefetch(
+            'specializations',
+            queryset=UserSpecialization.objects.order_by('id'),
+        )
+    ).order_by('id')
+    cards = []
+    for profile in profiles.iterator(chunk_size=1000):
+        avatar = getattr(profile, 'avatar', None)
+        cards.append(ProfileCard(
+            profile_id=profile.id,
+            username=profile.username,
+            first_name=profile.first_name,
+            last_name=profile.last_name,
+            avatar=avatar.avatar.name if avatar is not None and avatar.avatar else '',
+            specializations=[
+                item.specialization for item in profile.specializations.all()[:3]
+            ],
+        ))
+        if len(cards) >= 1000:
+            ProfileCard.objects.bulk_create(cards)
+            cards = []
+    ProfileCard.objects.bulk_create(cards)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0003_alter_profile_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileCard',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='profile.profile')),
+                ('username', models.CharField(blank=True, max_length=150)),
+                ('first_name', models.CharField(blank=True, max_length=30)),
+                ('last_name', models.CharField(blank=True, max_length=30)),
+                ('avatar', models.CharField(blank=True, max_length=255)),
+                ('specializations', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_profile_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.8 on 2026-10-18 03:10
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def fill_search_columns(apps, schema_editor):
+    from profile.search import search_columns
+
+    ProfileCard = apps.get_model('profile', 'ProfileCard')
+    cards = []
+    for card in ProfileCard.objects.order_by('pk').iterator(chunk_size=1000):
+        for field, value in search_columns(
+            card.first_name, card.last_name, card.username
+        ).items():
+            setattr(card, field, value)
+        cards.append(card)
+        if len(cards) >= 1000:
+            ProfileCard.objects.bulk_update(cards, ['search_text', 'search_translit'])
+            cards = []
+    ProfileCard.objects.bulk_update(cards, ['search_text', 'search_translit'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0004_profilecard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profilecard',
+            name='search_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='profilecard',
+            name='search_translit',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='profilecard',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='profilecard_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='profilecard',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_translit'], name='profilecard_translit_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
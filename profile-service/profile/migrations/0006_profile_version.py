@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0005_profilecard_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0006_profile_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profilecard',
+            name='avatar_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='useravatar',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.8 on 2026-10-18 12:00
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Least
+
+logger = logging.getLogger(__name__)
+
+# ITEM_LIMIT на момент миграции, ограничения добавляет 0012
+ITEM_LIMIT = 3
+COUNTERS = {
+    'specializations_count': 'UserSpecialization',
+    'place_of_work_count': 'PlaceOfWorkUser',
+    'education_count': 'EducationUser',
+}
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Заполняет счетчики числом записей, но не больше ITEM_LIMIT. У профилей,
+    набравших больше записей до появления лимита, записи не удаляются:
+    новые не добавить, пока их не станет меньше лимита.
+    """
+    Profile = apps.get_model('profile', 'Profile')
+    counts = {}
+    for counter, model_name in COUNTERS.items():
+        model = apps.get_model('profile', model_name)
+        rows = Coalesce(Subquery(
+            model.objects.filter(user=OuterRef('pk'))
+            .values('user').annotate(total=Count('pk')).values('total')
+        ), 0)
+        over_limit = Profile.objects.annotate(rows=rows).filter(rows__gt=ITEM_LIMIT).count()
+        if over_limit:
+            logger.warning(
+                '%s: у %s профилей больше %s записей, счетчик ограничен лимитом',
+                model_name, over_limit, ITEM_LIMIT,
+            )
+        counts[counter] = Least(rows, Value(ITEM_LIMIT))
+    Profile.objects.update(**counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0008_avatarupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='education_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='place_of_work_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='specializations_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0009_profile_item_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile_id', models.UUIDField()),
+                ('kind', models.CharField(choices=[('changed', 'Изменен'), ('deleted', 'Удален')], default='changed', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0010_profileevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avatarupload',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
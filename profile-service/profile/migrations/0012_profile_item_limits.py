@@ -0,0 +1,25 @@
+# Generated by Django 5.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0011_avatarupload_lease_until'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='profile',
+            constraint=models.CheckConstraint(check=models.Q(('specializations_count__lte', 3)), name='profile_specializations_count_limit'),
+        ),
+        migrations.AddConstraint(
+            model_name='profile',
+            constraint=models.CheckConstraint(check=models.Q(('place_of_work_count__lte', 3)), name='profile_place_of_work_count_limit'),
+        ),
+        migrations.AddConstraint(
+            model_name='profile',
+            constraint=models.CheckConstraint(check=models.Q(('education_count__lte', 3)), name='profile_education_count_limit'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0012_profile_item_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profileevent',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.core.exceptions import ValidationError
 import re
 import uuid
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Greatest
 from django.utils.html import escape
 from django.utils.translation import gettext_lazy as _
 from .validators import PersonalQualityValidator, ProfileValidator
@@ -10,11 +12,30 @@ from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 
 
+# Максимум записей в ограниченном разделе профиля (LimitedItem)
+ITEM_LIMIT = 3
+
+
 class User(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
 
-class Profile(models.Model):
+class AtomicSaveModel(models.Model):
+    """
+    Сохранение вместе с post_save в одной транзакции: сигналы (signals.py)
+    пишут событие в outbox и пересобирают карточку профиля атомарно с
+    самим изменением.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class Profile(AtomicSaveModel):
     """
     Класс профиля пользователя
     """
@@ -30,14 +51,130 @@ class Profile(models.Model):
     location = models.CharField(max_length=50, blank=True, validators=[ProfileValidator.validate_location])
     phone = models.CharField(max_length=20, blank=True)
     token = models.CharField(max_length=50, blank=True)
+    # Версия профиля со всеми вложенными разделами, ключ кэша и ETag ProfileView
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Число записей ограниченных разделов (LimitedItem), меняется только
+    # через reserve_items/release_items
+    specializations_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    place_of_work_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    education_count = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    ITEM_LIMIT = ITEM_LIMIT
+    COUNTERS = ('version', 'specializations_count', 'place_of_work_count', 'education_count')
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(**{f'{counter}__lte': ITEM_LIMIT}),
+                name=f'profile_{counter}_limit',
+            )
+            for counter in ('specializations_count', 'place_of_work_count', 'education_count')
+        ]
 
     def save(self, *args, **kwargs):
         # Удаление лишних пробелов перед сохранением
         self.first_name = re.sub(r'\s+', ' ', self.first_name.strip())
         self.last_name = re.sub(r'\s+', ' ', self.last_name.strip())
         self.location = re.sub(r'\s+', ' ', self.location.strip())
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Счетчики меняются только через bump_version и reserve_items,
+            # иначе save может вернуть значение, прочитанное до параллельной записи
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTERS
+            ]
         super().save(*args, **kwargs)
 
+    @classmethod
+    def bump_version(cls, *profile_ids):
+        """
+        Увеличивает версию профилей и в той же транзакции пишет событие
+        изменения в outbox (ProfileEvent).
+        """
+        with transaction.atomic():
+            cls.objects.filter(pk__in=profile_ids).update(version=models.F('version') + 1)
+            ProfileEvent.record(profile_ids)
+
+    @classmethod
+    def reserve_items(cls, profile_id, counter, count=1):
+        """
+        Занимает count мест в разделе одним UPDATE ... WHERE counter <= limit - count.
+        Строка профиля блокируется до конца транзакции, поэтому параллельные
+        вставки не превысят лимит.
+
+        :return: True, если места хватило
+        """
+        return bool(cls.objects.filter(
+            pk=profile_id, **{f'{counter}__lte': cls.ITEM_LIMIT - count}
+        ).update(**{counter: models.F(counter) + count}))
+
+    @classmethod
+    def release_items(cls, profile_id, counter, count=1):
+        cls.objects.filter(pk=profile_id).update(
+            **{counter: Greatest(models.F(counter) - count, 0)}
+        )
+
+
+class ProfileEvent(models.Model):
+    """
+    Событие изменения профиля в outbox (events.py). Пишется в транзакции
+    изменения и удаляется после доставки подписчикам. lease_until - до
+    какого времени событие отправляет захвативший его диспетчер.
+    """
+    CHANGED = 'changed'
+    DELETED = 'deleted'
+    KINDS = [(CHANGED, 'Изменен'), (DELETED, 'Удален')]
+
+    # Без внешнего ключа: событие удаления переживает профиль
+    profile_id = models.UUIDField()
+    kind = models.CharField(max_length=10, choices=KINDS, default=CHANGED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def record(cls, profile_ids, kind=CHANGED):
+        cls.objects.bulk_create([
+            cls(profile_id=profile_id, kind=kind) for profile_id in profile_ids
+        ])
+
+
+class ProfileCard(models.Model):
+    """
+    Денормализованная карточка профиля для списков друзей и поиска.
+    Пересобирается сигналами при изменении профиля, аватара и специализаций.
+    """
+    profile = models.OneToOneField(
+        Profile, on_delete=models.CASCADE, primary_key=True, related_name='card'
+    )
+    username = models.CharField(max_length=150, blank=True)
+    first_name = models.CharField(max_length=30, blank=True)
+    last_name = models.CharField(max_length=30, blank=True)
+    avatar = models.CharField(max_length=255, blank=True)  # Имя файла в хранилище
+    avatar_hash = models.CharField(max_length=64, blank=True, default='')
+    specializations = models.JSONField(default=list, blank=True)  # До 3 штук
+    # Нормализованные имена для поиска (search.py): как есть и в транслитерации
+    search_text = models.TextField(blank=True, default='')
+    search_translit = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(
+                fields=['search_text'],
+                opclasses=['gin_trgm_ops'],
+                name='profilecard_search_trgm_idx',
+            ),
+            GinIndex(
+                fields=['search_translit'],
+                opclasses=['gin_trgm_ops'],
+                name='profilecard_translit_trgm_idx',
+            ),
+        ]
+
+
+# Аватар по умолчанию, который ставят сигнал create_user_profile и удаление
+DEFAULT_AVATAR = 'uploads/default.jpg'
+
 
 def user_avatar_directory_path(instance: "UserAvatar", filename: str) -> str:
     """
@@ -46,7 +183,7 @@ def user_avatar_directory_path(instance: "UserAvatar", filename: str) -> str:
     return f"avatars/{instance.user.pk}/{filename}"
 
 
-class UserAvatar(models.Model):
+class UserAvatar(AtomicSaveModel):
     """
     Класс аватара пользователя
     """
@@ -56,6 +193,8 @@ class UserAvatar(models.Model):
         default=settings.DEFAULT_AVATAR_URL  # Используем URL из настроек
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # sha256 оригинала, по нему строятся имена уменьшенных копий (avatars.py)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
 
     def delete_old_avatar(self):
         if self.avatar and self.avatar.name != settings.DEFAULT_AVATAR_URL:
@@ -64,7 +203,54 @@ class UserAvatar(models.Model):
                 storage.delete(self.avatar.name)
 
 
-class UserSpecialization(models.Model):
+class AvatarUpload(models.Model):
+    """
+    Загрузка аватара по частям (uploads.py): принятые байты лежат частями
+    в хранилище файлов, offset - сколько из size уже получено,
+    lease_until - до какого времени загрузку пишет один PATCH.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='avatar_uploads')
+    file_name = models.CharField(max_length=100)
+    size = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class LimitedItem(AtomicSaveModel):
+    """
+    Запись раздела, у которого профиль может иметь не более
+    ITEM_LIMIT записей. Место занимается в счетчике профиля в той же
+    транзакции, что и вставка, и освобождается по числу реально удаленных
+    строк: post_delete приходит и тогда, когда строку уже удалил
+    параллельный запрос.
+    """
+    counter = None
+    limit_message = None
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            if not Profile.reserve_items(self.user_id, self.counter):
+                raise ValidationError(self.limit_message)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            count = deleted[1].get(self._meta.label, 0)
+            if count:
+                Profile.release_items(self.user_id, self.counter, count)
+        return deleted
+
+
+class UserSpecialization(LimitedItem):
     """
     Класс специализации пользователя
     """
@@ -80,11 +266,8 @@ class UserSpecialization(models.Model):
         ]
     )
 
-    def save(self, *args, **kwargs):
-        # Проверка на количество специализаций только при создании
-        if not self.pk and self.user.specializations.count() >= 3:
-            raise ValidationError("Пользователь не может иметь более 3 специализаций.")
-        super().save(*args, **kwargs)
+    counter = 'specializations_count'
+    limit_message = f"Пользователь не может иметь более {ITEM_LIMIT} специализаций."
 
 
 class PersonalQuality(models.Model):
@@ -101,7 +284,7 @@ class PersonalQuality(models.Model):
         super().save(*args, **kwargs)
 
 
-class PlaceOfWorkUser(models.Model):
+class PlaceOfWorkUser(LimitedItem):
     """
     Класс места работы пользователя
     """
@@ -119,13 +302,11 @@ class PlaceOfWorkUser(models.Model):
         help_text='Формат: "дд.мм.гггг-дд.мм.гггг" или "дд.мм.гггг-Настоящее время"'
     )
 
-    def save(self, *args, **kwargs):
-        if not self.pk and self.user.place_of_work.count() >= 3:
-            raise ValidationError("Пользователь не может иметь более 3 мест работы.")
-        super().save(*args, **kwargs)
+    counter = 'place_of_work_count'
+    limit_message = f"Пользователь не может иметь более {ITEM_LIMIT} мест работы."
 
 
-class EducationUser(models.Model):
+class EducationUser(LimitedItem):
     """
     Класс образования пользователя
     """
@@ -144,10 +325,8 @@ class EducationUser(models.Model):
     )
     link = models.URLField(blank=True)
 
-    def save(self, *args, **kwargs):
-        if not self.pk and self.user.education.count() >= 3:
-            raise ValidationError("Пользователь не может иметь более 3 образований.")
-        super().save(*args, **kwargs)
+    counter = 'education_count'
+    limit_message = f"Пользователь не может иметь более {ITEM_LIMIT} образований."
 
 
 class UserSkill(models.Model):
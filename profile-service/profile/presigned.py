@@ -0,0 +1,124 @@
+"""
+Загрузка аватара напрямую в S3/MinIO по presigned PUT URL.
+
+Сервис выдает ключ объекта и подписанный URL, клиент кладет файл сам, а
+затем сообщает ключ в complete_presigned_upload. Байты аватара через
+воркеры Django не проходят. Ключ объекта сохраняется как имя файла
+аватара, поэтому прямая загрузка доступна, только когда хранилище файлов
+- корень того же бакета (S3Boto3Storage, см. STORAGES в настройках).
+"""
+
+import mimetypes
+import uuid
+from functools import lru_cache
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.storage import default_storage
+from rest_framework import status
+
+from .avatars import schedule_avatar_processing
+from .models import Profile, UserAvatar
+from .uploads import UploadError
+
+CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif')
+
+
+@lru_cache(maxsize=None)
+def s3_client(endpoint_url):
+    return boto3.client(
+        's3',
+        endpoint_url=endpoint_url,
+        aws_access_key_id=settings.AVATAR_S3_ACCESS_KEY,
+        aws_secret_access_key=settings.AVATAR_S3_SECRET_KEY,
+        region_name=settings.AVATAR_S3_REGION,
+        # MinIO работает только с адресацией бакета в пути
+        config=Config(signature_version='s3v4', s3={'addressing_style': 'path'}),
+    )
+
+
+def storage_is_bucket():
+    return (
+        getattr(default_storage, 'bucket_name', None) == settings.AVATAR_S3_BUCKET
+        and not getattr(default_storage, 'location', '')
+    )
+
+
+def check_configured():
+    if not settings.AVATAR_S3_BUCKET or not storage_is_bucket():
+        raise UploadError(
+            'Прямая загрузка не настроена.', status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
+def key_prefix(profile):
+    return f'avatars/{profile.pk}/'
+
+
+def create_presigned_upload(profile, content_type, size):
+    """
+    :return: ключ объекта, URL для PUT и заголовки, которые клиент должен
+        отправить с файлом
+    """
+    check_configured()
+    if size > settings.AVATAR_MAX_SIZE:
+        raise UploadError(
+            f'Размер файла не должен превышать {settings.AVATAR_MAX_SIZE} байт.',
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    if content_type not in CONTENT_TYPES:
+        raise UploadError('Недопустимый тип файла.')
+
+    extension = mimetypes.guess_extension(content_type) or ''
+    key = f'{key_prefix(profile)}{uuid.uuid4().hex}{extension}'
+    headers = {'Content-Type': content_type, 'Content-Length': str(size)}
+    # Подпись привязана к хосту, поэтому URL для клиента подписывается
+    # внешним адресом хранилища
+    url = s3_client(settings.AVATAR_S3_PUBLIC_ENDPOINT_URL).generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': settings.AVATAR_S3_BUCKET,
+            'Key': key,
+            'ContentType': content_type,
+            'ContentLength': size,
+        },
+        ExpiresIn=settings.AVATAR_PRESIGN_EXPIRES,
+    )
+    return {
+        'key': key,
+        'url': url,
+        'headers': headers,
+        'expires_in': settings.AVATAR_PRESIGN_EXPIRES,
+    }
+
+
+def complete_presigned_upload(profile, key):
+    """
+    Проверяет загруженный объект и делает его аватаром профиля.
+    """
+    check_configured()
+    if not key.startswith(key_prefix(profile)) or '/' in key[len(key_prefix(profile)):]:
+        raise UploadError('Ключ не принадлежит профилю.', status.HTTP_403_FORBIDDEN)
+    client = s3_client(settings.AVATAR_S3_ENDPOINT_URL)
+    try:
+        head = client.head_object(Bucket=settings.AVATAR_S3_BUCKET, Key=key)
+    except ClientError:
+        raise UploadError('Файл не загружен.', status.HTTP_409_CONFLICT)
+    if (
+        head['ContentLength'] > settings.AVATAR_MAX_SIZE
+        or head.get('ContentType') not in CONTENT_TYPES
+    ):
+        client.delete_object(Bucket=settings.AVATAR_S3_BUCKET, Key=key)
+        raise UploadError('Файл не подходит для аватара.')
+
+    avatar, created = UserAvatar.objects.get_or_create(user=profile)
+    if avatar.avatar.name != key:
+        avatar.delete_old_avatar()
+        avatar.avatar.name = key
+        avatar.content_hash = ''
+        avatar.save()
+        schedule_avatar_processing(avatar.pk)
+        Profile.bump_version(profile.pk)
+    return avatar
@@ -0,0 +1,79 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Case, IntegerField, Q, Value, When
+
+_spaces = re.compile(r'\s+')
+
+# Транслитерация кириллицы в латиницу, чтобы "Михаил" находился по
+# "mikhail" и наоборот, в том числе при смешанной раскладке
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f',
+    'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'iu', 'я': 'ia',
+})
+
+
+def normalize_name(value):
+    """
+    Нижний регистр, ё -> е, одиночные пробелы.
+    """
+    value = (value or '').casefold().replace('ё', 'е')
+    return _spaces.sub(' ', value).strip()
+
+
+def transliterate(value):
+    return normalize_name(value).translate(TRANSLIT)
+
+
+def search_columns(first_name, last_name, username):
+    """
+    Значения теневых колонок ProfileCard.search_text и search_translit.
+    """
+    text = normalize_name(' '.join((first_name, last_name, username)))
+    return {'search_text': text, 'search_translit': transliterate(text)}
+
+
+def search_cards(queryset, query):
+    """
+    Поиск карточек по имени, фамилии и юзернейму с ранжированием.
+
+    Совпадение по подстроке в исходном написании или в транслитерации,
+    при PROFILE_SEARCH_TRIGRAM еще и нечеткое по триграммам (опечатки,
+    разные варианты транслитерации). Выше идут совпадения с начала имени,
+    затем с начала слова, затем по похожести.
+    """
+    text = normalize_name(query)
+    if not text:
+        return queryset.none()
+    translit = transliterate(text)
+
+    condition = Q(search_text__contains=text) | Q(search_translit__contains=translit)
+    if settings.PROFILE_SEARCH_TRIGRAM:
+        condition |= Q(search_translit__trigram_word_similar=translit)
+    queryset = queryset.filter(condition).annotate(
+        prefix_rank=Case(
+            When(
+                Q(search_text__startswith=text) |
+                Q(search_translit__startswith=translit),
+                then=Value(2),
+            ),
+            When(
+                Q(search_text__contains=f' {text}') |
+                Q(search_translit__contains=f' {translit}'),
+                then=Value(1),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+    ordering = ['-prefix_rank']
+    if settings.PROFILE_SEARCH_TRIGRAM:
+        queryset = queryset.annotate(
+            similarity=TrigramWordSimilarity(translit, 'search_translit')
+        )
+        ordering.append('-similarity')
+    return queryset.order_by(*ordering, 'first_name', 'profile_id')
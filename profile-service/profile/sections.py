@@ -0,0 +1,145 @@
+"""
+Применение изменений сразу нескольких разделов профиля (PATCH ProfileView).
+
+Списковые разделы читаются одним запросом, создаются через bulk_create,
+обновляются через bulk_update и удаляются одним DELETE. bulk_create не
+вызывает save моделей, поэтому места под новые записи занимаются в
+счетчиках профиля здесь же (Profile.reserve_items).
+"""
+
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from .cards import refresh_cards
+from .models import (
+    EducationUser,
+    PersonalQuality,
+    PlaceOfWorkUser,
+    Profile,
+    UserSkill,
+    UserSpecialization,
+)
+from .serializers import (
+    EducationUserSerializer,
+    PersonalInfoSerializer,
+    PersonalQualitySerializer,
+    PlaceOfWorkUserSerializer,
+    UserSkillSerializer,
+    UserSpecializationSerializer,
+)
+
+# Раздел: модель и сериализатор записи
+SECTIONS = {
+    'specializations': (UserSpecialization, UserSpecializationSerializer),
+    'place_of_work': (PlaceOfWorkUser, PlaceOfWorkUserSerializer),
+    'education': (EducationUser, EducationUserSerializer),
+    'skills': (UserSkill, UserSkillSerializer),
+}
+
+
+class ProfileChanged(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Профиль изменен другим запросом.'
+
+
+def _validate(serializer):
+    if not serializer.is_valid():
+        raise serializers.ValidationError(serializer.errors)
+    return serializer.validated_data
+
+
+def apply_personal_info(profile, data):
+    validated = _validate(PersonalInfoSerializer(profile, data=data, partial=True))
+    for field, value in validated.items():
+        setattr(profile, field, value)
+    if validated:
+        profile.save(update_fields=list(validated))
+
+
+def apply_personal_quality(profile, data):
+    if data is None:
+        PersonalQuality.objects.filter(user=profile).delete()
+        return
+    quality = PersonalQuality.objects.filter(user=profile).first()
+    serializer = PersonalQualitySerializer(quality, data=data, partial=quality is not None)
+    _validate(serializer)
+    # save модели экранирует текст
+    serializer.save(user=profile)
+
+
+def apply_section(profile, name, diff):
+    """
+    Применяет {"create": [...], "update": [{"id", ...}], "delete": [id]}
+    к списковому разделу.
+    """
+    model, serializer_class = SECTIONS[name]
+    counter = getattr(model, 'counter', None)
+    rows = {row.id: row for row in model.objects.filter(user=profile)}
+
+    unknown = [
+        row_id for row_id in [*diff['delete'], *(item.get('id') for item in diff['update'])]
+        if row_id not in rows
+    ]
+    if unknown:
+        raise serializers.ValidationError(f'Записи не найдены: {unknown}')
+
+    if diff['delete']:
+        deleted = model.objects.filter(user=profile, id__in=diff['delete']).delete()
+        # Места освобождаются по числу реально удаленных строк
+        count = deleted[1].get(model._meta.label, 0)
+        if counter and count:
+            Profile.release_items(profile.pk, counter, count)
+
+    updated, fields = [], set()
+    for item in diff['update']:
+        row = rows[item['id']]
+        validated = _validate(serializer_class(row, data=item, partial=True))
+        for field, value in validated.items():
+            setattr(row, field, value)
+        fields.update(validated)
+        updated.append(row)
+    if updated and fields:
+        model.objects.bulk_update(updated, list(fields))
+
+    created = [
+        model(user=profile, **_validate(serializer_class(data=item)))
+        for item in diff['create']
+    ]
+    if created:
+        # Удаленные выше записи уже освободили места
+        if counter and not Profile.reserve_items(profile.pk, counter, len(created)):
+            raise serializers.ValidationError(f'Не более {Profile.ITEM_LIMIT} записей.')
+        model.objects.bulk_create(created)
+
+
+def apply_profile_diff(profile_id, data, versions=None):
+    """
+    Применяет изменения разделов в одной транзакции. Ошибка любого раздела
+    откатывает все.
+
+    :param versions: допустимые версии профиля (If-Match), None - любая
+    :raises serializers.ValidationError: {раздел: ошибки}
+    """
+    with transaction.atomic():
+        # Блокировка профиля сериализует параллельные PATCH
+        profile = Profile.objects.select_for_update().get(pk=profile_id)
+        if versions is not None and profile.version not in versions:
+            raise ProfileChanged()
+        for name, apply in (
+            ('personal_info', apply_personal_info),
+            ('personal_quality', apply_personal_quality),
+        ):
+            if name in data:
+                try:
+                    apply(profile, data[name])
+                except serializers.ValidationError as e:
+                    raise serializers.ValidationError({name: e.detail})
+        for name in SECTIONS:
+            if name in data:
+                try:
+                    apply_section(profile, name, data[name])
+                except serializers.ValidationError as e:
+                    raise serializers.ValidationError({name: e.detail})
+        Profile.bump_version(profile_id)
+        refresh_cards([profile_id])
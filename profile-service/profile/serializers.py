@@ -1,19 +1,47 @@
+from django.conf import settings
 from rest_framework import serializers
+from .avatars import FORMATS, avatar_url, avatar_urls
 from .validators import ProfileValidator
 from drf_spectacular.utils import extend_schema_field
 from .models import (
-    Profile, UserAvatar, UserSpecialization, PersonalQuality,
-    PlaceOfWorkUser, EducationUser, UserSkill
+    ITEM_LIMIT, AvatarUpload, Profile, ProfileCard, UserAvatar, UserSpecialization,
+    PersonalQuality, PlaceOfWorkUser, EducationUser, UserSkill
 )
 
 
 class FriendProfilesRequestSerializer(serializers.Serializer):
     ids = serializers.ListField(
         child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=settings.PROFILE_BATCH_MAX_IDS,
         help_text="Список UUID пользователей для получения информации о друзьях."
     )
 
 
+class RegistrationBatchSerializer(serializers.Serializer):
+    records = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.PROFILE_REGISTRATION_BATCH_MAX,
+        help_text="Записи регистрации {id, username, email, first_name}."
+    )
+
+
+def avatar_options(context):
+    """
+    Размер и формат аватара в списках: из контекста сериализатора или из
+    параметров запроса avatar_size и avatar_format.
+    """
+    request = context.get('request')
+    params = request.query_params if request is not None else {}
+    size = context.get('avatar_size') or params.get('avatar_size', '')
+    image_format = context.get('avatar_format') or params.get('avatar_format')
+    return (
+        int(size) if str(size).isdigit() else settings.AVATAR_LIST_SIZE,
+        image_format if image_format in FORMATS else 'webp',
+    )
+
+
 class UserExistsSerializer(serializers.Serializer):
     exists = serializers.BooleanField()
 
@@ -28,15 +56,35 @@ class FriendProfileSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.CharField(allow_null=True))
     def get_avatar(self, obj):
-        # Возвращаем URL аватара, если он существует
+        # Возвращаем URL копии аватара нужного размера, если он существует
         if hasattr(obj, 'avatar') and obj.avatar.avatar:
-            return obj.avatar.avatar.url
+            return avatar_url(
+                obj.avatar.avatar.name, obj.avatar.content_hash,
+                *avatar_options(self.context)
+            )
         return None
 
     @extend_schema_field(serializers.ListField(child=serializers.CharField()))
     def get_specializations(self, obj):
-        # Возвращаем список специализаций (до 3 штук)
-        return list(obj.specializations.values_list('specialization', flat=True)[:3])
+        # Возвращаем список специализаций (до 3 штук), при prefetch_related
+        # берем их из уже загруженных
+        return [item.specialization for item in obj.specializations.all()[:ITEM_LIMIT]]
+
+
+class ProfileCardSerializer(serializers.ModelSerializer):
+    """
+    Карточка профиля из ProfileCard, формат как у FriendProfileSerializer.
+    """
+    id = serializers.UUIDField(source='profile_id')
+    avatar = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProfileCard
+        fields = ['id', 'username', 'first_name', 'last_name', 'avatar', 'specializations']
+
+    @extend_schema_field(serializers.CharField(allow_null=True))
+    def get_avatar(self, obj):
+        return avatar_url(obj.avatar, obj.avatar_hash, *avatar_options(self.context))
 
 
 class PersonalInfoSerializer(serializers.ModelSerializer):
@@ -65,16 +113,39 @@ class RegistrationProfileSerializer(serializers.ModelSerializer):
 
 
 class UserAvatarSerializer(serializers.ModelSerializer):
+    # Копии аватара {размер: {формат: URL}}, пусто пока они строятся
+    sizes = serializers.SerializerMethodField()
+
     class Meta:
         model = UserAvatar
-        fields = ['avatar']
+        fields = ['avatar', 'sizes']
+
+    @extend_schema_field(serializers.DictField(child=serializers.DictField(child=serializers.CharField())))
+    def get_sizes(self, obj):
+        return avatar_urls(obj.content_hash)
 
-    def validate_size(self, value):
-        if value > 5 * 1024 * 1024:  # 5MB
+    def validate_avatar(self, value):
+        if value.size > settings.AVATAR_MAX_SIZE:
             raise serializers.ValidationError("Размер файла не должен превышать 5MB.")
         return value
 
 
+class PresignedUploadSerializer(serializers.Serializer):
+    content_type = serializers.CharField()
+    size = serializers.IntegerField(min_value=1)
+
+
+class PresignedCompleteSerializer(serializers.Serializer):
+    key = serializers.CharField(max_length=100)
+
+
+class AvatarUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AvatarUpload
+        fields = ['id', 'file_name', 'size', 'offset']
+        read_only_fields = ['id', 'offset']
+
+
 class UserSpecializationSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserSpecialization
@@ -145,3 +216,27 @@ class ProfileSerializer(serializers.ModelSerializer):
             'location': obj.location,
             'phone': obj.phone,
         }
+
+
+class SectionDiffSerializer(serializers.Serializer):
+    create = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    update = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate_update(self, items):
+        if any(not isinstance(item.get('id'), int) for item in items):
+            raise serializers.ValidationError("Для каждой записи нужен id.")
+        return items
+
+
+class ProfilePatchSerializer(serializers.Serializer):
+    """
+    Изменения нескольких разделов профиля, каждый раздел необязателен.
+    personal_quality: null удаляет раздел.
+    """
+    personal_info = serializers.DictField(required=False)
+    personal_quality = serializers.DictField(required=False, allow_null=True)
+    specializations = SectionDiffSerializer(required=False)
+    place_of_work = SectionDiffSerializer(required=False)
+    education = SectionDiffSerializer(required=False)
+    skills = SectionDiffSerializer(required=False)
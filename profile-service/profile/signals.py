@@ -1,7 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Profile, UserAvatar
+from .cards import refresh_cards
+from .models import (
+    DEFAULT_AVATAR,
+    Profile,
+    ProfileEvent,
+    UserAvatar,
+    UserSpecialization,
+)
 
 User = get_user_model()
 
@@ -19,9 +26,35 @@ def create_user_profile(sender, instance, created, **kwargs):
         )
 
         # Создаем аватар по умолчанию
-        UserAvatar.objects.create(user=profile, avatar='uploads/default.jpg')
+        UserAvatar.objects.create(user=profile, avatar=DEFAULT_AVATAR)
 
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+@receiver(post_save, sender=Profile)
+def refresh_profile_card(sender, instance, **kwargs):
+    # Сохранение идет в транзакции (AtomicSaveModel), событие пишется вместе
+    # с ним и при прямом save() и правке в админке
+    refresh_cards([instance.pk])
+    ProfileEvent.record([instance.pk])
+
+
+@receiver(post_delete, sender=Profile)
+def record_profile_deleted(sender, instance, **kwargs):
+    ProfileEvent.record([instance.pk], ProfileEvent.DELETED)
+
+
+@receiver(post_save, sender=UserAvatar)
+@receiver(post_delete, sender=UserAvatar)
+@receiver(post_save, sender=UserSpecialization)
+@receiver(post_delete, sender=UserSpecialization)
+def refresh_related_profile_card(sender, instance, origin=None, **kwargs):
+    # При каскадном удалении профиля карточка удаляется вместе с ним
+    if isinstance(origin, (Profile, User)):
+        return
+    # Карточка хранит аватар и специализации, пересобираем ее при их изменении
+    refresh_cards([instance.user_id])
+    ProfileEvent.record([instance.user_id])
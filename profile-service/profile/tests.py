@@ -1,3 +1,568 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .bulk import import_batch, import_profiles, normalize_record, register_batch
+from .db_router import ReplicaRoutingMiddleware, read_db
+from .events import (
+    DeliveryError,
+    LocalQueueTransport,
+    dispatch_batch,
+    dispatch_pending,
+    get_transports,
+)
+from .models import (
+    ITEM_LIMIT,
+    AvatarUpload,
+    Profile,
+    ProfileEvent,
+    UserAvatar,
+    UserSpecialization,
+)
+from .presigned import complete_presigned_upload, create_presigned_upload, s3_client
+from .uploads import UploadError, append_chunk, claim_upload, complete_upload, list_parts
+from .views import AvatarUploadView, UpdateAvatarView
+
+
+class ReplicaView:
+    read_replica = True
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingTests(TestCase):
+    def call(self, request, view):
+        middleware = ReplicaRoutingMiddleware(
+            lambda request: middleware.process_view(request, ReplicaView, (), {}) or view(request)
+        )
+        return middleware(request)
+
+    def test_read_only_post_does_not_stick_to_primary(self):
+        def view(request):
+            get_user_model().objects.exists()
+            return HttpResponse()
+        response = self.call(RequestFactory().post('/api/friend-profiles/batch/'), view)
+        self.assertNotIn('read_primary', response.cookies)
+
+    def test_write_sticks_to_primary(self):
+        def view(request):
+            get_user_model().objects.filter(username='nobody').update(first_name='x')
+            return HttpResponse()
+        response = self.call(RequestFactory().post('/api/profiles/'), view)
+        self.assertEqual(response.cookies['read_primary'].value, '1')
+
+    def test_failed_write_does_not_stick_to_primary(self):
+        def view(request):
+            get_user_model().objects.filter(username='nobody').update(first_name='x')
+            return HttpResponse(status=400)
+        response = self.call(RequestFactory().post('/api/profiles/'), view)
+        self.assertNotIn('read_primary', response.cookies)
+
+    def test_streaming_body_reads_from_replica(self):
+        def view(request):
+            return StreamingHttpResponse(read_db.get() for _ in range(2))
+        response = self.call(RequestFactory().get('/api/users/ids/'), view)
+        self.assertEqual(read_db.get(), 'default')
+        self.assertEqual(list(response.streaming_content), [b'default', b'default'])
+        self.assertIsNone(read_db.get())
+
+
+def make_record(username, **fields):
+    return dict({
+        'id': str(uuid.uuid4()), 'username': username, 'email': f'{username}@example.com',
+        'first_name': 'Иван', 'last_name': 'Petrov', 'token': '',
+    }, **fields)
+
+
+class BulkImportTests(TestCase):
+    def test_record_is_checked_by_field_validators(self):
+        with self.assertRaisesMessage(ValueError, 'first_name'):
+            normalize_record(make_record('ivan', first_name='Ivan 2'))
+        with self.assertRaisesMessage(ValueError, 'email'):
+            normalize_record(make_record('ivan', email='not-an-email'))
+
+    def test_invalid_rows_are_skipped(self):
+        errors = []
+        total, created = import_profiles(
+            [make_record('good'), make_record('bad', last_name='X')], 10,
+            on_error=lambda number, error: errors.append(number),
+        )
+        self.assertEqual((total, created), (2, 1))
+        self.assertEqual(errors, [2])
+
+    def test_profile_username_conflict_leaves_no_user(self):
+        owner = get_user_model().objects.create(username='renamed')
+        Profile.objects.filter(pk=owner.pk).update(username='taken')
+        record = normalize_record(make_record('taken'))
+        self.assertEqual(import_batch([record]), set())
+        self.assertFalse(get_user_model().objects.filter(pk=record['id']).exists())
+
+    def test_register_updates_profile_owned_by_user(self):
+        user = get_user_model().objects.bulk_create(
+            [get_user_model()(username='owner')]
+        )[0]
+        # id профиля не совпадает с id юзера
+        profile = Profile.objects.create(id=uuid.uuid4(), user=user, username='owner')
+        record = normalize_record(make_record('renamed', id=str(user.pk)))
+        self.assertEqual(register_batch([record]), {user.pk: 'updated'})
+        profile.refresh_from_db()
+        self.assertEqual((profile.username, profile.version), ('renamed', 2))
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ChunkedAvatarUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = get_user_model().objects.create(username='avatar')
+        self.data = png_bytes()
+        self.client = APIClient()
+        response = self.client.post(
+            reverse('profile:avatar_upload_create', kwargs={'pk': self.user.pk}),
+            {'file_name': 'me.png', 'size': len(self.data)}, format='json',
+        )
+        self.upload = AvatarUpload.objects.get(pk=response.data['id'])
+        self.url = reverse(
+            'profile:avatar_upload', kwargs={'pk': self.user.pk, 'upload_id': self.upload.pk}
+        )
+
+    def patch(self, offset, data):
+        return self.client.generic(
+            'PATCH', self.url, data, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_resume_after_partial_chunk(self):
+        half = len(self.data) // 2
+        response = self.patch(0, self.data[:half])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(self.url)['Upload-Offset'], str(half))
+        response = self.patch(half, self.data[half:])
+        self.assertEqual(response.status_code, 200)
+        avatar = UserAvatar.objects.get(user_id=self.user.pk)
+        with avatar.avatar.open() as file:
+            self.assertEqual(file.read(), self.data)
+        self.assertFalse(AvatarUpload.objects.filter(pk=self.upload.pk).exists())
+        self.assertEqual(list_parts(self.upload), [])
+
+    def test_stale_offset_is_rejected(self):
+        self.patch(0, self.data[:10])
+        response = self.patch(0, self.data[:10])
+        self.assertEqual(response.status_code, 409)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.offset, 10)
+
+    def test_leased_upload_is_not_written(self):
+        AvatarUpload.objects.filter(pk=self.upload.pk).update(
+            lease_until=timezone.now() + timedelta(minutes=1)
+        )
+        response = self.patch(0, self.data[:10])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(list_parts(self.upload), [])
+
+    def test_expired_lease_is_taken_over(self):
+        AvatarUpload.objects.filter(pk=self.upload.pk).update(
+            lease_until=timezone.now() - timedelta(seconds=1)
+        )
+        # Часть, оставленная упавшим запросом, перезаписывается
+        default_storage.save(f'avatar-uploads/{self.upload.pk}/0000000000.part', io.BytesIO(b'junk'))
+        self.assertEqual(self.patch(0, self.data[:10]).status_code, 204)
+        with default_storage.open(list_parts(self.upload)[0]) as part:
+            self.assertEqual(part.read(), self.data[:10])
+
+    def test_upload_is_completed_once(self):
+        avatars = list(UserAvatar.objects.values_list('avatar', flat=True))
+        self.assertTrue(append_chunk(self.upload, 0, len(self.data), io.BytesIO(self.data)))
+        # Второй запрос с последней частью уже завершает загрузку
+        claim_upload(AvatarUpload.objects.get(pk=self.upload.pk), self.upload.size)
+        with self.assertRaises(UploadError) as error:
+            complete_upload(self.upload)
+        self.assertEqual(error.exception.status_code, 409)
+        self.assertEqual(list(UserAvatar.objects.values_list('avatar', flat=True)), avatars)
+        self.assertEqual(len(list_parts(self.upload)), 1)
+
+    def chunked_patch(self, offset, data):
+        request = RequestFactory().generic(
+            'PATCH', self.url, data, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), HTTP_TRANSFER_ENCODING='chunked',
+        )
+        # Сервер отдает тело без Content-Length, уже разобрав чанки
+        del request.META['CONTENT_LENGTH']
+        request.META['wsgi.input'] = io.BytesIO(data)
+        return AvatarUploadView.as_view()(request, pk=self.user.pk, upload_id=self.upload.pk)
+
+    def test_chunked_body_is_read(self):
+        self.assertEqual(self.chunked_patch(0, self.data).status_code, 200)
+
+    def test_chunked_body_over_size_is_rejected(self):
+        self.assertEqual(self.chunked_patch(0, self.data + b'x').status_code, 413)
+        self.assertFalse(AvatarUpload.objects.filter(pk=self.upload.pk).exists())
+
+    def test_avatar_put_requires_content_length(self):
+        request = RequestFactory().put(
+            reverse('profile:update_avatar', kwargs={'pk': self.user.pk}), b'',
+            content_type='multipart/form-data; boundary=x', HTTP_TRANSFER_ENCODING='chunked',
+        )
+        request.META.pop('CONTENT_LENGTH', None)
+        response = UpdateAvatarView.as_view()(request, pk=self.user.pk)
+        self.assertEqual(response.status_code, 411)
+
+
+S3_SETTINGS = {
+    'AVATAR_S3_BUCKET': 'avatars',
+    'AVATAR_S3_ENDPOINT_URL': 'http://minio:9000',
+    'AVATAR_S3_PUBLIC_ENDPOINT_URL': 'http://localhost:9000',
+    'AVATAR_S3_ACCESS_KEY': 'minio',
+    'AVATAR_S3_SECRET_KEY': 'minio-secret',
+}
+S3_STORAGES = {
+    'default': {
+        'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage',
+        'OPTIONS': {
+            'bucket_name': 'avatars',
+            'endpoint_url': 'http://minio:9000',
+            'access_key': 'minio',
+            'secret_key': 'minio-secret',
+            'addressing_style': 'path',
+            'signature_version': 's3v4',
+        },
+    },
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(**S3_SETTINGS, STORAGES=S3_STORAGES)
+class PresignedAvatarUploadTests(TestCase):
+    def setUp(self):
+        s3_client.cache_clear()
+        self.addCleanup(s3_client.cache_clear)
+        self.profile = Profile.objects.get(
+            pk=get_user_model().objects.create(username='presigned').pk
+        )
+        # Запросы к MinIO подменяются ответами botocore
+        self.s3 = Stubber(s3_client(S3_SETTINGS['AVATAR_S3_ENDPOINT_URL']))
+        self.storage_s3 = Stubber(default_storage.connection.meta.client)
+        self.s3.activate()
+        self.storage_s3.activate()
+        self.addCleanup(self.s3.deactivate)
+        self.addCleanup(self.storage_s3.deactivate)
+
+    def test_presigned_url_points_to_public_endpoint(self):
+        intent = create_presigned_upload(self.profile, 'image/png', 100)
+        self.assertTrue(intent['key'].startswith(f'avatars/{self.profile.pk}/'))
+        self.assertTrue(intent['url'].startswith(f'http://localhost:9000/avatars/{intent["key"]}?'))
+        self.assertIn('X-Amz-Signature=', intent['url'])
+
+    def test_uploaded_object_becomes_avatar(self):
+        key = create_presigned_upload(self.profile, 'image/png', 100)['key']
+        self.s3.add_response(
+            'head_object', {'ContentLength': 100, 'ContentType': 'image/png'},
+            {'Bucket': 'avatars', 'Key': key},
+        )
+        # Старый аватар по умолчанию проверяется в том же бакете
+        self.storage_s3.add_client_error('head_object', http_status_code=404)
+        avatar = complete_presigned_upload(self.profile, key)
+        self.assertEqual(avatar.avatar.name, key)
+        self.assertTrue(avatar.avatar.url.startswith(f'http://minio:9000/avatars/{key}'))
+        self.s3.assert_no_pending_responses()
+
+    def test_missing_object_is_rejected(self):
+        key = f'avatars/{self.profile.pk}/missing.png'
+        self.s3.add_client_error('head_object', http_status_code=404)
+        with self.assertRaises(UploadError) as error:
+            complete_presigned_upload(self.profile, key)
+        self.assertEqual(error.exception.status_code, 409)
+
+    def test_foreign_key_is_rejected(self):
+        with self.assertRaises(UploadError) as error:
+            complete_presigned_upload(self.profile, f'avatars/{uuid.uuid4()}/a.png')
+        self.assertEqual(error.exception.status_code, 403)
+
+    @override_settings(STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_file_system_storage_refuses_presigned_mode(self):
+        for call in (
+            lambda: create_presigned_upload(self.profile, 'image/png', 100),
+            lambda: complete_presigned_upload(self.profile, f'avatars/{self.profile.pk}/a.png'),
+        ):
+            with self.assertRaises(UploadError) as error:
+                call()
+            self.assertEqual(error.exception.status_code, 503)
+
+
+# Живой MinIO для проверки presigned URL целиком, например
+# AVATAR_TEST_S3_ENDPOINT_URL=http://localhost:9000
+MINIO_ENDPOINT = os.environ.get('AVATAR_TEST_S3_ENDPOINT_URL')
+MINIO_SETTINGS = {
+    'AVATAR_S3_BUCKET': os.environ.get('AVATAR_TEST_S3_BUCKET', 'avatars-test'),
+    'AVATAR_S3_ENDPOINT_URL': MINIO_ENDPOINT,
+    'AVATAR_S3_PUBLIC_ENDPOINT_URL': MINIO_ENDPOINT,
+    'AVATAR_S3_ACCESS_KEY': os.environ.get('AVATAR_TEST_S3_ACCESS_KEY', 'minioadmin'),
+    'AVATAR_S3_SECRET_KEY': os.environ.get('AVATAR_TEST_S3_SECRET_KEY', 'minioadmin'),
+}
+MINIO_STORAGES = dict(S3_STORAGES, default={
+    'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage',
+    'OPTIONS': {
+        'bucket_name': MINIO_SETTINGS['AVATAR_S3_BUCKET'],
+        'endpoint_url': MINIO_ENDPOINT,
+        'access_key': MINIO_SETTINGS['AVATAR_S3_ACCESS_KEY'],
+        'secret_key': MINIO_SETTINGS['AVATAR_S3_SECRET_KEY'],
+        'addressing_style': 'path',
+        'signature_version': 's3v4',
+        'file_overwrite': False,
+    },
+})
+
+
+@unittest.skipUnless(MINIO_ENDPOINT, 'AVATAR_TEST_S3_ENDPOINT_URL не задан')
+@override_settings(**MINIO_SETTINGS, STORAGES=MINIO_STORAGES)
+class MinioPresignedAvatarUploadTests(TestCase):
+    def setUp(self):
+        s3_client.cache_clear()
+        self.addCleanup(s3_client.cache_clear)
+        self.bucket = MINIO_SETTINGS['AVATAR_S3_BUCKET']
+        self.client = s3_client(MINIO_ENDPOINT)
+        try:
+            self.client.create_bucket(Bucket=self.bucket)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'BucketAlreadyOwnedByYou':
+                raise
+        self.profile = Profile.objects.get(
+            pk=get_user_model().objects.create(username='minio').pk
+        )
+
+    def test_put_to_presigned_url_and_complete(self):
+        data = png_bytes()
+        intent = create_presigned_upload(self.profile, 'image/png', len(data))
+        self.addCleanup(self.client.delete_object, Bucket=self.bucket, Key=intent['key'])
+        response = requests.put(intent['url'], data=data, headers=intent['headers'], timeout=10)
+        self.assertEqual(response.status_code, 200, response.text)
+
+        avatar = complete_presigned_upload(self.profile, intent['key'])
+        self.assertEqual(avatar.avatar.name, intent['key'])
+        with avatar.avatar.open() as file:
+            self.assertEqual(file.read(), data)
+
+
+def in_threads(count, target):
+    """
+    Запускает target в count потоках, у каждого свое соединение с базой.
+    """
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = target(barrier)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class ItemLimitTests(TransactionTestCase):
+    def setUp(self):
+        self.profile = Profile.objects.get(
+            pk=get_user_model().objects.create(username='limits').pk
+        )
+
+    def counter(self):
+        self.profile.refresh_from_db()
+        return self.profile.specializations_count
+
+    def add(self, barrier):
+        barrier.wait()
+        try:
+            UserSpecialization.objects.create(user_id=self.profile.pk, specialization='Python')
+        except ValidationError:
+            return False
+        return True
+
+    def test_concurrent_adds_stop_at_limit(self):
+        self.assertEqual(in_threads(8, self.add).count(True), ITEM_LIMIT)
+        self.assertEqual(self.profile.specializations.count(), ITEM_LIMIT)
+        self.assertEqual(self.counter(), ITEM_LIMIT)
+
+    def test_concurrent_deletes_release_once(self):
+        for _ in range(ITEM_LIMIT):
+            UserSpecialization.objects.create(user=self.profile, specialization='Python')
+        item_id = self.profile.specializations.first().pk
+
+        def delete(barrier):
+            item = UserSpecialization.objects.get(pk=item_id)
+            barrier.wait()
+            return item.delete()[0]
+
+        self.assertEqual(sorted(in_threads(2, delete)), [0, 1])
+        self.assertEqual(self.counter(), ITEM_LIMIT - 1)
+        # Освободилось ровно одно место
+        self.assertEqual(in_threads(4, self.add).count(True), 1)
+        self.assertEqual(self.counter(), ITEM_LIMIT)
+
+
+class ItemCounterMigrationTests(TransactionTestCase):
+    before = [('profile', '0008_avatarupload')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_over_limit_profiles_are_clamped(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model('profile', 'User').objects.create(username='legacy')
+        profile = apps.get_model('profile', 'Profile').objects.create(
+            id=user.pk, user=user, username='legacy'
+        )
+        Specialization = apps.get_model('profile', 'UserSpecialization')
+        Specialization.objects.bulk_create(
+            [Specialization(user=profile, specialization='Python')] * 5
+        )
+
+        with self.assertLogs('profile.migrations.0009_profile_item_counters', 'WARNING'):
+            self.migrate([('profile', '0012_profile_item_limits')])
+        profile = Profile.objects.get(pk=user.pk)
+        self.assertEqual(profile.specializations_count, ITEM_LIMIT)
+        self.assertEqual(profile.specializations.count(), 5)
+
+
+class RecordingTransport:
+    def __init__(self, on_send=None):
+        self.payloads = []
+        self.on_send = on_send
+
+    def send(self, payload):
+        # Отправка идет вне транзакции захвата
+        assert not connection.in_atomic_block
+        if self.on_send:
+            self.on_send()
+        self.payloads.append(payload)
+
+
+class FailingTransport:
+    def send(self, payload):
+        raise DeliveryError('недоступен')
+
+
+class ProfileEventRecordTests(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.get(
+            pk=get_user_model().objects.create(username='events').pk
+        )
+        ProfileEvent.objects.all().delete()
+
+    def events(self):
+        return list(ProfileEvent.objects.values_list('profile_id', 'kind'))
+
+    def test_direct_saves_are_recorded(self):
+        self.profile.first_name = 'Иван'
+        self.profile.save()
+        UserAvatar.objects.get(user=self.profile).save()
+        UserSpecialization.objects.create(user=self.profile, specialization='Python')
+        self.assertEqual(self.events(), [(self.profile.pk, ProfileEvent.CHANGED)] * 3)
+
+    def test_save_is_rolled_back_with_event(self):
+        self.profile.first_name = 'Петр'
+        with mock.patch.object(ProfileEvent, 'record', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.profile.save()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.first_name, '')
+
+    def test_deleted_profile_is_recorded(self):
+        profile_id = self.profile.pk
+        self.profile.user.delete()
+        self.assertIn((profile_id, ProfileEvent.DELETED), self.events())
+
+
+class ProfileEventDispatchTests(TransactionTestCase):
+    def setUp(self):
+        self.ids = [uuid.uuid4() for _ in range(3)]
+        ProfileEvent.record(self.ids)
+        ProfileEvent.record(self.ids[:1], ProfileEvent.DELETED)
+
+    def test_batches_are_coalesced_and_removed(self):
+        LocalQueueTransport.queue.queue.clear()
+        self.assertEqual(dispatch_pending([LocalQueueTransport()], 3), 4)
+        payloads = list(LocalQueueTransport.queue.queue)
+        self.assertEqual(len(payloads), 2)
+        self.assertEqual(payloads[1], {'ids': [str(self.ids[0])], 'deleted': [str(self.ids[0])]})
+        self.assertFalse(ProfileEvent.objects.exists())
+
+    def test_claimed_events_are_sent_outside_transaction(self):
+        transport = RecordingTransport(on_send=lambda: self.assertEqual(
+            ProfileEvent.objects.filter(lease_until__isnull=False).count(), 4
+        ))
+        self.assertEqual(dispatch_batch([transport], 10), 4)
+        self.assertEqual(len(transport.payloads), 1)
+
+    def test_failed_batch_is_released(self):
+        with self.assertRaises(DeliveryError):
+            dispatch_batch([FailingTransport()], 10)
+        self.assertEqual(ProfileEvent.objects.filter(lease_until__isnull=True).count(), 4)
+
+    def test_leased_events_are_skipped(self):
+        ProfileEvent.objects.filter(profile_id=self.ids[1]).update(
+            lease_until=timezone.now() + timedelta(minutes=1)
+        )
+        ProfileEvent.objects.filter(profile_id=self.ids[2]).update(
+            lease_until=timezone.now() - timedelta(seconds=1)
+        )
+        transport = RecordingTransport()
+        self.assertEqual(dispatch_batch([transport], 10), 3)
+        self.assertNotIn(str(self.ids[1]), transport.payloads[0]['ids'])
+        self.assertEqual(list(ProfileEvent.objects.values_list('profile_id', flat=True)), [self.ids[1]])
+
+    def test_events_reclaimed_by_another_dispatcher_are_kept(self):
+        def reclaim():
+            # Аренда истекла, пачку захватил другой диспетчер
+            ProfileEvent.objects.update(lease_until=timezone.now() + timedelta(minutes=5))
+        dispatch_batch([RecordingTransport(on_send=reclaim)], 10)
+        self.assertEqual(ProfileEvent.objects.count(), 4)
+
+    @override_settings(PROFILE_EVENTS_TRANSPORT='webhook', PROFILE_EVENTS_WEBHOOK_URLS=[])
+    def test_webhook_without_urls_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_transports()
+        with self.assertRaises(ImproperlyConfigured):
+            dispatch_batch([], 10)
+        self.assertEqual(ProfileEvent.objects.filter(lease_until__isnull=True).count(), 4)
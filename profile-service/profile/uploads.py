@@ -0,0 +1,245 @@
+"""
+Загрузка аватара по частям с докачкой.
+
+Клиент создает загрузку с итоговым размером файла, затем отправляет тело
+файла одним или несколькими PATCH с заголовком Upload-Offset. Перед
+записью PATCH захватывает загрузку условным UPDATE по offset (аренда
+lease_until), поэтому параллельный PATCH той же загрузки получает 409 и
+ничего не пишет. Тело каждого PATCH потоком, не собираясь в памяти,
+сохраняется отдельной частью в хранилище файлов, общем для всех подов
+сервиса, и загрузка отклоняется, как только превышен заявленный размер.
+После обрыва клиент узнает принятый offset и продолжает с него. Когда
+получен весь файл, части склеиваются в аватар профиля под той же арендой,
+так что завершает загрузку только один запрос.
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import UnreadablePostError
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+
+from .avatars import schedule_avatar_processing
+from .models import AvatarUpload, Profile, UserAvatar
+
+BLOCK_SIZE = 64 * 1024
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+
+class UploadError(Exception):
+    def __init__(self, detail, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def parts_dir(upload):
+    return f'{settings.AVATAR_UPLOAD_PREFIX}/{upload.pk}'
+
+
+def part_name(upload, offset):
+    # offset фиксированной ширины: порядок имен совпадает с порядком частей
+    return f'{parts_dir(upload)}/{offset:010d}.part'
+
+
+def list_parts(upload):
+    try:
+        names = default_storage.listdir(parts_dir(upload))[1]
+    except FileNotFoundError:
+        return []
+    return [f'{parts_dir(upload)}/{name}' for name in sorted(names)]
+
+
+def create_upload(profile, file_name, size):
+    if size > settings.AVATAR_MAX_SIZE:
+        raise UploadError(
+            f'Размер файла не должен превышать {settings.AVATAR_MAX_SIZE} байт.',
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    file_name = os.path.basename(file_name)
+    if not file_name.lower().endswith(EXTENSIONS) or len(file_name) > 100:
+        raise UploadError('Недопустимое имя файла.')
+    return AvatarUpload.objects.create(user=profile, file_name=file_name, size=size)
+
+
+def abort_upload(upload):
+    for name in list_parts(upload):
+        default_storage.delete(name)
+    upload.delete()
+
+
+def lease_deadline():
+    return timezone.now() + timedelta(seconds=settings.AVATAR_UPLOAD_LEASE_SECONDS)
+
+
+def claim_upload(upload, offset):
+    """
+    Захватывает загрузку для записи с позиции offset.
+
+    :raises UploadError: offset уже сдвинут или загрузку пишет другой запрос
+    """
+    lease_until = lease_deadline()
+    if not AvatarUpload.objects.filter(pk=upload.pk, offset=offset).filter(
+        Q(lease_until__isnull=True) | Q(lease_until__lt=timezone.now())
+    ).update(lease_until=lease_until):
+        raise UploadError('Загрузка изменена другим запросом.', status.HTTP_409_CONFLICT)
+    upload.lease_until = lease_until
+
+
+def renew_lease(upload):
+    if upload.lease_until - timezone.now() > timedelta(
+        seconds=settings.AVATAR_UPLOAD_LEASE_SECONDS / 2
+    ):
+        return
+    lease_until = lease_deadline()
+    if not AvatarUpload.objects.filter(
+        pk=upload.pk, lease_until=upload.lease_until
+    ).update(lease_until=lease_until):
+        raise UploadError('Загрузка изменена другим запросом.', status.HTTP_409_CONFLICT)
+    upload.lease_until = lease_until
+
+
+def release_upload(upload):
+    AvatarUpload.objects.filter(
+        pk=upload.pk, lease_until=upload.lease_until
+    ).update(lease_until=None)
+
+
+class ChunkReader:
+    """
+    Тело PATCH для storage.save: читает поток блоками, не дает превысить
+    limit байт, продлевает аренду загрузки и при обрыве соединения
+    завершает часть уже принятыми байтами.
+    """
+    closed = False
+
+    def __init__(self, upload, stream, limit):
+        self.upload = upload
+        self.stream = stream
+        self.limit = limit
+        self.received = 0
+        self.exceeded = False
+
+    def seekable(self):
+        return False
+
+    def read(self, size=-1):
+        if self.stream is None or self.exceeded:
+            return b''
+        try:
+            block = self.stream.read(BLOCK_SIZE if size is None or size < 0 else min(size, BLOCK_SIZE))
+        except UnreadablePostError:
+            # Клиент оборвал соединение: сохраняем принятое для докачки
+            self.stream = None
+            return b''
+        if self.received + len(block) > self.limit:
+            self.exceeded = True
+            return b''
+        self.received += len(block)
+        renew_lease(self.upload)
+        return block
+
+
+def append_chunk(upload, offset, length, stream):
+    """
+    Дописывает тело запроса с позиции offset.
+
+    :param length: Content-Length запроса, если известен
+    :param stream: поток тела, None - тело пустое
+    :return: True, если файл получен полностью
+    """
+    if offset != upload.offset:
+        raise UploadError(
+            f'Ожидается Upload-Offset {upload.offset}.', status.HTTP_409_CONFLICT
+        )
+    if length is not None and offset + length > upload.size:
+        # Отказ до чтения тела
+        abort_upload(upload)
+        raise UploadError(
+            'Данных больше заявленного размера файла.',
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    claim_upload(upload, offset)
+    name = part_name(upload, offset)
+    reader = ChunkReader(upload, stream, upload.size - offset)
+    try:
+        # Часть с этим offset могла остаться от прерванного запроса
+        default_storage.delete(name)
+        saved = default_storage.save(name, File(reader, name))
+    except Exception:
+        release_upload(upload)
+        raise
+    if reader.exceeded:
+        abort_upload(upload)
+        raise UploadError(
+            'Данных больше заявленного размера файла.',
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    if saved != name:
+        # Имя занял запрос, захвативший загрузку после истечения нашей аренды
+        default_storage.delete(saved)
+        raise UploadError('Загрузка изменена другим запросом.', status.HTTP_409_CONFLICT)
+    if not reader.received:
+        default_storage.delete(name)
+
+    received = offset + reader.received
+    if not AvatarUpload.objects.filter(
+        pk=upload.pk, lease_until=upload.lease_until
+    ).update(offset=received, lease_until=None, updated_at=timezone.now()):
+        raise UploadError('Загрузка изменена другим запросом.', status.HTTP_409_CONFLICT)
+    upload.offset = received
+    upload.lease_until = None
+    return received == upload.size
+
+
+def complete_upload(upload):
+    """
+    Склеивает части, проверяет файл и делает его аватаром профиля.
+
+    :raises UploadError: загрузку уже завершает другой запрос
+    """
+    # PATCH с последней частью могли прислать дважды
+    claim_upload(upload, upload.size)
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=settings.AVATAR_MAX_SIZE) as file:
+            for name in list_parts(upload):
+                with default_storage.open(name) as part:
+                    shutil.copyfileobj(part, file)
+            try:
+                if file.tell() != upload.size:
+                    raise ValueError('части загрузки не совпадают с ее размером')
+                file.seek(0)
+                with Image.open(file) as image:
+                    image.verify()
+            except Exception:
+                abort_upload(upload)
+                raise UploadError('Файл не является изображением.')
+
+            avatar, created = UserAvatar.objects.get_or_create(user_id=upload.user_id)
+            avatar.delete_old_avatar()
+            file.seek(0)
+            avatar.avatar.save(upload.file_name, File(file), save=False)
+    except Exception:
+        release_upload(upload)
+        raise
+    avatar.content_hash = ''
+    avatar.save()
+    abort_upload(upload)
+    schedule_avatar_processing(avatar.pk)
+    Profile.bump_version(upload.user_id)
+    return avatar
+
+
+def expired_uploads():
+    return AvatarUpload.objects.filter(
+        updated_at__lt=timezone.now() - timedelta(hours=settings.AVATAR_UPLOAD_TTL_HOURS)
+    )
@@ -8,12 +8,18 @@ from .views import (
     SkillPostView,
     SkillPutDeleteView,
     CreateProfileView,
+    CreateProfileBatchView,
     UpdatePersonalInfoView,
     CheckUserExistsView,
+    UserIdsView,
     FriendProfilesView,
+    FriendProfilesBatchView,
     FriendSearchView,
+    PeopleSearchView,
     UserSpecializationPutDeleteView,
     UserSpecializationPostView, UpdatePersonalQualityView, UpdateAvatarView,
+    AvatarUploadCreateView, AvatarUploadView,
+    PresignedAvatarUploadView, PresignedAvatarCompleteView,
 )
 
 app_name = 'profile'
@@ -54,6 +60,26 @@ urlpatterns = [
         UpdateAvatarView.as_view(),
         name='update_avatar'
     ),
+    path(
+        'profile/<uuid:pk>/avatar/uploads/',
+        AvatarUploadCreateView.as_view(),
+        name='avatar_upload_create'
+    ),
+    path(
+        'profile/<uuid:pk>/avatar/uploads/<uuid:upload_id>/',
+        AvatarUploadView.as_view(),
+        name='avatar_upload'
+    ),
+    path(
+        'profile/<uuid:pk>/avatar/presigned/',
+        PresignedAvatarUploadView.as_view(),
+        name='avatar_presigned'
+    ),
+    path(
+        'profile/<uuid:pk>/avatar/presigned/complete/',
+        PresignedAvatarCompleteView.as_view(),
+        name='avatar_presigned_complete'
+    ),
     path(
         'users/<uuid:pk>/specializations/',
         UserSpecializationPostView.as_view(),
@@ -77,6 +103,11 @@ urlpatterns = [
     path('api/profiles/',
          CreateProfileView.as_view(),
          name='create_profile'),
+    path(
+        'api/profiles/batch/',
+        CreateProfileBatchView.as_view(),
+        name='create_profile_batch'
+    ),
     path(
         'profile/<uuid:pk>/update_info/',
         UpdatePersonalInfoView.as_view(),
@@ -87,14 +118,29 @@ urlpatterns = [
         CheckUserExistsView.as_view(),
         name='check_user'
     ),
+    path(
+        'api/user-ids/',
+        UserIdsView.as_view(),
+        name='user-ids'
+    ),
     path(
         'api/friend-profiles/',
         FriendProfilesView.as_view(),
         name='friend-profiles'
     ),
+    path(
+        'api/friend-profiles/batch/',
+        FriendProfilesBatchView.as_view(),
+        name='friend-profiles-batch'
+    ),
     path(
         'api/friend-search/',
         FriendSearchView.as_view(),
         name='friend-search'
     ),
+    path(
+        'api/people-search/',
+        PeopleSearchView.as_view(),
+        name='people-search'
+    ),
 ]
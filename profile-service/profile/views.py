@@ -1,9 +1,17 @@
+import json
+from functools import wraps
+
 from botocore.exceptions import ClientError
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from uuid import UUID
 import uuid
 from django.shortcuts import get_object_or_404
+from django.utils.cache import parse_etags
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_yasg import openapi
@@ -11,12 +19,26 @@ from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
+from .avatars import schedule_avatar_processing
+from .bulk import normalize_record, register_batch
+from .sections import apply_profile_diff
+from .presigned import complete_presigned_upload, create_presigned_upload
+from .uploads import (
+    UploadError, abort_upload, append_chunk, complete_upload, create_upload
+)
 from .error_messages import get_message
+from .renderers import NDJSONRenderer
+from .search import search_cards
 from .models import (
+    DEFAULT_AVATAR,
+    AvatarUpload,
     Profile,
+    ProfileCard,
     UserAvatar,
     PersonalQuality,
     PlaceOfWorkUser,
@@ -26,6 +48,10 @@ from .models import (
 )
 from .serializers import (
     UserAvatarSerializer,
+    AvatarUploadSerializer,
+    PresignedUploadSerializer,
+    PresignedCompleteSerializer,
+    ProfilePatchSerializer,
     PersonalQualitySerializer,
     PlaceOfWorkUserSerializer,
     EducationUserSerializer,
@@ -33,20 +59,58 @@ from .serializers import (
     UserSkillSerializer,
     ProfileSerializer,
     RegistrationProfileSerializer,
+    RegistrationBatchSerializer,
     PersonalInfoSerializer,
-    FriendProfileSerializer,
+    FriendProfilesRequestSerializer,
+    ProfileCardSerializer,
     UserExistsSerializer,
 )
 
 User = get_user_model()
 
 
+def request_length(request):
+    length = request.META.get('CONTENT_LENGTH', '')
+    return int(length) if length.isdigit() else None
+
+
+def request_body_stream(request):
+    """
+    Поток тела запроса для чтения без парсеров DRF, None - тела нет.
+    При Transfer-Encoding: chunked нет Content-Length и request.stream
+    пуст, поэтому под WSGI тело читается из wsgi.input (чанки разбирает
+    сервер), под ASGI - из самого запроса.
+    """
+    if request_length(request) is not None:
+        return request.stream
+    if 'chunked' not in request.META.get('HTTP_TRANSFER_ENCODING', '').lower():
+        return None
+    return request.META.get('wsgi.input') or request._request
+
+
+def bumps_profile_version(method):
+    """
+    Декоратор метода записи раздела профиля: после успешного ответа
+    увеличивает Profile.version, что сбрасывает кэш и ETag ProfileView.
+    Запись и событие изменения (ProfileEvent) фиксируются одной транзакцией.
+    """
+    @wraps(method)
+    def wrapper(self, request, pk, *args, **kwargs):
+        with transaction.atomic():
+            response = method(self, request, pk, *args, **kwargs)
+            if response is not None and response.status_code < 400:
+                Profile.bump_version(pk)
+        return response
+    return wrapper
+
+
 class FriendSearchView(ListAPIView):
     """
     API для поиска друзей по имени и списку ID.
     """
     permission_classes = [AllowAny]
-    serializer_class = FriendProfileSerializer
+    read_replica = True
+    serializer_class = ProfileCardSerializer
 
     @extend_schema(
         parameters=[
@@ -65,7 +129,7 @@ class FriendSearchView(ListAPIView):
                 required=True
             )
         ],
-        responses=FriendProfileSerializer(many=True)
+        responses=ProfileCardSerializer(many=True)
     )
     def get_queryset(self):
         ids_param = self.request.query_params.get('ids', '')
@@ -73,13 +137,9 @@ class FriendSearchView(ListAPIView):
 
         user_ids = [UUID(id) for id in ids_param.split(',') if self.is_valid_uuid(id)]
 
-        return Profile.objects.filter(
-            id__in=user_ids
-        ).filter(
-            Q(first_name__istartswith=name_param) |
-            Q(last_name__istartswith=name_param) |
-            Q(username__istartswith=name_param)
-        ).order_by('first_name')
+        return search_cards(
+            ProfileCard.objects.filter(profile_id__in=user_ids), name_param
+        )
 
     def is_valid_uuid(self, val):
         try:
@@ -89,20 +149,47 @@ class FriendSearchView(ListAPIView):
             return False
 
 
+class PeopleSearchView(ListAPIView):
+    """
+    API для глобального поиска людей по имени, фамилии и юзернейму.
+    """
+    permission_classes = [AllowAny]  # IsAuthenticated
+    read_replica = True
+    serializer_class = ProfileCardSerializer
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='q',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Строка поиска (first_name, last_name или username).',
+                required=True
+            )
+        ],
+        responses=ProfileCardSerializer(many=True)
+    )
+    def get_queryset(self):
+        return search_cards(
+            ProfileCard.objects.all(), self.request.query_params.get('q', '')
+        )
+
+
 class FriendProfilesView(ListAPIView):
     """
     API для получения информации о друзьях по списку ID.
     """
     permission_classes = [AllowAny]  # IsAuthenticated
-    serializer_class = FriendProfileSerializer
+    read_replica = True
+    serializer_class = ProfileCardSerializer
 
     @extend_schema(
-        responses=FriendProfileSerializer(many=True)
+        responses=ProfileCardSerializer(many=True)
     )
     def get_queryset(self):
         ids_param = self.request.query_params.get('ids', '')
         user_ids = [UUID(id) for id in ids_param.split(',') if self.is_valid_uuid(id)]
-        return Profile.objects.filter(id__in=user_ids)
+        return ProfileCard.objects.filter(profile_id__in=user_ids)
 
     def is_valid_uuid(self, val):
         try:
@@ -112,11 +199,69 @@ class FriendProfilesView(ListAPIView):
             return False
 
 
+class FriendProfilesBatchView(APIView):
+    """
+    API для получения карточек друзей по списку ID из тела запроса.
+
+    Принимает JSON массив UUID (или {"ids": [...]}) и отдает карточки
+    потоком по PROFILE_BATCH_CHUNK_SIZE штук: JSON массивом или NDJSON,
+    если клиент передал Accept: application/x-ndjson.
+    """
+    permission_classes = [AllowAny]  # IsAuthenticated
+    renderer_classes = [JSONRenderer, NDJSONRenderer]
+
+    @extend_schema(
+        request=FriendProfilesRequestSerializer,
+        responses=ProfileCardSerializer(many=True)
+    )
+    def post(self, request):
+        data = {'ids': request.data} if isinstance(request.data, list) else request.data
+        serializer = FriendProfilesRequestSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        user_ids = list(dict.fromkeys(serializer.validated_data['ids']))
+
+        cards = self.iter_cards(user_ids)
+        if isinstance(request.accepted_renderer, NDJSONRenderer):
+            return StreamingHttpResponse(
+                map(NDJSONRenderer.render_item, cards),
+                content_type=NDJSONRenderer.media_type
+            )
+        return StreamingHttpResponse(
+            self.iter_json_array(cards),
+            content_type='application/json'
+        )
+
+    def iter_cards(self, user_ids):
+        """
+        Карточки в порядке user_ids, по одному запросу в БД на пачку.
+        """
+        chunk_size = settings.PROFILE_BATCH_CHUNK_SIZE
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            cards = {
+                card.profile_id: card
+                for card in ProfileCard.objects.filter(profile_id__in=chunk)
+            }
+            for user_id in chunk:
+                if user_id in cards:
+                    yield ProfileCardSerializer(cards[user_id]).data
+
+    @staticmethod
+    def iter_json_array(cards):
+        separator = b'['
+        for card in cards:
+            yield separator + json.dumps(card, cls=JSONEncoder, ensure_ascii=False).encode()
+            separator = b','
+        yield b']' if separator == b',' else b'[]'
+
+
 class CheckUserExistsView(APIView):
     """
     API для проверки существования пользователя по ID.
     """
     permission_classes = [AllowAny]  # IsAuthenticated
+    read_replica = True
     serializer_class = UserExistsSerializer
 
     def get(self, request, user_id):
@@ -131,6 +276,22 @@ class CheckUserExistsView(APIView):
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class UserIdsView(APIView):
+    """
+    API для выгрузки всех ID пользователей, по одному в строке.
+    Используется сервисами для локальной реплики известных пользователей.
+    """
+    permission_classes = [AllowAny]  # IsAuthenticated
+    read_replica = True
+
+    def get(self, request):
+        user_ids = Profile.objects.values_list('id', flat=True).iterator(chunk_size=10000)
+        return StreamingHttpResponse(
+            (f'{user_id}\n' for user_id in user_ids),
+            content_type='text/plain'
+        )
+
+
 class CreateProfileView(APIView):
     permission_classes = [AllowAny]  # IsAuthenticated
 
@@ -162,6 +323,8 @@ class CreateProfileView(APIView):
             serializer = RegistrationProfileSerializer(user.profile, data=request.data)
             if serializer.is_valid():
                 serializer.save()
+                if not created:
+                    Profile.bump_version(user_id)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except ValueError as e:
@@ -170,11 +333,49 @@ class CreateProfileView(APIView):
             return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class CreateProfileBatchView(APIView):
+    """
+    Пакетная регистрация: пачка записей CreateProfileView одним upsert.
+
+    Принимает JSON массив записей (или {"records": [...]}), в ответе статус
+    по каждой записи в порядке запроса: created, updated, username_taken
+    или invalid.
+    """
+    permission_classes = [AllowAny]  # IsAuthenticated
+
+    @extend_schema(
+        request=RegistrationBatchSerializer
+    )
+    def post(self, request):
+        data = {'records': request.data} if isinstance(request.data, list) else request.data
+        serializer = RegistrationBatchSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        records = {}
+        for raw in serializer.validated_data['records']:
+            try:
+                record = normalize_record(raw)
+            except ValueError as e:
+                results.append({'id': raw.get('id'), 'status': 'invalid', 'detail': str(e)})
+                continue
+            results.append({'id': record['id']})
+            # Последняя запись с тем же id побеждает
+            records[record['id']] = record
+
+        statuses = register_batch(list(records.values())) if records else {}
+        for result in results:
+            result.setdefault('status', statuses.get(result['id']))
+        return Response({'results': results})
+
+
 class ProfileView(APIView):
     """
     Класс для получения и обновления профиля пользователя по id
     """
     permission_classes = [AllowAny]  # IsAuthenticated
+    read_replica = True
     serializer_class = ProfileSerializer
 
     @extend_schema(
@@ -184,15 +385,83 @@ class ProfileView(APIView):
         """
         Метод для получения профиля пользователя по id
         """
-        user = get_object_or_404(User, pk=pk)
-        profile, created = Profile.objects.get_or_create(user=user)
+        version = Profile.objects.filter(user_id=pk).values_list(
+            'version', flat=True
+        ).first()
+        if version is None:
+            user = get_object_or_404(User, pk=pk)
+            version = Profile.objects.get_or_create(user=user)[0].version
+
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in etags or self.etag(pk, version) in etags:
+            response = HttpResponseNotModified()
+            response['ETag'] = self.etag(pk, version)
+            return response
+
+        return self.render(pk, version)
+
+    @extend_schema(
+        request=ProfilePatchSerializer,
+        responses=ProfileSerializer
+    )
+    def patch(self, request, pk):
+        """
+        Метод для изменения нескольких разделов профиля одной транзакцией.
+        С заголовком If-Match (ETag из GET) изменения применяются, только
+        если профиль с тех пор не менялся.
+        """
+        profile_id = get_object_or_404(
+            Profile.objects.values_list('id', flat=True), user_id=pk
+        )
+        serializer = ProfilePatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        etags = parse_etags(request.headers.get('If-Match', ''))
+        versions = None
+        if etags and '*' not in etags:
+            prefix = f'"{pk}-'
+            versions = {
+                int(tag[len(prefix):-1]) for tag in etags
+                if tag.startswith(prefix) and tag[len(prefix):-1].isdigit()
+            }
+        apply_profile_diff(profile_id, serializer.validated_data, versions)
+        return self.render(pk)
+
+    def render(self, pk, version=None):
+        """
+        Ответ с профилем из кэша отрендеренного JSON или из БД.
+        """
+        content = cache.get(self.cache_key(pk, version)) if version else None
+        if content is None:
+            # Профиль и все разделы: один JOIN и по запросу на каждый список
+            profile = get_object_or_404(self.get_queryset(), user_id=pk)
+            version = profile.version
+            content = JSONRenderer().render(ProfileSerializer(profile).data)
+            cache.set(
+                self.cache_key(pk, version), content,
+                settings.PROFILE_RESPONSE_CACHE_TTL
+            )
 
-        # Создаем объект UserAvatar, если он не существует
-        # if not hasattr(profile, 'avatar'):
-        #     UserAvatar.objects.create(user=profile)
+        response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = self.etag(pk, version)
+        return response
+
+    @staticmethod
+    def get_queryset():
+        return Profile.objects.select_related(
+            'avatar', 'personal_quality'
+        ).prefetch_related(
+            'specializations', 'place_of_work', 'education', 'skills'
+        )
 
-        serializer = ProfileSerializer(profile)
-        return Response(serializer.data)
+    @staticmethod
+    def cache_key(pk, version):
+        return f'profile:{pk}:{version}'
+
+    @staticmethod
+    def etag(pk, version):
+        return f'"{pk}-{version}"'
 
     # @extend_schema(
     #     request=ProfileSerializer,
@@ -222,6 +491,7 @@ class UpdatePersonalInfoView(APIView):
         request=PersonalInfoSerializer,
         responses=PersonalInfoSerializer
     )
+    @bumps_profile_version
     def put(self, request, pk):
         """
         Метод для обновления информации о профиле пользователя
@@ -261,6 +531,7 @@ class UserSpecializationPostView(APIView):
             )
         ]
     )
+    @bumps_profile_version
     def post(self, request, pk):
         """Метод для создания специализации пользователя"""
         # if request.user.pk != pk:
@@ -269,13 +540,14 @@ class UserSpecializationPostView(APIView):
         user = get_object_or_404(User, pk=pk)
         profile = get_object_or_404(Profile, user=user)
 
-        if profile.specializations.count() >= 3:
-            return Response({"detail": "Пользователь не может иметь более 3 специализаций."},
-                            status=status.HTTP_400_BAD_REQUEST)
-
         serializer = UserSpecializationSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user=profile)
+            try:
+                serializer.save(user=profile)
+            except ValidationError as e:
+                # Лимит записей проверяется в save модели (LimitedItem)
+                return Response({"detail": e.messages[0]},
+                                status=status.HTTP_400_BAD_REQUEST)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return
 
@@ -310,6 +582,7 @@ class UserSpecializationPutDeleteView(APIView):
             )
         ]
     )
+    @bumps_profile_version
     def put(self, request, pk, specialization_id):
         """Метод для обновления специализации пользователя"""
         # if request.user.pk != pk:
@@ -344,6 +617,7 @@ class UserSpecializationPutDeleteView(APIView):
             )
         ]
     )
+    @bumps_profile_version
     def delete(self, request, pk, specialization_id):
         """Метод для удаления специализации пользователя"""
         # if request.user.pk != pk:
@@ -380,6 +654,7 @@ class PlaceOfWorkPostView(APIView):
             )
         ]
     )
+    @bumps_profile_version
     def post(self, request, pk):
         """
         Метод для создания информации о месте работы
@@ -389,13 +664,13 @@ class PlaceOfWorkPostView(APIView):
         #                     status=status.HTTP_403_FORBIDDEN)
         user = get_object_or_404(User, pk=pk)
         profile = get_object_or_404(Profile, user=user)
-        if profile.place_of_work.count() >= 3:
-            return Response({"detail": "Пользователь не может иметь более 3 мест работы."},
-                            status=status.HTTP_400_BAD_REQUEST)
-
         serializer = PlaceOfWorkUserSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user=profile)
+            try:
+                serializer.save(user=profile)
+            except ValidationError as e:
+                return Response({"detail": e.messages[0]},
+                                status=status.HTTP_400_BAD_REQUEST)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -430,6 +705,7 @@ class PlaceOfWorkPutDeleteView(APIView):
             )
         ]
     )
+    @bumps_profile_version
     def put(self, request, pk, place_of_work_id):
         """
         Метод для обновления информации о месте работы
@@ -446,6 +722,7 @@ class PlaceOfWorkPutDeleteView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @bumps_profile_version
     def delete(self, request, pk, place_of_work_id):
         """
         Метод для удаления информации о месте работы
@@ -474,6 +751,7 @@ class UpdatePersonalQualityView(APIView):
         request=PersonalQualitySerializer,
         responses=PersonalQualitySerializer
     )
+    @bumps_profile_version
     def put(self, request, pk):
         """
         Метод для обновления информации о личных качествах
@@ -495,6 +773,7 @@ class UpdatePersonalQualityView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @bumps_profile_version
     def delete(self, request, pk, personal_quality_id):
         """
         Метод для удаления информации о личных качествах
@@ -532,6 +811,7 @@ class EducationPostView(APIView):
             )
         ]
     )
+    @bumps_profile_version
     def post(self, request, pk):
         """
         Метод для создания информации об образовании
@@ -541,13 +821,13 @@ class EducationPostView(APIView):
         #                     status=status.HTTP_403_FORBIDDEN)
         user = get_object_or_404(User, pk=pk)
         profile = get_object_or_404(Profile, user=user)
-        if profile.education.count() >= 3:
-            return Response({"detail": "Пользователь не может иметь более 3 образований."},
-                            status=status.HTTP_400_BAD_REQUEST)
-
         serializer = EducationUserSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user=profile)
+            try:
+                serializer.save(user=profile)
+            except ValidationError as e:
+                return Response({"detail": e.messages[0]},
+                                status=status.HTTP_400_BAD_REQUEST)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -582,6 +862,7 @@ class EducationPutDeleteView(APIView):
             )
         ]
     )
+    @bumps_profile_version
     def put(self, request, pk, education_id):
         """
         Метод для обновления информации об образовании
@@ -598,6 +879,7 @@ class EducationPutDeleteView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @bumps_profile_version
     def delete(self, request, pk, education_id):
         """
         Метод для удаления информации об образовании
@@ -624,10 +906,20 @@ class UpdateAvatarView(APIView):
         request=UserAvatarSerializer,
         responses=UserAvatarSerializer
     )
+    @bumps_profile_version
     def put(self, request, pk):
         # if request.user.pk != pk:
         #     return Response({"detail": get_message("forbidden")},
         #                     status=status.HTTP_403_FORBIDDEN)
+        # Отказ по Content-Length до чтения тела (с запасом на multipart).
+        # Без Content-Length размер multipart не проверить до разбора
+        length = request_length(request)
+        if length is None:
+            return Response({"detail": "Требуется заголовок Content-Length."},
+                            status=status.HTTP_411_LENGTH_REQUIRED)
+        if length > settings.AVATAR_MAX_SIZE + 64 * 1024:
+            return Response({"detail": "Размер файла не должен превышать 5MB."},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
         user = get_object_or_404(User, pk=pk)
         profile = get_object_or_404(Profile, user=user)
         avatar, created = UserAvatar.objects.get_or_create(user=profile)
@@ -638,7 +930,9 @@ class UpdateAvatarView(APIView):
                 # Удаляем старую аватарку после успешной валидации
                 avatar.delete_old_avatar()
 
-                serializer.save()
+                # Копии нового аватара строятся в фоне, до этого отдается оригинал
+                serializer.save(content_hash='')
+                schedule_avatar_processing(avatar.pk)
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except ClientError as e:
@@ -646,6 +940,7 @@ class UpdateAvatarView(APIView):
         except Exception as e:
             return Response({"detail": "An unexpected error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @bumps_profile_version
     def delete(self, request, pk):
         """
         Метод для удаления аватара пользователя
@@ -656,11 +951,133 @@ class UpdateAvatarView(APIView):
         user = get_object_or_404(User, pk=pk)
         profile = get_object_or_404(Profile, user=user)
         avatar = get_object_or_404(UserAvatar, user=profile)
-        avatar.avatar = 'uploads/default.jpg'
+        avatar.avatar = DEFAULT_AVATAR
+        avatar.content_hash = ''
         avatar.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@extend_schema(tags=['User Avatar'])
+class AvatarUploadCreateView(APIView):
+    """
+    Создание загрузки аватара по частям: {"file_name", "size"}.
+    """
+    permission_classes = [AllowAny]  # IsAuthenticated
+
+    @extend_schema(
+        request=AvatarUploadSerializer,
+        responses=AvatarUploadSerializer
+    )
+    def post(self, request, pk):
+        profile = get_object_or_404(Profile, user_id=pk)
+        serializer = AvatarUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = create_upload(profile, **serializer.validated_data)
+        except UploadError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+        return Response(AvatarUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(tags=['User Avatar'])
+class AvatarUploadView(APIView):
+    """
+    Загрузка аватара по частям.
+
+    GET/HEAD - принятый offset для докачки (и в заголовке Upload-Offset),
+    PATCH - тело запроса дописывается с позиции из заголовка Upload-Offset,
+    после последней части возвращается аватар, DELETE - отмена загрузки.
+    """
+    permission_classes = [AllowAny]  # IsAuthenticated
+
+    def get_upload(self, pk, upload_id):
+        return get_object_or_404(AvatarUpload, pk=upload_id, user__user_id=pk)
+
+    @staticmethod
+    def with_offset(response, upload):
+        response['Upload-Offset'] = upload.offset
+        response['Upload-Length'] = upload.size
+        return response
+
+    @extend_schema(responses=AvatarUploadSerializer)
+    def get(self, request, pk, upload_id):
+        upload = self.get_upload(pk, upload_id)
+        return self.with_offset(Response(AvatarUploadSerializer(upload).data), upload)
+
+    @extend_schema(
+        request={'application/offset+octet-stream': OpenApiTypes.BINARY},
+        responses=UserAvatarSerializer
+    )
+    def patch(self, request, pk, upload_id):
+        upload = self.get_upload(pk, upload_id)
+        offset = request.headers.get('Upload-Offset', '')
+        if not offset.isdigit():
+            return Response({"detail": "Требуется заголовок Upload-Offset."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Тело читается напрямую из потока, без парсеров DRF
+            completed = append_chunk(
+                upload, int(offset), request_length(request),
+                request_body_stream(request)
+            )
+            if not completed:
+                return self.with_offset(Response(status=status.HTTP_204_NO_CONTENT), upload)
+            avatar = complete_upload(upload)
+        except UploadError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+        return Response(UserAvatarSerializer(avatar).data)
+
+    def delete(self, request, pk, upload_id):
+        abort_upload(self.get_upload(pk, upload_id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@extend_schema(tags=['User Avatar'])
+class PresignedAvatarUploadView(APIView):
+    """
+    Presigned PUT URL для загрузки аватара напрямую в хранилище.
+    """
+    permission_classes = [AllowAny]  # IsAuthenticated
+
+    @extend_schema(request=PresignedUploadSerializer)
+    def post(self, request, pk):
+        profile = get_object_or_404(Profile, user_id=pk)
+        serializer = PresignedUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            intent = create_presigned_upload(profile, **serializer.validated_data)
+        except UploadError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+        return Response(intent, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(tags=['User Avatar'])
+class PresignedAvatarCompleteView(APIView):
+    """
+    Завершение прямой загрузки: загруженный объект становится аватаром.
+    """
+    permission_classes = [AllowAny]  # IsAuthenticated
+
+    @extend_schema(
+        request=PresignedCompleteSerializer,
+        responses=UserAvatarSerializer
+    )
+    def post(self, request, pk):
+        profile = get_object_or_404(Profile, user_id=pk)
+        serializer = PresignedCompleteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            avatar = complete_presigned_upload(profile, serializer.validated_data['key'])
+        except UploadError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+        except ClientError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(UserAvatarSerializer(avatar).data)
+
+
 @extend_schema(
     tags=['User Skill'],
 )
@@ -684,6 +1101,7 @@ class SkillPostView(APIView):
             )
         ]
     )
+    @bumps_profile_version
     def post(self, request, pk):
         """
         Метод для создания навыка пользователя
@@ -730,6 +1148,7 @@ class SkillPutDeleteView(APIView):
             )
         ]
     )
+    @bumps_profile_version
     def put(self, request, pk, skill_id):
         """
         Метод для обновления навыка пользователя
@@ -746,6 +1165,7 @@ class SkillPutDeleteView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @bumps_profile_version
     def delete(self, request, pk, skill_id):
         """
         Метод для удаления навыка пользователя
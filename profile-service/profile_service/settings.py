@@ -88,6 +88,25 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: "host[:port],host[:port]" с теми же учетными данными
+DATABASE_REPLICAS = []
+for number, address in enumerate(filter(None, os.environ.get("DJANGO_DB_REPLICA_HOSTS", "").split(",")), 1):
+    host, _sep, port = address.strip().partition(":")
+    alias = f"replica_{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["profile.db_router.ReplicaRouter"]
+
+# Сколько секунд после записи чтения клиента идут в primary
+READ_REPLICA_STICKY_SECONDS = int(os.environ.get("READ_REPLICA_STICKY_SECONDS", 5))
+READ_REPLICA_STICKY_COOKIE = "read_primary"
+
 # Настройки приложений
 INSTALLED_APPS = [
     "django.contrib.admin",
@@ -96,6 +115,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 
     "minio_storage",
     "rest_framework",
@@ -115,6 +135,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "profile.db_router.ReplicaRoutingMiddleware",
 ]
 
 # Настройки Django REST Framework
@@ -131,6 +152,32 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# Батч-выдача карточек профилей (FriendProfilesBatchView)
+PROFILE_BATCH_MAX_IDS = int(os.environ.get("PROFILE_BATCH_MAX_IDS", 50000))
+PROFILE_BATCH_CHUNK_SIZE = int(os.environ.get("PROFILE_BATCH_CHUNK_SIZE", 500))
+
+# Максимум записей в пачке регистрации (CreateProfileBatchView)
+PROFILE_REGISTRATION_BATCH_MAX = int(os.environ.get("PROFILE_REGISTRATION_BATCH_MAX", 1000))
+
+# Кэш отрендеренного профиля (ProfileView), ключ включает Profile.version
+PROFILE_RESPONSE_CACHE_TTL = int(os.environ.get("PROFILE_RESPONSE_CACHE_TTL", 600))
+
+# Outbox событий изменения профилей (profile/events.py): транспорт
+# (webhook или local) и адреса подписчиков через запятую
+PROFILE_EVENTS_TRANSPORT = os.environ.get("PROFILE_EVENTS_TRANSPORT", "webhook")
+PROFILE_EVENTS_WEBHOOK_URLS = list(filter(None, os.environ.get("PROFILE_EVENTS_WEBHOOK_URLS", "").split(",")))
+PROFILE_EVENTS_BATCH_SIZE = int(os.environ.get("PROFILE_EVENTS_BATCH_SIZE", 500))
+PROFILE_EVENTS_POLL_SECONDS = int(os.environ.get("PROFILE_EVENTS_POLL_SECONDS", 1))
+PROFILE_EVENTS_TIMEOUT = int(os.environ.get("PROFILE_EVENTS_TIMEOUT", 5))
+# Сколько секунд захваченная пачка недоступна другим диспетчерам. Должно
+# быть больше отправки пачки всем подписчикам (TIMEOUT на каждый URL)
+PROFILE_EVENTS_LEASE_SECONDS = int(os.environ.get("PROFILE_EVENTS_LEASE_SECONDS", 60))
+# Токен для служебных запросов к другим микросервисам (заголовок X-Service-Token)
+SERVICE_TOKEN = os.environ.get("SERVICE_TOKEN", "")
+
+# Нечеткий поиск по триграммам (требует расширение pg_trgm)
+PROFILE_SEARCH_TRIGRAM = os.environ.get("PROFILE_SEARCH_TRIGRAM", "true").lower() == "true"
+
 # Настройки WSGI приложения
 WSGI_APPLICATION = "profile_service.wsgi.application"
 
@@ -236,13 +283,57 @@ LOCALE_PATHS = [
 STATIC_URL = "/static/"
 MEDIA_URL = ""
 
-# Настройки хранения файлов
-DEFAULT_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
-STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
-
 # Установите URL для аватарки по умолчанию
 DEFAULT_AVATAR_URL = "https://t4.ftcdn.net/jpg/08/01/47/93/360_F_801479395_lZeVjLIbUhVKS2WyYu2AqMnEBhHpv6gJ.jpg"
 
+# Уменьшенные копии аватаров (profile/avatars.py)
+AVATAR_SIZES = [int(size) for size in os.environ.get("AVATAR_SIZES", "48,128,512").split(",")]
+AVATAR_LIST_SIZE = int(os.environ.get("AVATAR_LIST_SIZE", 128))  # Размер в списках и поиске
+AVATAR_WORKERS = int(os.environ.get("AVATAR_WORKERS", 2))
+
+# Загрузка аватара по частям (profile/uploads.py). Части недогруженных
+# файлов хранятся в хранилище файлов (STORAGES) под префиксом AVATAR_UPLOAD_PREFIX,
+# чтобы докачка работала через любой под сервиса
+AVATAR_MAX_SIZE = int(os.environ.get("AVATAR_MAX_SIZE", 5 * 1024 * 1024))
+AVATAR_UPLOAD_PREFIX = os.environ.get("AVATAR_UPLOAD_PREFIX", "avatar-uploads")
+# Сколько секунд загрузка закреплена за одним PATCH без чтения новых данных
+AVATAR_UPLOAD_LEASE_SECONDS = int(os.environ.get("AVATAR_UPLOAD_LEASE_SECONDS", 60))
+AVATAR_UPLOAD_TTL_HOURS = int(os.environ.get("AVATAR_UPLOAD_TTL_HOURS", 24))
+
+# Прямая загрузка аватара в S3/MinIO по presigned URL (profile/presigned.py).
+# Работает, только когда хранилище файлов - этот же бакет (STORAGES ниже)
+AVATAR_S3_BUCKET = os.environ.get("AVATAR_S3_BUCKET", "")
+AVATAR_S3_ENDPOINT_URL = os.environ.get("AVATAR_S3_ENDPOINT_URL") or None
+# Адрес хранилища, доступный клиентам, если он отличается от внутреннего
+AVATAR_S3_PUBLIC_ENDPOINT_URL = os.environ.get("AVATAR_S3_PUBLIC_ENDPOINT_URL") or AVATAR_S3_ENDPOINT_URL
+AVATAR_S3_ACCESS_KEY = os.environ.get("AVATAR_S3_ACCESS_KEY")
+AVATAR_S3_SECRET_KEY = os.environ.get("AVATAR_S3_SECRET_KEY")
+AVATAR_S3_REGION = os.environ.get("AVATAR_S3_REGION", "us-east-1")
+AVATAR_PRESIGN_EXPIRES = int(os.environ.get("AVATAR_PRESIGN_EXPIRES", 600))
+
+# Настройки хранения файлов. Если задан AVATAR_S3_BUCKET, медиафайлы
+# (аватары и части загрузок) лежат в корне этого бакета S3/MinIO, и ключ
+# объекта presigned-загрузки сразу является именем файла аватара
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+if AVATAR_S3_BUCKET:
+    STORAGES["default"] = {
+        "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
+        "OPTIONS": {
+            "bucket_name": AVATAR_S3_BUCKET,
+            "endpoint_url": AVATAR_S3_ENDPOINT_URL,
+            "access_key": AVATAR_S3_ACCESS_KEY,
+            "secret_key": AVATAR_S3_SECRET_KEY,
+            "region_name": AVATAR_S3_REGION,
+            # MinIO работает только с адресацией бакета в пути
+            "addressing_style": "path",
+            "signature_version": "s3v4",
+            "file_overwrite": False,
+        },
+    }
+
 # Настройки Minio
 # DEFAULT_FILE_STORAGE = "minio_storage.storage.MinioMediaStorage"
 # STATICFILES_STORAGE = "minio_storage.storage.MinioStaticStorage"